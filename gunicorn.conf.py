@@ -0,0 +1,68 @@
+import json
+import multiprocessing
+import os
+
+# إعدادات خادم الإنتاج (gunicorn)
+#
+# التشغيل:
+#   gunicorn -c gunicorn.conf.py src.wsgi:app
+#
+# إعادة التحميل بدون انقطاع (العمال الحاليون يكملون طلباتهم ثم يستبدلون):
+#   kill -HUP <master pid>
+#
+# اختبار الحمل لقياس التوسع مع عدد الأنوية (نفس الطلب مع زيادة WEB_CONCURRENCY):
+#   WEB_CONCURRENCY=1 gunicorn -c gunicorn.conf.py src.wsgi:app
+#   hey -z 30s -c 64 http://127.0.0.1:5000/api/health
+#   WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py src.wsgi:app
+#   hey -z 30s -c 64 http://127.0.0.1:5000/api/health
+# ثم مقارنة قيمة Requests/sec بين التشغيلين.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# عدد العمليات والخيوط لكل عملية
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# كل اتصال SSE مفتوح (/api/notifications/stream) يشغل خيطاً طوال مدته، لذلك يحده SSE_MAX_STREAMS
+# لكل عامل (الافتراضي نصف الخيوط) والباقي يستطلع unread-count
+threads = int(os.environ.get('WEB_THREADS', '4'))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# إعادة تشغيل العامل بعد عدد من الطلبات لتفادي تراكم الذاكرة
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
+
+# كل عامل يستورد التطبيق بنفسه حتى يعمل HUP على إعادة تحميل الكود
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """يعمل مرة واحدة في العملية الرئيسية قبل إنشاء العمال
+
+    إنشاء الجداول والبيانات الافتراضية يتم عبر الأمر المنفصل:
+        flask --app src.wsgi init-db
+
+    لا يستورد src هنا: أي وحدة تحمل في العملية الرئيسية يرثها العمال بعد HUP
+    فلا يعاد تحميل الكود الجديد.
+    """
+    # التحقق من بيانات Firebase مبكراً بدلاً من أول طلب (قراءة JSON فقط دون firebase_admin)
+    source = os.environ.get('FIREBASE_CREDENTIALS', '').strip()
+    try:
+        if os.path.isfile(source):
+            with open(source, encoding='utf-8') as f:
+                creds = json.load(f)
+        else:
+            creds = json.loads(source)
+    except ValueError as e:
+        raise RuntimeError(f'FIREBASE_CREDENTIALS is neither a file nor valid JSON: {e}')
+
+    if not isinstance(creds, dict) or creds.get('type') != 'service_account':
+        raise RuntimeError('FIREBASE_CREDENTIALS is not a service account key')
+    missing = [key for key in ('project_id', 'private_key', 'client_email') if not creds.get(key)]
+    if missing:
+        raise RuntimeError(f'FIREBASE_CREDENTIALS is missing: {", ".join(missing)}')
@@ -1,312 +1,360 @@
 import os,json
 import sys
+import threading
 import firebase_admin
 from firebase_admin import credentials, auth
 
-
-
-firebase_src = os.environ.get("FIREBASE_CREDENTIALS", "").strip()
-print("DEBUG ▶︎ source:", repr(firebase_src))
-
-# لو بتستخدم Secret File، نطبع محتويات المجلد للتأكد من المونت:
-if not firebase_src and os.path.isdir("/etc/secrets"):
-    print("DEBUG ▶︎ /etc/secrets contains:", os.listdir("/etc/secrets"))
-
-# بقية الكود كما في آخر نسخة:
-if os.path.isfile(firebase_src):
-    print("DEBUG ▶︎ using file path")
-    cred = credentials.Certificate(firebase_src)
-else:
-    try:
-        creds_dict = json.loads(firebase_src)
-        print("DEBUG ▶︎ parsed JSON successfully")
-        cred = credentials.Certificate(creds_dict)
-    except Exception as e:
-        print("ERROR ▶︎ failed to load creds:", e)
-        raise
-
-initialize_app(cred)
-print("✔ Firebase initialized!")
-
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify, request
+from flask import Blueprint, Flask, current_app, send_from_directory, jsonify, request
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
+import click
 
-# إنشاء التطبيق
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+from src.services.firebase_auth import FirebaseTokenVerifier
+from src.services.serialization import install_json_provider, serialize_rows
+from src.services.vip_tiers import vip_tiers
+from src.services import product_search
+from src.models.db import DEFAULT_SQLITE_PRAGMAS, configure_database, database_config_from_env, db
+# استيراد جميع النماذج حتى تكتمل العلاقات في السجل المشترك
+from src.models.balance import BalanceLedger, BalanceSnapshot
+from src.models.catalog import CatalogChange, CatalogVersion
+from src.models.category import Category
+from src.models.fulfillment import FulfillmentJob
+from src.models.notification import Notification, Broadcast, NotificationReadMarker, AppSettings, TelegramSettings, AnimatedAsset
+from src.models.order import Order
+from src.models.payment import PaymentMethod, PaymentTransaction
+from src.models.product import Product, ProductCustomOption, ProductInventory
+from src.models.user import User, VIPLevel
+from src.services import balance
+from src.services.db_copy import copy_database
+from src.services.fulfillment import stub_provider_app, worker_from_env
+from src.services.event_log import EventLog
+from src.services.identity_cache import identity_cache
+from src.services.notification_push import notification_hub
+from src.services.proof_storage import LocalProofStorage
+from src.services.migrations import run_migrations
+from src.services.query_plan import explain, hot_queries, table_scans
+from src.services.catalog_snapshot import FileVersionStore, catalog_snapshots, changes_since, ensure_version_row
 
-# تمكين CORS للسماح بطلبات من Flutter
-CORS(app)
+# التحقق المحلي من رموز Firebase بدلاً من auth.verify_id_token في كل طلب
+token_verifier = None
+_firebase_lock = threading.Lock()
 
-# إعداد قاعدة البيانات
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def init_firebase():
+    """تهيئة Firebase مرة واحدة لكل عملية"""
+    global token_verifier
+    
+    if firebase_admin._apps:
+        return
+    
+    with _firebase_lock:
+        if firebase_admin._apps:
+            return
+        
+        # مسار ملف (Secret File) أو محتوى JSON مباشرة
+        firebase_src = os.environ.get("FIREBASE_CREDENTIALS", "").strip()
+        
+        if os.path.isfile(firebase_src):
+            cred = credentials.Certificate(firebase_src)
+        else:
+            try:
+                creds_dict = json.loads(firebase_src)
+                cred = credentials.Certificate(creds_dict)
+            except Exception as e:
+                print("ERROR ▶︎ failed to load creds:", e)
+                raise
+        
+        if cred.project_id:
+            token_verifier = FirebaseTokenVerifier(
+                cred.project_id,
+                max_entries=int(os.environ.get("FIREBASE_TOKEN_CACHE_SIZE", "10000"))
+            )
+        
+        firebase_admin.initialize_app(cred)
+        print("✔ Firebase initialized!")
 
-# إنشاء مجلد قاعدة البيانات إذا لم يكن موجوداً
-os.makedirs(os.path.join(os.path.dirname(__file__), 'database'), exist_ok=True)
+main_bp = Blueprint('main', __name__)
 
-# تهيئة قاعدة البيانات
-db = SQLAlchemy(app)
+# مسارات تطبيق العملاء (/api/auth و /api/user) تتحقق بنفسها من رمز JWT الخاص بالتطبيق
+# (token_required) في نفس الترويسة Authorization، فلا يطلب منها رمز Firebase
+APP_JWT_BLUEPRINTS = {'auth', 'user_management', 'order', 'payment', 'notification'}
 
-@app.before_request
+@main_bp.before_app_request
 def verify_firebase_token():
     public_paths = ['/', '/api/health']
     if request.path in public_paths or request.path.startswith('/static'):
         return
+    if request.blueprint in APP_JWT_BLUEPRINTS:
+        return
     id_token = request.headers.get('Authorization')
     if not id_token:
         return jsonify({'success': False, 'message': 'مطلوب تسجيل الدخول'}), 401
+    init_firebase()
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        if token_verifier is not None:
+            decoded_token = token_verifier.verify(id_token)
+        else:
+            decoded_token = auth.verify_id_token(id_token)
         request.user = decoded_token
     except Exception:
         return jsonify({'success': False, 'message': 'رمز الدخول غير صالح'}), 401
 
-# تعريف النماذج
-class VIPLevel(db.Model):
-    __tablename__ = 'vip_levels'
-    
-    level_id = db.Column(db.Integer, primary_key=True)
-    level_name = db.Column(db.String(50), nullable=False)
-    min_spent = db.Column(db.Float, nullable=False)
-    discount_percentage = db.Column(db.Float, nullable=False)
-    
-    def to_dict(self):
-        return {
-            'level_id': self.level_id,
-            'level_name': self.level_name,
-            'min_spent': self.min_spent,
-            'discount_percentage': self.discount_percentage
-        }
-
-class Category(db.Model):
-    __tablename__ = 'categories'
-    
-    category_id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-    image_url = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
-    
-    def to_dict(self):
-        return {
-            'category_id': self.category_id,
-            'name': self.name,
-            'description': self.description,
-            'image_url': self.image_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-
-class Product(db.Model):
-    __tablename__ = 'products'
-    
-    product_id = db.Column(db.Integer, primary_key=True)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False)
-    name = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
-    currency = db.Column(db.String(10), nullable=False, default='ريال')
-    cost_price = db.Column(db.Float, nullable=False)
-    sell_price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(255))
-    is_available = db.Column(db.Boolean, default=True)
-    product_type = db.Column(db.String(50), nullable=False, default='بدون')
-    api_linked = db.Column(db.Boolean, default=False)
-    api_details = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
-    
-    def to_dict(self):
-        return {
-            'product_id': self.product_id,
-            'category_id': self.category_id,
-            'name': self.name,
-            'description': self.description,
-            'currency': self.currency,
-            'cost_price': self.cost_price,
-            'sell_price': self.sell_price,
-            'image_url': self.image_url,
-            'is_available': self.is_available,
-            'product_type': self.product_type,
-            'api_linked': self.api_linked,
-            'api_details': self.api_details,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-
-class PaymentMethod(db.Model):
-    __tablename__ = 'payment_methods'
-    
-    method_id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    details = db.Column(db.Text)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
-    
-    def to_dict(self):
-        return {
-            'method_id': self.method_id,
-            'name': self.name,
-            'details': self.details,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
-
-# إنشاء الجداول وإضافة بيانات تجريبية
-with app.app_context():
-    db.create_all()
-    
-    # إضافة مستويات VIP الافتراضية
-    if VIPLevel.query.count() == 0:
-        vip_levels = [
-            VIPLevel(level_name='برونزي', min_spent=0, discount_percentage=0),
-            VIPLevel(level_name='فضي', min_spent=1000, discount_percentage=5),
-            VIPLevel(level_name='ذهبي', min_spent=5000, discount_percentage=10),
-            VIPLevel(level_name='بلاتيني', min_spent=10000, discount_percentage=15),
-            VIPLevel(level_name='ماسي', min_spent=25000, discount_percentage=20),
-        ]
-        for level in vip_levels:
-            db.session.add(level)
-    
-    # إضافة طرق دفع افتراضية
-    if PaymentMethod.query.count() == 0:
-        payment_methods = [
-            PaymentMethod(
-                name='تحويل بنكي - البنك الأهلي',
-                details='رقم الحساب: 1234567890\nاسم المستلم: متجر الألعاب'
-            ),
-            PaymentMethod(
-                name='فودافون كاش',
-                details='رقم المحفظة: 01012345678\nاسم المستلم: متجر الألعاب'
-            ),
-            PaymentMethod(
-                name='أورانج موني',
-                details='رقم المحفظة: 01112345678\nاسم المستلم: متجر الألعاب'
-            ),
-            PaymentMethod(
-                name='إتصالات كاش',
-                details='رقم المحفظة: 01012345678\nاسم المستلم: متجر الألعاب'
-            ),
-        ]
-        for method in payment_methods:
-            db.session.add(method)
-    
-    # إضافة أقسام تجريبية
-    if Category.query.count() == 0:
-        categories = [
-            Category(name='ألعاب الهاتف', description='شحن ألعاب الهاتف المحمول'),
-            Category(name='ألعاب الكمبيوتر', description='شحن ألعاب الكمبيوتر'),
-            Category(name='بطاقات الألعاب', description='بطاقات شحن متنوعة'),
-            Category(name='تطبيقات أخرى', description='شحن التطبيقات المختلفة'),
-        ]
-        for category in categories:
-            db.session.add(category)
-    
-    # إضافة منتجات تجريبية
-    if Product.query.count() == 0:
-        products = [
-            Product(
-                name='شحن PUBG Mobile - 60 UC',
-                category_id=1,
-                description='شحن 60 UC لـ PUBG Mobile',
-                cost_price=5.0,
-                sell_price=8.0,
-                product_type='بدون'
-            ),
-            Product(
-                name='شحن PUBG Mobile - UC مخصص',
-                category_id=1,
-                description='شحن UC بالكمية المطلوبة',
-                cost_price=0.1,
-                sell_price=0.15,
-                product_type='عداد'
-            ),
-            Product(
-                name='شحن Free Fire - الماس',
-                category_id=1,
-                description='شحن الماس لـ Free Fire',
-                cost_price=10.0,
-                sell_price=15.0,
-                product_type='كميات'
-            ),
-        ]
-        for product in products:
-            db.session.add(product)
-    
-    db.session.commit()
+def init_database(app):
+    """إنشاء الجداول وإضافة بيانات تجريبية (عبر الأمر: flask --app src.wsgi init-db)"""
+    with app.app_context():
+        db.create_all()
+        
+        # create_all لا يضيف الفهارس الجديدة إلى الجداول الموجودة مسبقاً
+        run_migrations(db.engine)
+        
+        # إضافة مستويات VIP الافتراضية
+        if VIPLevel.query.count() == 0:
+            vip_levels = [
+                VIPLevel(level_name='برونزي', min_spent=0, discount_percentage=0),
+                VIPLevel(level_name='فضي', min_spent=1000, discount_percentage=5),
+                VIPLevel(level_name='ذهبي', min_spent=5000, discount_percentage=10),
+                VIPLevel(level_name='بلاتيني', min_spent=10000, discount_percentage=15),
+                VIPLevel(level_name='ماسي', min_spent=25000, discount_percentage=20),
+            ]
+            for level in vip_levels:
+                db.session.add(level)
+        
+        # إضافة طرق دفع افتراضية
+        if PaymentMethod.query.count() == 0:
+            payment_methods = [
+                PaymentMethod(
+                    name='تحويل بنكي - البنك الأهلي',
+                    details='رقم الحساب: 1234567890\nاسم المستلم: متجر الألعاب'
+                ),
+                PaymentMethod(
+                    name='فودافون كاش',
+                    details='رقم المحفظة: 01012345678\nاسم المستلم: متجر الألعاب'
+                ),
+                PaymentMethod(
+                    name='أورانج موني',
+                    details='رقم المحفظة: 01112345678\nاسم المستلم: متجر الألعاب'
+                ),
+                PaymentMethod(
+                    name='إتصالات كاش',
+                    details='رقم المحفظة: 01012345678\nاسم المستلم: متجر الألعاب'
+                ),
+            ]
+            for method in payment_methods:
+                db.session.add(method)
+        
+        # إضافة أقسام تجريبية
+        if Category.query.count() == 0:
+            categories = [
+                Category(name='ألعاب الهاتف', description='شحن ألعاب الهاتف المحمول'),
+                Category(name='ألعاب الكمبيوتر', description='شحن ألعاب الكمبيوتر'),
+                Category(name='بطاقات الألعاب', description='بطاقات شحن متنوعة'),
+                Category(name='تطبيقات أخرى', description='شحن التطبيقات المختلفة'),
+            ]
+            for category in categories:
+                db.session.add(category)
+        
+        # إضافة منتجات تجريبية
+        seeded_products = Product.query.count() == 0
+        if seeded_products:
+            products = [
+                Product(
+                    name='شحن PUBG Mobile - 60 UC',
+                    category_id=1,
+                    description='شحن 60 UC لـ PUBG Mobile',
+                    cost_price=5.0,
+                    sell_price=8.0,
+                    product_type='بدون'
+                ),
+                Product(
+                    name='شحن PUBG Mobile - UC مخصص',
+                    category_id=1,
+                    description='شحن UC بالكمية المطلوبة',
+                    cost_price=0.1,
+                    sell_price=0.15,
+                    product_type='عداد'
+                ),
+                Product(
+                    name='شحن Free Fire - الماس',
+                    category_id=1,
+                    description='شحن الماس لـ Free Fire',
+                    cost_price=10.0,
+                    sell_price=15.0,
+                    product_type='كميات'
+                ),
+            ]
+            for product in products:
+                db.session.add(product)
+        
+        db.session.commit()
+        
+        # المنتجات التجريبية أضيفت بعد ترحيل فهرس البحث
+        if seeded_products and product_search.is_enabled(db.session):
+            product_search.rebuild(db.session)
+            db.session.commit()
+        
+        # إصدار الكتالوج المستخدم في اللقطات و ETag
+        ensure_version_row(db.session)
 
 # المسارات
-@app.route('/api/health', methods=['GET'])
+@main_bp.route('/api/health', methods=['GET'])
 def health_check():
     """فحص صحة الخادم"""
     return jsonify({
         'success': True,
         'message': 'الخادم يعمل بشكل طبيعي',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'token_cache': token_verifier.stats() if token_verifier is not None else None
     })
 
-@app.route('/api/categories', methods=['GET'])
-def get_categories():
-    """الحصول على جميع الأقسام"""
+def build_categories_payload():
+    return {
+        'success': True,
+        'data': serialize_rows(Category.query, Category)
+    }
+
+def build_products_payload(category_id=None):
+    query = Product.query
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    return {
+        'success': True,
+        'data': serialize_rows(query, Product)
+    }
+
+def build_payment_methods_payload():
+    return {
+        'success': True,
+        'data': serialize_rows(PaymentMethod.query.filter_by(is_active=True), PaymentMethod)
+    }
+
+def build_catalog_payload():
+    return {
+        'success': True,
+        'version': catalog_snapshots.current_version(db.session),
+        'data': {
+            'categories': build_categories_payload()['data'],
+            'products': build_products_payload()['data'],
+            'payment_methods': build_payment_methods_payload()['data']
+        }
+    }
+
+@main_bp.route('/api/catalog', methods=['GET'])
+def get_catalog():
+    """لقطة كاملة للكتالوج (الأقسام والمنتجات وطرق الدفع) مع ETag"""
+    try:
+        return catalog_snapshots.respond(db.session, 'catalog', build_catalog_payload)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب الكتالوج: {str(e)}'
+        }), 500
+
+@main_bp.route('/api/catalog/changes', methods=['GET'])
+def get_catalog_changes():
+    """التغييرات في الكتالوج منذ إصدار معين (مزامنة جزئية)"""
     try:
-        categories = Category.query.all()
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({
+                'success': False,
+                'message': 'الحقل since مطلوب ويجب أن يكون رقماً صحيحاً'
+            }), 400
+        
+        # قراءة الإصدار مباشرة من قاعدة البيانات
+        catalog_snapshots.mark_stale()
+        version = catalog_snapshots.current_version(db.session)
+        
+        latest = changes_since(db.session, since, version, limit=5000) if since <= version else None
+        
+        # تغييرات كثيرة أو إصدار غير معروف: يجب على العميل جلب /api/catalog كاملاً
+        if latest is None:
+            return jsonify({
+                'success': True,
+                'version': version,
+                'reset': True
+            }), 200
+        
+        models = {
+            'category': (Category, Category.category_id, 'categories'),
+            'product': (Product, Product.product_id, 'products'),
+            'payment_method': (PaymentMethod, PaymentMethod.method_id, 'payment_methods'),
+        }
+        
+        upserted = {key: [] for _, _, key in models.values()}
+        deleted = {key: [] for _, _, key in models.values()}
+        
+        for entity_type, (model, id_column, key) in models.items():
+            upsert_ids = [entity_id for (kind, entity_id), operation in latest.items()
+                          if kind == entity_type and operation == 'upsert']
+            deleted[key] = [entity_id for (kind, entity_id), operation in latest.items()
+                            if kind == entity_type and operation == 'delete']
+            
+            if upsert_ids:
+                for row in model.query.filter(id_column.in_(upsert_ids)).all():
+                    # طريقة الدفع المعطلة تعتبر محذوفة بالنسبة للعميل
+                    if entity_type == 'payment_method' and not row.is_active:
+                        deleted[key].append(row.method_id)
+                    else:
+                        upserted[key].append(row.to_dict())
+        
         return jsonify({
             'success': True,
-            'data': [category.to_dict() for category in categories]
+            'version': version,
+            'reset': False,
+            'upserted': upserted,
+            'deleted': deleted
         }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب تغييرات الكتالوج: {str(e)}'
+        }), 500
+
+@main_bp.route('/api/categories', methods=['GET'])
+def get_categories():
+    """الحصول على جميع الأقسام"""
+    try:
+        return catalog_snapshots.respond(db.session, 'categories', build_categories_payload)
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'خطأ في جلب الأقسام: {str(e)}'
         }), 500
 
-@app.route('/api/products', methods=['GET'])
+@main_bp.route('/api/products', methods=['GET'])
 def get_products():
     """الحصول على جميع المنتجات"""
     try:
         category_id = request.args.get('category_id', type=int)
         
-        query = Product.query
-        if category_id:
-            query = query.filter_by(category_id=category_id)
-        
-        products = query.all()
-        return jsonify({
-            'success': True,
-            'data': [product.to_dict() for product in products]
-        }), 200
+        return catalog_snapshots.respond(
+            db.session,
+            ('products', category_id),
+            lambda: build_products_payload(category_id)
+        )
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'خطأ في جلب المنتجات: {str(e)}'
         }), 500
 
-@app.route('/api/payment-methods', methods=['GET'])
+@main_bp.route('/api/payment-methods', methods=['GET'])
 def get_payment_methods():
     """الحصول على طرق الدفع المتاحة"""
     try:
-        methods = PaymentMethod.query.filter_by(is_active=True).all()
-        return jsonify({
-            'success': True,
-            'data': [method.to_dict() for method in methods]
-        }), 200
+        return catalog_snapshots.respond(db.session, 'payment_methods', build_payment_methods_payload)
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'خطأ في جلب طرق الدفع: {str(e)}'
         }), 500
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@main_bp.route('/', defaults={'path': ''})
+@main_bp.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
+    static_folder_path = current_app.static_folder
     if static_folder_path is None:
             return "Static folder not configured", 404
 
@@ -319,6 +367,175 @@ def serve(path):
         else:
             return "index.html not found", 404
 
+def create_app():
+    """إنشاء التطبيق دون أي عمل ثقيل (لا بذر بيانات ولا تهيئة Firebase)"""
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    
+    # مسار إضافة الرصيد المباشر (للاختبار فقط) معطل ما لم يفعل صراحة
+    app.config['ALLOW_TEST_TOPUP'] = os.environ.get('ALLOW_TEST_TOPUP') == '1'
+    
+    # تمكين CORS للسماح بطلبات من Flutter
+    CORS(app)
+    
+    # ترميز JSON أسرع عبر orjson إذا كانت مثبتة
+    install_json_provider(app)
+    
+    # إعداد قاعدة البيانات
+    # DATABASE_URL يحدد الخادم (PostgreSQL مثلاً)، والافتراضي ملف SQLite المحلي
+    app.config.update(database_config_from_env(
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    ))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # إنشاء مجلد قاعدة البيانات إذا لم يكن موجوداً
+    os.makedirs(os.path.join(os.path.dirname(__file__), 'database'), exist_ok=True)
+    
+    # إعدادات اتصالات SQLite (WAL و busy_timeout ...) ويمكن تعديلها بـ JSON في SQLITE_PRAGMAS
+    app.config['SQLITE_PRAGMAS'] = {**DEFAULT_SQLITE_PRAGMAS, **json.loads(os.environ.get('SQLITE_PRAGMAS', '{}'))}
+    app.config['SQLALCHEMY_READONLY_POOL'] = os.environ.get('DB_READONLY_POOL', '1') != '0'
+    
+    # تهيئة قاعدة البيانات المشتركة لجميع النماذج
+    configure_database(app)
+    
+    # تخزين صور إثبات الدفع (قرص محلي افتراضياً، ويمكن استبداله بتخزين آخر بنفس الواجهة)
+    app.config.setdefault('PROOF_STORAGE', LocalProofStorage(
+        os.environ.get('PROOF_STORAGE_DIR', os.path.join(os.path.dirname(__file__), 'database', 'proofs')),
+        max_bytes=int(os.environ.get('PROOF_MAX_BYTES', str(10 * 1024 * 1024)))
+    ))
+    
+    # رقم إصدار الكتالوج في ملف مشترك بين عمال نفس الخادم: تبطل اللقطات في جميعها فور أي تعديل،
+    # والخوادم الأخرى تراه من قاعدة البيانات خلال CATALOG_VERSION_TTL (قيمة فارغة تعطل الملف)
+    version_file = os.environ.get(
+        'CATALOG_VERSION_FILE',
+        os.path.join(os.path.dirname(__file__), 'database', 'catalog.version')
+    )
+    if version_file:
+        catalog_snapshots.use_store(FileVersionStore(version_file))
+    
+    # إبطال نسخ المستخدمين المخزنة (حظر، رصيد، VIP) في جميع العمليات وليس في العملية الحالية فقط
+    identity_events_file = os.environ.get(
+        'IDENTITY_EVENTS_FILE',
+        os.path.join(os.path.dirname(__file__), 'database', 'identity.events')
+    )
+    if identity_events_file:
+        identity_cache.use_events(EventLog(identity_events_file))
+    
+    # أحداث الإشعارات بين العمال لتحديث عدادات غير المقروء ودفعها عبر SSE (قيمة فارغة تعطلها)
+    events_file = os.environ.get(
+        'NOTIFICATION_EVENTS_FILE',
+        os.path.join(os.path.dirname(__file__), 'database', 'notifications.events')
+    )
+    if events_file:
+        notification_hub.use_events(EventLog(events_file))
+    
+    # جدول مستويات VIP يحمل في الذاكرة عند أول استخدام
+    vip_tiers.bind(VIPLevel)
+    
+    # ربط المسارات: النماذج تستورد مرة واحدة هنا وليس داخل كل طلب
+    from src.routes.auth import auth_bp
+    from src.routes.category import category_bp
+    from src.routes.notification import admin_notification_bp, notification_bp
+    from src.routes.order import admin_order_bp, order_bp
+    from src.routes.payment import admin_payment_bp, payment_bp
+    from src.routes.product import product_bp
+    from src.routes.user import user_bp
+    from src.routes.user_management import user_management_bp
+    
+    # مسارات الإدارة (/api/admin) وإدارة المستخدمين (/api/users) تتطلب صلاحية المشرف
+    # في رمز Firebase (custom claim: admin)، ويتحقق منها before_request في كل blueprint
+    app.register_blueprint(main_bp)
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(user_management_bp, url_prefix='/api/user')
+    app.register_blueprint(order_bp, url_prefix='/api/user')
+    app.register_blueprint(payment_bp, url_prefix='/api/user')
+    app.register_blueprint(notification_bp, url_prefix='/api/user')
+    app.register_blueprint(category_bp, url_prefix='/api/admin')
+    app.register_blueprint(product_bp, url_prefix='/api/admin')
+    app.register_blueprint(admin_order_bp, url_prefix='/api/admin')
+    app.register_blueprint(admin_payment_bp, url_prefix='/api/admin')
+    app.register_blueprint(admin_notification_bp, url_prefix='/api/admin')
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """إنشاء الجداول وإضافة البيانات الافتراضية"""
+        init_database(app)
+        print('✔ Database initialized!')
+    
+    @app.cli.command('migrate')
+    def migrate_command():
+        """تطبيق ترحيلات المخطط غير المطبقة"""
+        run_migrations(db.engine)
+    
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """التحقق من أن الاستعلامات الأساسية تستخدم الفهارس (SQLite)"""
+        failed = False
+        for name, statement in hot_queries().items():
+            plan = explain(db.session, statement)
+            scans = table_scans(plan)
+            print(f"{'✘' if scans else '✔'} {name}: {' | '.join(plan)}")
+            failed = failed or bool(scans)
+        if failed:
+            sys.exit(1)
+    
+    @app.cli.command('balance-snapshot')
+    @click.option('--reconcile', is_flag=True, help='مقارنة الأرصدة بسجل الحركات بعد أخذ اللقطة')
+    def balance_snapshot_command(reconcile):
+        """أخذ لقطة لأرصدة المستخدمين (يشغل دورياً، مثلاً من cron)"""
+        count = balance.take_snapshots(db.session)
+        db.session.commit()
+        print(f'✔ {count} balance snapshots')
+        if reconcile:
+            mismatches = balance.reconcile(db.session)
+            for user_id, stored, expected in mismatches:
+                print(f'✘ user {user_id}: balance {stored} != ledger {expected}')
+            if mismatches:
+                sys.exit(1)
+    
+    @app.cli.command('fulfillment-worker')
+    @click.option('--workers', type=int, default=None, help='عدد الخيوط (الافتراضي: FULFILLMENT_WORKERS)')
+    @click.option('--once', is_flag=True, help='تنفيذ دفعة واحدة من المهام المستحقة ثم الخروج')
+    def fulfillment_worker_command(workers, once):
+        """تشغيل عامل تنفيذ طلبات المنتجات المرتبطة بمزود (api_linked)"""
+        worker = worker_from_env(app)
+        if workers:
+            worker.workers = workers
+        if once:
+            print(f'✔ {worker.run_once()} jobs processed')
+            return
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
+    
+    @app.cli.command('fulfillment-stub')
+    @click.option('--port', default=8099, show_default=True)
+    @click.option('--fail-rate', default=0.0, help='نسبة ردود 503')
+    @click.option('--reject-rate', default=0.0, help='نسبة ردود 400')
+    @click.option('--delay', default=0.0, help='تأخير كل رد (ثانية)')
+    def fulfillment_stub_command(port, fail_rate, reject_rate, delay):
+        """مزود محلي للتجربة: api_details = {"url": "http://127.0.0.1:8099/orders"}"""
+        stub_provider_app(fail_rate, reject_rate, delay).run(port=port, threaded=True)
+    
+    @app.cli.command('copy-db')
+    @click.argument('target_url')
+    @click.option('--source', 'source_url', default=None, help='قاعدة البيانات المصدر (الافتراضي: الحالية)')
+    @click.option('--batch-size', default=1000, show_default=True)
+    @click.option('--truncate', is_flag=True, help='حذف بيانات الجداول في الهدف قبل النسخ')
+    def copy_db_command(target_url, source_url, batch_size, truncate):
+        """نسخ قاعدة البيانات الحالية (مثلاً app.db) إلى خادم آخر"""
+        copy_database(
+            source_url or app.config['SQLALCHEMY_DATABASE_URI'],
+            target_url,
+            batch_size=batch_size,
+            truncate=truncate
+        )
+    
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    init_database(app)
     app.run(host='0.0.0.0', port=5000, debug=True)
-
@@ -0,0 +1,41 @@
+from src.models.db import db
+from datetime import datetime
+from src.services.serialization import serialize
+
+class BalanceLedger(db.Model):
+    __tablename__ = 'balance_ledger'
+    __table_args__ = (
+        # حركات المستخدم بالترتيب (كشف الحساب والمطابقة بعد آخر لقطة)
+        db.Index('ix_balance_ledger_user_entry', 'user_id', 'entry_id'),
+    )
+
+    # سجل إلحاقي فقط: لا يعدل ولا يحذف أي صف
+    entry_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    amount_minor = db.Column(db.BigInteger, nullable=False)  # بالهللة: موجب للإيداع وسالب للخصم
+    balance_after_minor = db.Column(db.BigInteger, nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # 'topup', 'order', 'refund', 'payment', 'adjustment'
+    reference = db.Column(db.String(100))  # مثل 'order:15' أو 'payment:7'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return serialize(self)
+
+    def __repr__(self):
+        return f'<BalanceLedger {self.user_id}:{self.amount_minor}>'
+
+class BalanceSnapshot(db.Model):
+    __tablename__ = 'balance_snapshots'
+
+    # لقطة دورية لكل مستخدم: الرصيد = اللقطة + مجموع الحركات بعد last_entry_id
+    snapshot_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
+    balance_minor = db.Column(db.BigInteger, nullable=False)
+    last_entry_id = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return serialize(self)
+
+    def __repr__(self):
+        return f'<BalanceSnapshot {self.user_id}@{self.last_entry_id}>'
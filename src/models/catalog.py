@@ -0,0 +1,34 @@
+from src.models.db import db
+from datetime import datetime
+from src.services.serialization import serialize
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+    __serialize_exclude__ = ('id',)
+    
+    # صف واحد فقط (id = 1) يحمل رقم إصدار الكتالوج الحالي
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return serialize(self)
+    
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+class CatalogChange(db.Model):
+    __tablename__ = 'catalog_changes'
+    
+    change_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    entity_type = db.Column(db.String(30), nullable=False)  # 'category', 'product', 'payment_method'
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # 'upsert', 'delete'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return serialize(self)
+    
+    def __repr__(self):
+        return f'<CatalogChange {self.entity_type}:{self.entity_id} v{self.version}>'
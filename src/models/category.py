@@ -1,10 +1,13 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.db import db
 from datetime import datetime
-
-db = SQLAlchemy()
+from src.services.serialization import serialize
 
 class Category(db.Model):
     __tablename__ = 'categories'
+    __table_args__ = (
+        # التحقق من تكرار اسم القسم
+        db.Index('ix_categories_name', 'name'),
+    )
     
     category_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -17,14 +20,7 @@ class Category(db.Model):
     products = db.relationship('Product', backref='category', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
-        return {
-            'category_id': self.category_id,
-            'name': self.name,
-            'description': self.description,
-            'image_url': self.image_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<Category {self.name}>'
@@ -0,0 +1,106 @@
+import os
+
+from flask import has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# مفتاح مجمع الاتصالات المخصص للقراءة فقط
+READONLY_BIND = 'readonly'
+
+# إعدادات SQLite الافتراضية عند فتح كل اتصال (قابلة للتعديل عبر app.config['SQLITE_PRAGMAS'])
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+
+class RoutingSession(Session):
+    """جلسة توجه استعلامات طلبات GET إلى مجمع القراءة فقط"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and request.method in ('GET', 'HEAD')
+        ):
+            engine = self._db.engines.get(READONLY_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# نسخة واحدة مشتركة لجميع النماذج: محرك واحد ومجمع اتصالات واحد وسجل نماذج واحد
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def _sqlite_pragmas_listener(pragmas, readonly):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # وضع السجل خاصية دائمة لملف قاعدة البيانات ويحددها اتصال الكتابة
+            if readonly and name == 'journal_mode':
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+        if readonly:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return set_pragmas
+
+
+def database_config_from_env(default_uri):
+    """إعدادات قاعدة البيانات من متغيرات البيئة (DATABASE_URL و DB_POOL_*)"""
+    uri = os.environ.get('DATABASE_URL', default_uri)
+
+    # بعض المنصات تستخدم البادئة القديمة postgres://
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_READONLY_DATABASE_URI': os.environ.get('DATABASE_READONLY_URL'),
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+    }
+
+    if not uri.startswith('sqlite'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '10')),
+            'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+        }
+
+    return config
+
+
+def configure_database(app):
+    """تهيئة قاعدة البيانات مع إعدادات الاتصال ومجمع القراءة فقط"""
+    app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    app.config.setdefault('SQLALCHEMY_READONLY_POOL', True)
+
+    if app.config['SQLALCHEMY_READONLY_POOL']:
+        # SQLite: نفس الملف بمجمع منفصل، غير ذلك: نسخة قراءة (replica) إن وجدت
+        readonly_uri = app.config.get('SQLALCHEMY_READONLY_DATABASE_URI')
+        if not readonly_uri and app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+            readonly_uri = app.config['SQLALCHEMY_DATABASE_URI']
+        if readonly_uri:
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            binds.setdefault(READONLY_BIND, {
+                'url': readonly_uri,
+                **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+            })
+
+    db.init_app(app)
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _sqlite_pragmas_listener(
+                    app.config['SQLITE_PRAGMAS'],
+                    readonly=key == READONLY_BIND
+                ))
@@ -0,0 +1,26 @@
+from src.models.db import db
+from datetime import datetime
+from src.services.serialization import serialize
+
+class FulfillmentJob(db.Model):
+    __tablename__ = 'fulfillment_jobs'
+    __table_args__ = (
+        # العامل يبحث عن المهام المستحقة حسب الحالة ووقت المحاولة التالية
+        db.Index('ix_fulfillment_jobs_status_next', 'status', 'next_attempt_at'),
+    )
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)  # مهلة الحجز: تعود المهمة للطابور إذا توقف العامل
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return serialize(self)
+
+    def __repr__(self):
+        return f'<FulfillmentJob {self.order_id} {self.status}>'
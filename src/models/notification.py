@@ -1,10 +1,13 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.db import db
 from datetime import datetime
-
-db = SQLAlchemy()
+from src.services.serialization import serialize
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # إشعارات المستخدم غير المقروءة مرتبة زمنياً
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read', 'created_at'),
+    )
     
     notification_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=True)  # NULL for global notifications
@@ -14,18 +17,44 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
-        return {
-            'notification_id': self.notification_id,
-            'user_id': self.user_id,
-            'title': self.title,
-            'message': self.message,
-            'is_read': self.is_read,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<Notification {self.title}>'
 
+class Broadcast(db.Model):
+    __tablename__ = 'broadcasts'
+    
+    # إشعار عام لجميع المستخدمين: صف واحد مهما كان عدد المستخدمين
+    broadcast_id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, unique=True)  # تسلسل متصل 1, 2, 3... لحساب غير المقروء
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return serialize(self)
+    
+    def __repr__(self):
+        return f'<Broadcast {self.seq}>'
+
+class NotificationReadMarker(db.Model):
+    __tablename__ = 'notification_read_markers'
+    
+    # حالة القراءة لكل مستخدم: كل الإشعارات العامة حتى read_upto_seq مقروءة،
+    # وبعدها فقط ما في read_exceptions (قائمة JSON قصيرة)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    read_upto_seq = db.Column(db.Integer, nullable=False, default=0)
+    read_exceptions = db.Column(db.Text, nullable=False, default='[]')
+    unread_personal = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return serialize(self)
+    
+    def __repr__(self):
+        return f'<NotificationReadMarker {self.user_id}@{self.read_upto_seq}>'
+
 class AppSettings(db.Model):
     __tablename__ = 'app_settings'
     
@@ -34,11 +63,7 @@ class AppSettings(db.Model):
     value = db.Column(db.Text)
     
     def to_dict(self):
-        return {
-            'setting_id': self.setting_id,
-            'key': self.key,
-            'value': self.value
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<AppSettings {self.key}>'
@@ -52,12 +77,7 @@ class TelegramSettings(db.Model):
     is_active = db.Column(db.Boolean, default=False)
     
     def to_dict(self):
-        return {
-            'setting_id': self.setting_id,
-            'bot_token': self.bot_token,
-            'chat_id': self.chat_id,
-            'is_active': self.is_active
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<TelegramSettings {self.setting_id}>'
@@ -74,15 +94,7 @@ class AnimatedAsset(db.Model):
     end_date = db.Column(db.DateTime)
     
     def to_dict(self):
-        return {
-            'asset_id': self.asset_id,
-            'type': self.type,
-            'content': self.content,
-            'location': self.location,
-            'is_active': self.is_active,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<AnimatedAsset {self.type}>'
@@ -1,33 +1,31 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.db import db
 from datetime import datetime
-
-db = SQLAlchemy()
+from src.services.serialization import serialize
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # التحقق من طلبات منتج قبل حذفه، وطلبات المستخدم مرتبة زمنياً
+        db.Index('ix_orders_product', 'product_id'),
+        db.Index('ix_orders_user_created', 'user_id', 'created_at'),
+        # إعادة إرسال نفس الطلب بنفس Idempotency-Key لا تنشئ طلباً ثانياً
+        db.Index('ux_orders_user_idempotency', 'user_id', 'idempotency_key', unique=True),
+    )
+    __serialize_exclude__ = ('idempotency_key',)
     
     order_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(50), nullable=False, default='قيد العمل')  # 'قيد العمل', 'منفذة', 'مرفوضة', 'شحن'
+    status = db.Column(db.String(50), nullable=False, default='قيد العمل')  # 'قيد العمل', 'جاري التنفيذ', 'منفذة', 'مرفوضة', 'شحن'
     order_details = db.Column(db.Text)  # JSON string for order details (game ID, player name, etc.)
+    idempotency_key = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
-        return {
-            'order_id': self.order_id,
-            'user_id': self.user_id,
-            'product_id': self.product_id,
-            'quantity': self.quantity,
-            'total_price': self.total_price,
-            'status': self.status,
-            'order_details': self.order_details,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<Order {self.order_id}>'
@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.db import db
 from datetime import datetime
-
-db = SQLAlchemy()
+from src.services.serialization import serialize
+from sqlalchemy import literal_column
 
 class PaymentMethod(db.Model):
     __tablename__ = 'payment_methods'
@@ -14,23 +14,28 @@ class PaymentMethod(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # العلاقات
-    # transactions = db.relationship('PaymentTransaction', backref='payment_method', lazy=True)
+    transactions = db.relationship('PaymentTransaction', backref='payment_method', lazy=True)
     
     def to_dict(self):
-        return {
-            'method_id': self.method_id,
-            'name': self.name,
-            'details': self.details,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<PaymentMethod {self.name}>'
 
 class PaymentTransaction(db.Model):
     __tablename__ = 'payment_transactions'
+    __table_args__ = (
+        # معاملات المستخدم حسب الحالة مرتبة زمنياً
+        db.Index('ix_payment_transactions_user_status', 'user_id', 'status', 'created_at'),
+        db.Index('ix_payment_transactions_status_created', 'status', 'created_at'),
+        # فهرس جزئي لطابور المراجعة: المعاملات المعلقة فقط مرتبة من الأقدم
+        db.Index(
+            'ix_payment_transactions_pending',
+            'created_at', 'transaction_id',
+            sqlite_where=db.text("status = 'معلق'"),
+            postgresql_where=db.text("status = 'معلق'")
+        ),
+    )
     
     transaction_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -41,17 +46,13 @@ class PaymentTransaction(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @classmethod
+    def pending_clause(cls):
+        """شرط المعاملات المعلقة بقيمة ثابتة في SQL حتى يطابق شرط الفهرس الجزئي"""
+        return cls.status == literal_column("'معلق'")
+    
     def to_dict(self):
-        return {
-            'transaction_id': self.transaction_id,
-            'user_id': self.user_id,
-            'amount': self.amount,
-            'method_id': self.method_id,
-            'status': self.status,
-            'proof_image_url': self.proof_image_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<PaymentTransaction {self.transaction_id}>'
@@ -1,10 +1,14 @@
-from flask_sqlalchemy import SQLAlchemy
+from src.models.db import db
 from datetime import datetime
-
-db = SQLAlchemy()
+from src.services.serialization import serialize
+from sqlalchemy.orm import selectinload
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # تصفح منتجات القسم بالترتيب الزمني عبر مسح نطاق في الفهرس
+        db.Index('ix_products_category_created', 'category_id', 'created_at', 'product_id'),
+    )
     
     product_id = db.Column(db.Integer, primary_key=True)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False)
@@ -22,27 +26,27 @@ class Product(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # العلاقات
-    # orders = db.relationship('Order', backref='product', lazy=True)
+    orders = db.relationship('Order', backref='product', lazy=True)
     custom_options = db.relationship('ProductCustomOption', backref='product', lazy=True, cascade='all, delete-orphan')
     inventory = db.relationship('ProductInventory', backref='product', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
-        return {
-            'product_id': self.product_id,
-            'category_id': self.category_id,
-            'name': self.name,
-            'description': self.description,
-            'currency': self.currency,
-            'cost_price': self.cost_price,
-            'sell_price': self.sell_price,
-            'image_url': self.image_url,
-            'is_available': self.is_available,
-            'product_type': self.product_type,
-            'api_linked': self.api_linked,
-            'api_details': self.api_details,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
+    
+    def to_dict_with_details(self):
+        """بيانات المنتج مع الخيارات المخصصة والمخزون (يفترض أن العلاقات محملة مسبقاً)"""
+        data = self.to_dict()
+        data['custom_options'] = [option.to_dict() for option in self.custom_options]
+        data['inventory'] = self.inventory[0].to_dict() if self.inventory else None
+        return data
+    
+    @classmethod
+    def query_with_details(cls):
+        """استعلام للقوائم يحمل الخيارات والمخزون لجميع المنتجات دفعة واحدة بدلاً من استعلام لكل منتج"""
+        return cls.query.options(
+            selectinload(cls.custom_options),
+            selectinload(cls.inventory)
+        )
     
     def __repr__(self):
         return f'<Product {self.name}>'
@@ -56,12 +60,7 @@ class ProductCustomOption(db.Model):
     option_values = db.Column(db.Text)  # JSON string for option values
     
     def to_dict(self):
-        return {
-            'option_id': self.option_id,
-            'product_id': self.product_id,
-            'option_name': self.option_name,
-            'option_values': self.option_values
-        }
+        return serialize(self)
 
 class ProductInventory(db.Model):
     __tablename__ = 'product_inventory'
@@ -71,9 +70,5 @@ class ProductInventory(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=0)
     
     def to_dict(self):
-        return {
-            'inventory_id': self.inventory_id,
-            'product_id': self.product_id,
-            'quantity': self.quantity
-        }
+        return serialize(self)
 
@@ -1,17 +1,21 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import cast
+from sqlalchemy.orm import column_property
+from src.models.db import db
 from datetime import datetime
+from src.services.serialization import serialize
 from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
-
 class User(db.Model):
     __tablename__ = 'users'
+    __serialize_exclude__ = ('password_hash', 'balance_minor')
     
     user_id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    balance = db.Column(db.Float, default=0.0)
+    # الرصيد بالهللة (عدد صحيح) ويعدل فقط عبر src.services.balance
+    balance_minor = db.Column(db.BigInteger, nullable=False, default=0)
+    balance = column_property(cast(balance_minor, db.Float) / 100)
     vip_level = db.Column(db.Integer, default=1)
     total_spent = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(20), default='نشط')  # 'نشط', 'محظور'
@@ -19,9 +23,9 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # العلاقات
-    # orders = db.relationship('Order', backref='user', lazy=True)
-    # payment_transactions = db.relationship('PaymentTransaction', backref='user', lazy=True)
-    # notifications = db.relationship('Notification', backref='user', lazy=True)
+    orders = db.relationship('Order', backref='user', lazy=True)
+    payment_transactions = db.relationship('PaymentTransaction', backref='user', lazy=True)
+    notifications = db.relationship('Notification', backref='user', lazy=True)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -30,17 +34,7 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
     
     def to_dict(self):
-        return {
-            'user_id': self.user_id,
-            'username': self.username,
-            'email': self.email,
-            'balance': self.balance,
-            'vip_level': self.vip_level,
-            'total_spent': self.total_spent,
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -54,12 +48,7 @@ class VIPLevel(db.Model):
     discount_percentage = db.Column(db.Float, nullable=False)
     
     def to_dict(self):
-        return {
-            'level_id': self.level_id,
-            'level_name': self.level_name,
-            'min_spent': self.min_spent,
-            'discount_percentage': self.discount_percentage
-        }
+        return serialize(self)
     
     def __repr__(self):
         return f'<VIPLevel {self.level_name}>'
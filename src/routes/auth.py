@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.security import check_password_hash
 import jwt
 import datetime
+from src.models.user import db, User
+from src.services import inbox
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -9,8 +11,6 @@ auth_bp = Blueprint('auth', __name__)
 def login():
     """تسجيل دخول المستخدم"""
     try:
-        from src.main import db, User
-        
         data = request.get_json()
         
         # التحقق من البيانات المطلوبة
@@ -107,7 +107,6 @@ def register():
         new_user = User(
             username=data['username'],
             email=data['email'],
-            balance=0.0,
             vip_level=1,
             total_spent=0.0,
             status='نشط'
@@ -115,6 +114,8 @@ def register():
         new_user.set_password(data['password'])
         
         db.session.add(new_user)
+        db.session.flush()
+        inbox.start_marker(db.session, new_user.user_id)
         db.session.commit()
         
         return jsonify({
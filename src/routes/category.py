@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from src.models.category import db, Category
 from src.models.product import Product
+from src.services.catalog_snapshot import bump_version
+from src.routes.user_management import require_admin
+from sqlalchemy.orm import joinedload
 
 category_bp = Blueprint('category', __name__)
+category_bp.before_request(require_admin)
 
 @category_bp.route('/categories', methods=['GET'])
 def get_categories():
@@ -63,6 +67,8 @@ def create_category():
         )
         
         db.session.add(category)
+        db.session.flush()  # للحصول على category_id
+        bump_version(db.session, [('category', category.category_id, 'upsert')])
         db.session.commit()
         
         return jsonify({
@@ -108,6 +114,7 @@ def update_category(category_id):
         category.description = data.get('description', category.description)
         category.image_url = data.get('image_url', category.image_url)
         
+        bump_version(db.session, [('category', category_id, 'upsert')])
         db.session.commit()
         
         return jsonify({
@@ -138,6 +145,7 @@ def delete_category(category_id):
             }), 400
         
         db.session.delete(category)
+        bump_version(db.session, [('category', category_id, 'delete')])
         db.session.commit()
         
         return jsonify({
@@ -156,14 +164,27 @@ def delete_category(category_id):
 def get_category_products(category_id):
     """الحصول على منتجات قسم محدد"""
     try:
-        category = Category.query.get_or_404(category_id)
-        products = Product.query.filter_by(category_id=category_id).all()
+        include_details = request.args.get('include') == 'details'
+        
+        # جلب القسم ومنتجاته في استعلام واحد، والتفاصيل (إن طلبت) دفعة واحدة لجميع المنتجات
+        products_loader = joinedload(Category.products)
+        options = [products_loader]
+        if include_details:
+            options += [
+                products_loader.selectinload(Product.custom_options),
+                products_loader.selectinload(Product.inventory)
+            ]
+        
+        category = Category.query.options(*options).filter_by(category_id=category_id).first_or_404()
         
         return jsonify({
             'success': True,
             'data': {
                 'category': category.to_dict(),
-                'products': [product.to_dict() for product in products]
+                'products': [
+                    product.to_dict_with_details() if include_details else product.to_dict()
+                    for product in category.products
+                ]
             }
         }), 200
         
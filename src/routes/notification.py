@@ -0,0 +1,197 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.models.notification import db
+from src.models.user import User
+from src.routes.user_management import cached_token_required, token_required, require_admin
+from src.services import inbox
+from src.services.notification_push import notification_hub, sse_message
+import os
+import threading
+import time
+
+notification_bp = Blueprint('notification', __name__)
+
+# مدة اتصال SSE الواحد قبل أن يعيد العميل الاتصال (كل اتصال مفتوح يشغل خيطاً في gunicorn)
+SSE_MAX_SECONDS = int(os.environ.get('SSE_MAX_SECONDS', '300'))
+SSE_HEARTBEAT_SECONDS = 15
+# حد الاتصالات المفتوحة في كل عامل حتى تبقى خيوط للطلبات العادية (الافتراضي نصف WEB_THREADS)،
+# وبعده يرد 503 مع Retry-After فيعود العميل إلى استطلاع unread-count
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', int(os.environ.get('WEB_THREADS', '4')) // 2))
+SSE_RETRY_AFTER_SECONDS = 30
+
+_stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS) if SSE_MAX_STREAMS > 0 else None
+
+@notification_bp.route('/notifications', methods=['GET'])
+@cached_token_required
+def get_notifications(current_user):
+    """صندوق الإشعارات (الشخصية والعامة مدمجة من الأحدث) مع ترقيم بالمؤشر"""
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        after = request.args.get('after')
+        
+        cursor = None
+        if after:
+            try:
+                cursor = inbox.decode_cursor(db.session, after)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+        
+        items, next_cursor = inbox.inbox(db.session, current_user.user_id, cursor, limit)
+        
+        return jsonify({
+            'success': True,
+            'data': items,
+            'pagination': {
+                'limit': limit,
+                'has_next': next_cursor is not None,
+                'next_cursor': next_cursor
+            }
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب الإشعارات: {str(e)}'
+        }), 500
+
+@notification_bp.route('/notifications/unread-count', methods=['GET'])
+@cached_token_required
+def get_unread_count(current_user):
+    """عدد الإشعارات غير المقروءة"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': notification_hub.counts(db.session, current_user.user_id)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب عدد الإشعارات: {str(e)}'
+        }), 500
+
+@notification_bp.route('/notifications/stream', methods=['GET'])
+@cached_token_required
+def stream_notifications(current_user):
+    """دفع عدد غير المقروء عبر Server-Sent Events بدلاً من الاستطلاع المتكرر
+
+    يرسل الحدث unread عند الاتصال ثم عند كل تغيير يخص المستخدم أو إشعار عام،
+    مع نبضة كل SSE_HEARTBEAT_SECONDS. لا قراءة من قاعدة البيانات إلا إذا أبطل العداد.
+    """
+    slots = _stream_slots
+    if slots is None or not slots.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'message': 'عدد اتصالات الإشعارات الفورية مكتمل، استخدم /notifications/unread-count'
+        }), 503, {'Retry-After': str(SSE_RETRY_AFTER_SECONDS)}
+    
+    try:
+        user_id = current_user.user_id
+        version = notification_hub.version(user_id)
+        counts = notification_hub.counts(db.session, user_id)
+        db.session.close()
+    except Exception:
+        slots.release()
+        raise
+    
+    def generate():
+        nonlocal version, counts
+        yield f'retry: 3000\n{sse_message("unread", counts)}'
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            current = notification_hub.wait(user_id, version, SSE_HEARTBEAT_SECONDS)
+            if current == version:
+                yield ': ping\n\n'
+                continue
+            version = current
+            latest = notification_hub.counts(db.session, user_id)
+            # إعادة الاتصال إلى المجمع فوراً: الاتصال يبقى مفتوحاً لدقائق
+            db.session.close()
+            if latest != counts:
+                counts = latest
+                yield sse_message('unread', counts)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # يحرر المكان عند إغلاق الاتصال حتى لو لم يبدأ البث
+    response.call_on_close(slots.release)
+    return response
+
+@notification_bp.route('/notifications/read', methods=['POST'])
+@token_required
+def mark_notifications_read(current_user):
+    """تعليم الإشعارات كمقروءة: {"notification_ids": [...], "broadcast_seqs": [...]} أو {"all": true}"""
+    try:
+        data = request.get_json() or {}
+        
+        counts = inbox.mark_read(
+            db.session,
+            current_user.user_id,
+            notification_ids=[int(i) for i in data.get('notification_ids') or []],
+            broadcast_seqs=[int(seq) for seq in data.get('broadcast_seqs') or []],
+            mark_all=bool(data.get('all'))
+        )
+        
+        notification_hub.marked_read(current_user.user_id, counts)
+        
+        return jsonify({
+            'success': True,
+            'message': 'تم تحديث حالة الإشعارات',
+            'data': counts
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في تحديث حالة الإشعارات: {str(e)}'
+        }), 500
+
+admin_notification_bp = Blueprint('admin_notification', __name__)
+admin_notification_bp.before_request(require_admin)
+
+@admin_notification_bp.route('/notifications', methods=['POST'])
+def send_notification():
+    """إرسال إشعار لمستخدم محدد (user_id) أو إشعار عام لجميع المستخدمين (بدون user_id)"""
+    try:
+        data = request.get_json() or {}
+        
+        if not data.get('title') or not data.get('message'):
+            return jsonify({
+                'success': False,
+                'message': 'الحقلان title و message مطلوبان'
+            }), 400
+        
+        user_id = data.get('user_id')
+        if user_id is None:
+            broadcast = inbox.create_broadcast(db.session, data['title'], data['message'])
+            notification_hub.broadcast_created()
+            return jsonify({
+                'success': True,
+                'message': 'تم إرسال الإشعار العام',
+                'data': broadcast.to_dict()
+            }), 201
+        
+        if not db.session.get(User, int(user_id)):
+            return jsonify({
+                'success': False,
+                'message': 'المستخدم غير موجود'
+            }), 404
+        
+        notification = inbox.create_notification(db.session, int(user_id), data['title'], data['message'])
+        notification_hub.personal_created(int(user_id))
+        return jsonify({
+            'success': True,
+            'message': 'تم إرسال الإشعار',
+            'data': notification.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في إرسال الإشعار: {str(e)}'
+        }), 500
@@ -0,0 +1,160 @@
+from flask import Blueprint, request, jsonify
+from src.models.order import db, Order
+from src.routes.user_management import cached_token_required, token_required, require_admin
+from src.services.identity_cache import identity_cache
+from src.services.orders import OrderError, place_order, transition_orders
+from src.services.serialization import get_row_serializer, row_columns
+import json
+
+order_bp = Blueprint('order', __name__)
+
+@order_bp.route('/orders', methods=['POST'])
+@token_required
+def create_order(current_user):
+    """إنشاء طلب شراء (يدعم ترويسة Idempotency-Key لإعادة المحاولة بأمان)"""
+    try:
+        data = request.get_json() or {}
+        
+        if not data.get('product_id'):
+            return jsonify({
+                'success': False,
+                'message': 'الحقل product_id مطلوب'
+            }), 400
+        
+        quantity = int(data.get('quantity', 1))
+        if quantity <= 0:
+            return jsonify({
+                'success': False,
+                'message': 'الكمية يجب أن تكون أكبر من صفر'
+            }), 400
+        
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key and len(idempotency_key) > 64:
+            return jsonify({
+                'success': False,
+                'message': 'مفتاح Idempotency-Key طويل جداً'
+            }), 400
+        
+        order_details = data.get('order_details')
+        if order_details is not None and not isinstance(order_details, str):
+            order_details = json.dumps(order_details, ensure_ascii=False)
+        
+        order, created = place_order(
+            db.session,
+            current_user.user_id,
+            int(data['product_id']),
+            quantity=quantity,
+            order_details=order_details,
+            idempotency_key=idempotency_key
+        )
+        
+        if created:
+            identity_cache.invalidate_user(current_user.user_id)
+        
+        response = jsonify({
+            'success': True,
+            'message': 'تم إنشاء الطلب بنجاح',
+            'data': order.to_dict()
+        })
+        if not created:
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response, 201 if created else 200
+    
+    except OrderError as e:
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في إنشاء الطلب: {str(e)}'
+        }), 500
+
+@order_bp.route('/orders', methods=['GET'])
+@cached_token_required
+def get_orders(current_user):
+    """طلبات المستخدم من الأحدث إلى الأقدم"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        serialize = get_row_serializer(Order)
+        rows = (
+            Order.query
+            .with_entities(*row_columns(Order))
+            .filter(Order.user_id == current_user.user_id)
+            .order_by(Order.created_at.desc(), Order.order_id.desc())
+            .limit(limit)
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': [serialize(row) for row in rows]
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب الطلبات: {str(e)}'
+        }), 500
+
+
+admin_order_bp = Blueprint('admin_order', __name__)
+admin_order_bp.before_request(require_admin)
+
+# أقصى عدد طلبات في عملية تحديث جماعية واحدة
+MAX_BULK_ORDERS = 1000
+
+@admin_order_bp.route('/orders/status', methods=['POST'])
+def update_orders_status():
+    """تحديث حالة عدة طلبات دفعة واحدة مع نتيجة لكل طلب"""
+    try:
+        data = request.get_json() or {}
+        order_ids = data.get('order_ids')
+        status = data.get('status')
+        
+        if not status or not isinstance(order_ids, list) or not order_ids:
+            return jsonify({
+                'success': False,
+                'message': 'الحقلان order_ids و status مطلوبان'
+            }), 400
+        
+        if len(order_ids) > MAX_BULK_ORDERS:
+            return jsonify({
+                'success': False,
+                'message': f'الحد الأقصى {MAX_BULK_ORDERS} طلب في العملية الواحدة'
+            }), 400
+        
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'order_ids يجب أن تكون أرقاماً صحيحة'
+            }), 400
+        
+        results, affected_users = transition_orders(db.session, order_ids, status)
+        for user_id in affected_users:
+            identity_cache.invalidate_user(user_id)
+        
+        updated = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'message': f'تم تحديث {updated} من {len(results)} طلب',
+            'data': {
+                'updated': updated,
+                'results': results
+            }
+        }), 200
+        
+    except OrderError as e:
+        return jsonify({
+            'success': False,
+            'message': e.message
+        }), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في تحديث حالة الطلبات: {str(e)}'
+        }), 500
@@ -0,0 +1,377 @@
+from flask import Blueprint, request, jsonify, current_app, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+from src.models.payment import db, PaymentMethod, PaymentTransaction
+from src.routes.user_management import token_required, require_admin
+from src.services.catalog_snapshot import bump_version
+from src.services import keyset
+from src.services.identity_cache import identity_cache
+from src.services.payments import review_transactions
+from src.services.proof_storage import FileTooLarge, is_digest, sniff_mimetype, thumbnails
+from src.services.serialization import get_row_serializer, row_columns, serialize_rows
+import os
+
+payment_bp = Blueprint('payment', __name__)
+
+# الصور معنونة بالمحتوى فلا يتغير الملف تحت نفس العنوان أبداً
+PROOF_CACHE_MAX_AGE = 31536000
+
+def proof_url(digest):
+    return f'/api/admin/payments/proofs/{digest}'
+
+@payment_bp.route('/payments/<int:transaction_id>/proof', methods=['POST'])
+@token_required
+def upload_payment_proof(current_user, transaction_id):
+    """رفع صورة إثبات الدفع (حقل proof في multipart) مع كتابتها مباشرة إلى التخزين"""
+    storage = current_app.config['PROOF_STORAGE']
+    writers = []
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        writer = storage.writer()
+        writers.append(writer)
+        return writer
+    
+    try:
+        transaction = PaymentTransaction.query.filter_by(
+            transaction_id=transaction_id,
+            user_id=current_user.user_id
+        ).first()
+        
+        if not transaction:
+            return jsonify({
+                'success': False,
+                'message': 'المعاملة غير موجودة'
+            }), 404
+        
+        if transaction.status != 'معلق':
+            return jsonify({
+                'success': False,
+                'message': 'لا يمكن تعديل إثبات معاملة تمت مراجعتها'
+            }), 400
+        
+        try:
+            _, _, files = parse_form_data(
+                request.environ,
+                stream_factory=stream_factory,
+                max_content_length=storage.max_bytes + 64 * 1024,
+                silent=False
+            )
+        except (FileTooLarge, RequestEntityTooLarge):
+            return jsonify({
+                'success': False,
+                'message': f'حجم الملف أكبر من الحد المسموح ({storage.max_bytes // (1024 * 1024)} ميجابايت)'
+            }), 413
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': f'ملف غير صالح: {str(e)}'
+            }), 400
+        
+        upload = files.get('proof')
+        if upload is None:
+            return jsonify({
+                'success': False,
+                'message': 'الحقل proof مطلوب'
+            }), 400
+        
+        writer = upload.stream
+        if sniff_mimetype(writer.head) is None:
+            return jsonify({
+                'success': False,
+                'message': 'نوع الملف غير مدعوم (JPEG أو PNG أو WebP فقط)'
+            }), 400
+        
+        digest, _ = storage.commit(writer)
+        thumbnails.submit(storage, digest)
+        
+        # التكرار يحسب على معاملات نفس المستخدم فقط: وجود الملف في التخزين
+        # قد يعني أن مستخدماً آخر رفع نفس الصورة ولا يجوز كشف ذلك
+        duplicate = db.session.query(
+            PaymentTransaction.query.filter(
+                PaymentTransaction.user_id == current_user.user_id,
+                PaymentTransaction.transaction_id != transaction.transaction_id,
+                PaymentTransaction.proof_image_url == proof_url(digest)
+            ).exists()
+        ).scalar()
+        
+        transaction.proof_image_url = proof_url(digest)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'تم رفع إثبات الدفع بنجاح',
+            'data': {
+                'transaction_id': transaction.transaction_id,
+                'proof_image_url': transaction.proof_image_url,
+                'duplicate': duplicate
+            }
+        }), 200 if duplicate else 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في رفع إثبات الدفع: {str(e)}'
+        }), 500
+    finally:
+        # الملفات غير المعتمدة (خطأ أو حقول إضافية) لا تبقى في المجلد المؤقت
+        for writer in writers:
+            writer.discard()
+
+admin_payment_bp = Blueprint('admin_payment', __name__)
+admin_payment_bp.before_request(require_admin)
+
+def _send_proof(path, mimetype, max_age):
+    response = send_file(path, mimetype=mimetype, max_age=max_age, conditional=True, etag=False)
+    response.cache_control.private = True
+    if max_age == PROOF_CACHE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
+
+@admin_payment_bp.route('/payments/proofs/<digest>', methods=['GET'])
+def get_payment_proof(digest):
+    """الصورة الأصلية لإثبات الدفع"""
+    storage = current_app.config['PROOF_STORAGE']
+    if not is_digest(digest) or not storage.exists(digest):
+        return jsonify({'success': False, 'message': 'الملف غير موجود'}), 404
+    
+    with open(storage.path(digest), 'rb') as f:
+        mimetype = sniff_mimetype(f.read(16))
+    return _send_proof(storage.path(digest), mimetype, PROOF_CACHE_MAX_AGE)
+
+@admin_payment_bp.route('/payments/proofs/<digest>/thumb', methods=['GET'])
+def get_payment_proof_thumbnail(digest):
+    """صورة مصغرة لقائمة المراجعة، والأصلية مؤقتاً إلى أن تجهز المصغرة"""
+    storage = current_app.config['PROOF_STORAGE']
+    if not is_digest(digest) or not storage.exists(digest):
+        return jsonify({'success': False, 'message': 'الملف غير موجود'}), 404
+    
+    thumbnail_path = storage.thumbnail_path(digest)
+    if os.path.exists(thumbnail_path):
+        return _send_proof(thumbnail_path, 'image/jpeg', PROOF_CACHE_MAX_AGE)
+    
+    thumbnails.submit(storage, digest)
+    with open(storage.path(digest), 'rb') as f:
+        mimetype = sniff_mimetype(f.read(16))
+    return _send_proof(storage.path(digest), mimetype, 60)
+
+@admin_payment_bp.route('/payments/pending', methods=['GET'])
+def get_pending_payments():
+    """طابور مراجعة المعاملات المعلقة من الأقدم (ترقيم بالمؤشر عبر الفهرس الجزئي)"""
+    try:
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        after = request.args.get('after')
+        
+        query = PaymentTransaction.query.filter(PaymentTransaction.pending_clause())
+        created_at = keyset.sort_key(db.session, PaymentTransaction.created_at)
+        
+        if after:
+            try:
+                after_created_at, after_transaction_id = keyset.decode_cursor(db.session, after, int)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            
+            query = query.filter(
+                (created_at > after_created_at) |
+                ((created_at == after_created_at) &
+                 (PaymentTransaction.transaction_id > after_transaction_id))
+            )
+        
+        serialize = get_row_serializer(PaymentTransaction)
+        transactions = (
+            query
+            .with_entities(*row_columns(PaymentTransaction), created_at.label('cursor_created_at'))
+            .order_by(created_at, PaymentTransaction.transaction_id)
+            .limit(per_page + 1)
+            .all()
+        )
+        has_next = len(transactions) > per_page
+        transactions = transactions[:per_page]
+        
+        data = []
+        for row in transactions:
+            item = serialize(row)
+            if item['proof_image_url']:
+                item['proof_thumbnail_url'] = item['proof_image_url'] + '/thumb'
+            data.append(item)
+        
+        return jsonify({
+            'success': True,
+            'data': data,
+            'pagination': {
+                'per_page': per_page,
+                'has_next': has_next,
+                'next_cursor': keyset.encode_cursor(
+                    transactions[-1].cursor_created_at,
+                    transactions[-1].transaction_id
+                ) if has_next else None
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب المعاملات المعلقة: {str(e)}'
+        }), 500
+
+# أقصى عدد معاملات في عملية مراجعة واحدة
+MAX_BULK_REVIEW = 500
+
+@admin_payment_bp.route('/payments/review', methods=['POST'])
+def review_payments():
+    """قبول أو رفض عدة معاملات دفعة واحدة: {"transaction_ids": [...], "action": "approve" | "reject"}"""
+    try:
+        data = request.get_json() or {}
+        transaction_ids = data.get('transaction_ids')
+        action = data.get('action')
+        
+        if action not in ('approve', 'reject') or not isinstance(transaction_ids, list) or not transaction_ids:
+            return jsonify({
+                'success': False,
+                'message': 'الحقلان transaction_ids و action (approve أو reject) مطلوبان'
+            }), 400
+        
+        if len(transaction_ids) > MAX_BULK_REVIEW:
+            return jsonify({
+                'success': False,
+                'message': f'الحد الأقصى {MAX_BULK_REVIEW} معاملة في العملية الواحدة'
+            }), 400
+        
+        try:
+            transaction_ids = [int(transaction_id) for transaction_id in transaction_ids]
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'transaction_ids يجب أن تكون أرقاماً صحيحة'
+            }), 400
+        
+        results, affected_users = review_transactions(
+            db.session,
+            transaction_ids,
+            approve=action == 'approve'
+        )
+        for user_id in affected_users:
+            identity_cache.invalidate_user(user_id)
+        
+        updated = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'message': f'تمت مراجعة {updated} من {len(results)} معاملة',
+            'data': {
+                'updated': updated,
+                'results': results
+            }
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في مراجعة المعاملات: {str(e)}'
+        }), 500
+
+@admin_payment_bp.route('/payment-methods', methods=['GET'])
+def get_all_payment_methods():
+    """جميع طرق الدفع بما فيها المعطلة (لوحة الإدارة)"""
+    try:
+        query = PaymentMethod.query.order_by(PaymentMethod.method_id)
+        return jsonify({
+            'success': True,
+            'data': serialize_rows(query, PaymentMethod)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب طرق الدفع: {str(e)}'
+        }), 500
+
+@admin_payment_bp.route('/payment-methods', methods=['POST'])
+def create_payment_method():
+    """إضافة طريقة دفع"""
+    try:
+        data = request.get_json() or {}
+        
+        if not data.get('name'):
+            return jsonify({
+                'success': False,
+                'message': 'اسم طريقة الدفع مطلوب'
+            }), 400
+        
+        method = PaymentMethod(
+            name=data['name'],
+            details=data.get('details'),
+            is_active=data.get('is_active', True)
+        )
+        
+        db.session.add(method)
+        db.session.flush()  # للحصول على method_id
+        # رقم إصدار جديد يبطل لقطة /api/payment-methods في جميع العمال بعد commit
+        bump_version(db.session, [('payment_method', method.method_id, 'upsert')])
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'تمت إضافة طريقة الدفع بنجاح',
+            'data': method.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في إضافة طريقة الدفع: {str(e)}'
+        }), 500
+
+@admin_payment_bp.route('/payment-methods/<int:method_id>', methods=['PUT'])
+def update_payment_method(method_id):
+    """تعديل طريقة دفع"""
+    try:
+        method = PaymentMethod.query.get_or_404(method_id)
+        data = request.get_json() or {}
+        
+        method.name = data.get('name', method.name)
+        method.details = data.get('details', method.details)
+        method.is_active = data.get('is_active', method.is_active)
+        
+        bump_version(db.session, [('payment_method', method_id, 'upsert')])
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'تم تعديل طريقة الدفع بنجاح',
+            'data': method.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في تعديل طريقة الدفع: {str(e)}'
+        }), 500
+
+@admin_payment_bp.route('/payment-methods/<int:method_id>/toggle-active', methods=['PATCH'])
+def toggle_payment_method(method_id):
+    """تفعيل/تعطيل طريقة دفع"""
+    try:
+        method = PaymentMethod.query.get_or_404(method_id)
+        method.is_active = not method.is_active
+        
+        bump_version(db.session, [('payment_method', method_id, 'upsert')])
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'تم تفعيل طريقة الدفع' if method.is_active else 'تم تعطيل طريقة الدفع',
+            'data': method.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في تغيير حالة طريقة الدفع: {str(e)}'
+        }), 500
@@ -1,9 +1,16 @@
 from flask import Blueprint, request, jsonify
 from src.models.product import db, Product, ProductCustomOption, ProductInventory
 from src.models.category import Category
+from src.models.order import Order
+from src.routes.user_management import require_admin
+from src.services import keyset, product_search
+from src.services.serialization import get_row_serializer, row_columns
+from src.services.catalog_snapshot import bump_version
 import json
+from sqlalchemy.orm import joinedload
 
 product_bp = Blueprint('product', __name__)
+product_bp.before_request(require_admin)
 
 @product_bp.route('/products', methods=['GET'])
 def get_products():
@@ -13,22 +20,83 @@ def get_products():
         per_page = request.args.get('per_page', 10, type=int)
         category_id = request.args.get('category_id', type=int)
         search = request.args.get('search', '')
+        after = request.args.get('after')
+        cursor_mode = after is not None or request.args.get('pagination') == 'cursor'
+        include_details = request.args.get('include') == 'details'
         
-        query = Product.query
+        # مع include=details تحمل الخيارات والمخزون لكامل الصفحة دفعة واحدة
+        query = Product.query_with_details() if include_details else Product.query
+        serialize = Product.to_dict_with_details if include_details else get_row_serializer(Product)
         
         # تصفية حسب القسم
         if category_id:
             query = query.filter_by(category_id=category_id)
         
-        # البحث في اسم المنتج أو الوصف
+        # البحث في اسم المنتج أو الوصف عبر فهرس FTS5، مع LIKE كحل احتياطي
+        search_rank = None
         if search:
-            query = query.filter(
-                Product.name.contains(search) | 
-                Product.description.contains(search)
-            )
+            if product_search.is_enabled(db.session) and product_search.build_match_query(search):
+                matches = product_search.match_subquery(search)
+                query = query.join(matches, Product.product_id == matches.c.rowid)
+                search_rank = matches.c.rank
+            else:
+                query = query.filter(
+                    Product.name.contains(search) | 
+                    Product.description.contains(search)
+                )
+        
+        # بدون التفاصيل: جلب الأعمدة كصفوف دون إنشاء كائنات ORM
+        if not include_details:
+            query = query.with_entities(*row_columns(Product))
         
-        # ترتيب حسب تاريخ الإنشاء
-        query = query.order_by(Product.created_at.desc())
+        # وضع المؤشر: بدون COUNT(*) ولا OFFSET
+        if cursor_mode:
+            per_page = min(max(per_page, 1), 100)
+            
+            # created_at كما هو مخزن (انظر keyset.sort_key) حتى لا يعود صف المؤشر في الصفحة التالية
+            created_at = keyset.sort_key(db.session, Product.created_at)
+            
+            if after:
+                try:
+                    after_created_at, after_product_id = keyset.decode_cursor(db.session, after, int)
+                except ValueError as e:
+                    return jsonify({
+                        'success': False,
+                        'message': str(e)
+                    }), 400
+                
+                query = query.filter(
+                    (created_at < after_created_at) |
+                    ((created_at == after_created_at) & (Product.product_id < after_product_id))
+                )
+            
+            query = query.add_columns(created_at.label('cursor_created_at'))
+            query = query.order_by(created_at.desc(), Product.product_id.desc())
+            
+            # جلب عنصر إضافي لمعرفة وجود صفحة تالية
+            rows = query.limit(per_page + 1).all()
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            products = [row[0] for row in rows] if include_details else rows
+            
+            return jsonify({
+                'success': True,
+                'data': [serialize(product) for product in products],
+                'pagination': {
+                    'per_page': per_page,
+                    'has_next': has_next,
+                    'next_cursor': keyset.encode_cursor(
+                        rows[-1].cursor_created_at,
+                        products[-1].product_id
+                    ) if has_next else None
+                }
+            }), 200
+        
+        # ترتيب حسب الصلة عند البحث، ثم حسب تاريخ الإنشاء
+        if search_rank is not None:
+            query = query.order_by(search_rank, Product.created_at.desc())
+        else:
+            query = query.order_by(Product.created_at.desc())
         
         # تقسيم الصفحات
         products = query.paginate(
@@ -39,7 +107,7 @@ def get_products():
         
         return jsonify({
             'success': True,
-            'data': [product.to_dict() for product in products.items],
+            'data': [serialize(product) for product in products.items],
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -60,25 +128,62 @@ def get_products():
 def get_product(product_id):
     """الحصول على منتج محدد"""
     try:
-        product = Product.query.get_or_404(product_id)
+        # جلب المنتج مع الخيارات المخصصة والمخزون في استعلام واحد
+        product = Product.query.options(
+            joinedload(Product.custom_options),
+            joinedload(Product.inventory)
+        ).filter_by(product_id=product_id).first_or_404()
+        
+        return jsonify({
+            'success': True,
+            'data': product.to_dict_with_details()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'خطأ في جلب المنتج: {str(e)}'
+        }), 500
+
+@product_bp.route('/products/details', methods=['GET'])
+def get_products_details():
+    """الحصول على عدة منتجات مع خياراتها ومخزونها دفعة واحدة (لصفحات القوائم)"""
+    try:
+        ids = request.args.get('ids', '')
+        try:
+            product_ids = [int(value) for value in ids.split(',') if value.strip()]
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'قائمة المعرفات غير صحيحة'
+            }), 400
+        
+        if not product_ids:
+            return jsonify({
+                'success': False,
+                'message': 'الحقل ids مطلوب'
+            }), 400
         
-        # جلب الخيارات المخصصة والمخزون
-        custom_options = ProductCustomOption.query.filter_by(product_id=product_id).all()
-        inventory = ProductInventory.query.filter_by(product_id=product_id).first()
+        if len(product_ids) > 100:
+            return jsonify({
+                'success': False,
+                'message': 'الحد الأقصى 100 منتج في الطلب الواحد'
+            }), 400
+        
+        products = Product.query_with_details().filter(Product.product_id.in_(product_ids)).all()
         
-        product_data = product.to_dict()
-        product_data['custom_options'] = [option.to_dict() for option in custom_options]
-        product_data['inventory'] = inventory.to_dict() if inventory else None
+        # الحفاظ على ترتيب المعرفات كما أرسلها العميل
+        by_id = {product.product_id: product for product in products}
         
         return jsonify({
             'success': True,
-            'data': product_data
+            'data': [by_id[pid].to_dict_with_details() for pid in product_ids if pid in by_id]
         }), 200
         
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'خطأ في جلب المنتج: {str(e)}'
+            'message': f'خطأ في جلب المنتجات: {str(e)}'
         }), 500
 
 @product_bp.route('/products', methods=['POST'])
@@ -148,6 +253,8 @@ def create_product():
             )
             db.session.add(inventory)
         
+        product_search.index_product(db.session, product)
+        bump_version(db.session, [('product', product.product_id, 'upsert')])
         db.session.commit()
         
         return jsonify({
@@ -228,6 +335,8 @@ def update_product(product_id):
                 )
                 db.session.add(inventory)
         
+        product_search.index_product(db.session, product)
+        bump_version(db.session, [('product', product_id, 'upsert')])
         db.session.commit()
         
         return jsonify({
@@ -250,7 +359,6 @@ def delete_product(product_id):
         product = Product.query.get_or_404(product_id)
         
         # التحقق من وجود طلبات لهذا المنتج
-        from src.models.order import Order
         orders_count = Order.query.filter_by(product_id=product_id).count()
         if orders_count > 0:
             return jsonify({
@@ -259,6 +367,8 @@ def delete_product(product_id):
             }), 400
         
         db.session.delete(product)
+        product_search.remove_product(db.session, product_id)
+        bump_version(db.session, [('product', product_id, 'delete')])
         db.session.commit()
         
         return jsonify({
@@ -280,6 +390,7 @@ def toggle_product_availability(product_id):
         product = Product.query.get_or_404(product_id)
         product.is_available = not product.is_available
         
+        bump_version(db.session, [('product', product_id, 'upsert')])
         db.session.commit()
         
         status = 'متاح' if product.is_available else 'غير متاح'
@@ -1,7 +1,13 @@
 from flask import Blueprint, jsonify, request
+from src.models.notification import NotificationReadMarker
 from src.models.user import User, db
+from src.routes.user_management import require_admin
+from src.services import inbox
+from src.services.identity_cache import identity_cache
+from src.services.streaming import stream_json_array, stream_ndjson, wants_ndjson
 
 user_bp = Blueprint('user', __name__)
+user_bp.before_request(require_admin)
 
 # دالة مساعدة لتوحيد الردود
 def make_response(message, status=200, data=None):
@@ -18,11 +24,13 @@ def validate_user_data(data):
         return f"الحقول التالية مطلوبة: {', '.join(missing)}"
     return None
 
-# [GET] جلب جميع المستخدمين
+# [GET] جلب جميع المستخدمين (رد مجزأ يمر على الجدول دفعة بعد دفعة)
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return make_response('قائمة المستخدمين', 200, [user.to_dict() for user in users])
+    query = User.query.order_by(User.user_id)
+    if wants_ndjson(request):
+        return stream_ndjson(query, User)
+    return stream_json_array(query, User, {'message': 'قائمة المستخدمين'})
 
 # [POST] إنشاء مستخدم جديد
 @user_bp.route('/users', methods=['POST'])
@@ -46,6 +54,8 @@ def create_user():
 
     user = User(uid=uid, username=username, email=email)
     db.session.add(user)
+    db.session.flush()
+    inbox.start_marker(db.session, user.user_id)
     db.session.commit()
 
     return make_response('تم إنشاء المستخدم بنجاح', 201, user.to_dict())
@@ -64,14 +74,19 @@ def update_user(user_id):
 
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
+    user.status = data.get('status', user.status)
 
     db.session.commit()
+    identity_cache.invalidate_user(user.user_id)
     return make_response('تم تحديث المستخدم', 200, user.to_dict())
 
 # [DELETE] حذف مستخدم
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    # صف حالة القراءة ينشأ مع كل مستخدم جديد ويمنع الحذف بقيد المفتاح الأجنبي
+    NotificationReadMarker.query.filter_by(user_id=user_id).delete()
     db.session.delete(user)
     db.session.commit()
+    identity_cache.invalidate_user(user_id)
     return make_response('تم حذف المستخدم', 200)
\ No newline at end of file
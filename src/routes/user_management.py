@@ -1,67 +1,110 @@
 from flask import Blueprint, request, jsonify, current_app
 import jwt
 from functools import wraps
+from src.models.user import db, User
+from src.services import balance
+from src.services.identity_cache import identity_cache
+from src.services.vip_tiers import vip_tiers
 
 user_management_bp = Blueprint('user_management', __name__)
 
+def _authenticate(use_cache):
+    """التحقق من الرمز المميز وإرجاع (المستخدم، رد الخطأ)"""
+    token = request.headers.get('Authorization')
+    
+    if not token:
+        return None, (jsonify({
+            'success': False,
+            'message': 'الرمز المميز مطلوب'
+        }), 401)
+    
+    # إزالة "Bearer " من بداية الرمز
+    if token.startswith('Bearer '):
+        token = token[7:]
+    
+    # نسخة مخزنة: لا حاجة لفك التشفير ولا للاستعلام من قاعدة البيانات
+    if use_cache:
+        snapshot = identity_cache.get(token)
+        if snapshot is not None:
+            return snapshot, None
+        seen_version = identity_cache.version()
+    
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        current_user = User.query.get(payload['user_id'])
+        
+        if not current_user:
+            return None, (jsonify({
+                'success': False,
+                'message': 'المستخدم غير موجود'
+            }), 401)
+            
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({
+            'success': False,
+            'message': 'انتهت صلاحية الرمز المميز'
+        }), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({
+            'success': False,
+            'message': 'الرمز المميز غير صحيح'
+        }), 401)
+    
+    if use_cache:
+        return identity_cache.put(token, current_user, payload.get('exp'), seen_version), None
+    
+    return current_user, None
+
 def token_required(f):
     """ديكوريتر للتحقق من الرمز المميز"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        from src.main import User
-        
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({
-                'success': False,
-                'message': 'الرمز المميز مطلوب'
-            }), 401
+        current_user, error = _authenticate(use_cache=False)
+        if error:
+            return error
         
-        try:
-            # إزالة "Bearer " من بداية الرمز
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(payload['user_id'])
-            
-            if not current_user:
-                return jsonify({
-                    'success': False,
-                    'message': 'المستخدم غير موجود'
-                }), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'success': False,
-                'message': 'انتهت صلاحية الرمز المميز'
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                'success': False,
-                'message': 'الرمز المميز غير صحيح'
-            }), 401
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
+def cached_token_required(f):
+    """ديكوريتر للمسارات التي تقرأ فقط: يمرر نسخة مخزنة من المستخدم بدلاً من كائن قاعدة البيانات"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = _authenticate(use_cache=True)
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     
     return decorated
 
+def is_admin():
+    """صلاحية المشرف من رمز Firebase (custom claim: admin = true)"""
+    claims = getattr(request, 'user', None) or {}
+    return claims.get('admin') is True
+
+def require_admin():
+    """before_request لمسارات الإدارة: رفض أي مستخدم لا يحمل صلاحية المشرف"""
+    if not is_admin():
+        return jsonify({
+            'success': False,
+            'message': 'هذه العملية متاحة للمشرفين فقط'
+        }), 403
+
 @user_management_bp.route('/profile', methods=['GET'])
-@token_required
+@cached_token_required
 def get_profile(current_user):
     """الحصول على معلومات المستخدم"""
-    from src.main import VIPLevel
-    
     try:
         # جلب معلومات مستوى VIP
-        vip_level = VIPLevel.query.filter_by(level_id=current_user.vip_level).first()
+        vip_level = vip_tiers.get(current_user.vip_level)
         
         user_data = current_user.to_dict()
         user_data['vip_info'] = vip_level.to_dict() if vip_level else None
         
         # حساب التقدم للمستوى التالي
-        next_vip = VIPLevel.query.filter(VIPLevel.level_id > current_user.vip_level).order_by(VIPLevel.level_id).first()
+        next_vip = vip_tiers.next_after(current_user.vip_level)
         if next_vip:
             user_data['next_vip'] = next_vip.to_dict()
             user_data['progress_to_next'] = min(current_user.total_spent / next_vip.min_spent, 1.0)
@@ -81,8 +124,6 @@ def get_profile(current_user):
 @token_required
 def update_profile(current_user):
     """تحديث معلومات المستخدم"""
-    from src.main import db, User
-    
     try:
         data = request.get_json()
         
@@ -103,6 +144,7 @@ def update_profile(current_user):
             current_user.username = data['username']
         
         db.session.commit()
+        identity_cache.invalidate_user(current_user.user_id)
         
         return jsonify({
             'success': True,
@@ -118,7 +160,7 @@ def update_profile(current_user):
         }), 500
 
 @user_management_bp.route('/balance', methods=['GET'])
-@token_required
+@cached_token_required
 def get_balance(current_user):
     """الحصول على رصيد المستخدم"""
     try:
@@ -140,10 +182,8 @@ def get_balance(current_user):
 @user_management_bp.route('/vip-levels', methods=['GET'])
 def get_vip_levels():
     """الحصول على جميع مستويات VIP"""
-    from src.main import VIPLevel
-    
     try:
-        vip_levels = VIPLevel.query.order_by(VIPLevel.level_id).all()
+        vip_levels = vip_tiers.all()
         
         return jsonify({
             'success': True,
@@ -157,11 +197,9 @@ def get_vip_levels():
         }), 500
 
 @user_management_bp.route('/calculate-discount', methods=['POST'])
-@token_required
+@cached_token_required
 def calculate_discount(current_user):
     """حساب الخصم المتاح للمستخدم"""
-    from src.main import VIPLevel
-    
     try:
         data = request.get_json()
         amount = data.get('amount', 0)
@@ -173,7 +211,7 @@ def calculate_discount(current_user):
             }), 400
         
         # جلب معلومات مستوى VIP الحالي
-        vip_level = VIPLevel.query.filter_by(level_id=current_user.vip_level).first()
+        vip_level = vip_tiers.get(current_user.vip_level)
         
         if not vip_level:
             discount_percentage = 0
@@ -202,18 +240,15 @@ def calculate_discount(current_user):
 
 def update_user_vip_level(user):
     """تحديث مستوى VIP للمستخدم بناءً على إجمالي الإنفاق"""
-    from src.main import db, VIPLevel
-    
     try:
         # جلب أعلى مستوى VIP يستحقه المستخدم
-        eligible_vip = VIPLevel.query.filter(
-            VIPLevel.min_spent <= user.total_spent
-        ).order_by(VIPLevel.level_id.desc()).first()
+        eligible_vip = vip_tiers.eligible_for(user.total_spent)
         
         if eligible_vip and eligible_vip.level_id > user.vip_level:
             old_level = user.vip_level
             user.vip_level = eligible_vip.level_id
             db.session.commit()
+            identity_cache.invalidate_user(user.user_id)
             
             # يمكن إضافة إشعار هنا للمستخدم بالترقية
             return {
@@ -233,7 +268,12 @@ def update_user_vip_level(user):
 @token_required
 def add_balance(current_user):
     """إضافة رصيد للمستخدم (للاختبار فقط - في الواقع يتم عبر طلبات الدفع)"""
-    from src.main import db
+    # معطل إلا في بيئة الاختبار (ALLOW_TEST_TOPUP=1)
+    if not current_app.config.get('ALLOW_TEST_TOPUP'):
+        return jsonify({
+            'success': False,
+            'message': 'المسار غير موجود'
+        }), 404
     
     try:
         data = request.get_json()
@@ -245,14 +285,16 @@ def add_balance(current_user):
                 'message': 'المبلغ يجب أن يكون أكبر من صفر'
             }), 400
         
-        current_user.balance += amount
+        # زيادة ذرية في قاعدة البيانات مع حركة في سجل الرصيد
+        new_balance = balance.credit(db.session, current_user.user_id, amount, 'topup')
         db.session.commit()
+        identity_cache.invalidate_user(current_user.user_id)
         
         return jsonify({
             'success': True,
             'message': f'تم إضافة {amount} ريال إلى رصيدك',
             'data': {
-                'new_balance': current_user.balance
+                'new_balance': balance.from_minor(new_balance)
             }
         }), 200
         
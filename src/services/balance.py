@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import bindparam, func, select, update
+
+from src.models.balance import BalanceLedger, BalanceSnapshot
+from src.models.user import User
+
+_users_table = User.__table__
+_ledger_table = BalanceLedger.__table__
+_snapshots_table = BalanceSnapshot.__table__
+
+# الرصيد يخزن بالهللة (1 ريال = 100 هللة) لتجنب أخطاء التقريب في الأعداد العشرية
+MINOR_UNITS = 100
+
+
+class InsufficientBalance(Exception):
+    """الرصيد لا يكفي لإتمام الخصم"""
+
+
+def to_minor(amount):
+    """تحويل مبلغ بالريال إلى هللات (عدد صحيح)"""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor):
+    return amount_minor / MINOR_UNITS
+
+
+def apply(session, user_id, amount_minor, kind, reference=None, allow_negative=False):
+    """تعديل رصيد المستخدم بعبارة UPDATE واحدة وإضافة حركة إلى السجل
+
+    لا قراءة ثم كتابة ولا أقفال في التطبيق: قاعدة البيانات تطبق الزيادة على القيمة الحالية،
+    والخصم مشروط بألا يصبح الرصيد سالباً. لا يتم commit هنا (ضمن معاملة المستدعي).
+    ترجع الرصيد الجديد بالهللة، وترفع InsufficientBalance إذا لم يطبق الخصم.
+    """
+    statement = (
+        update(_users_table)
+        .where(_users_table.c.user_id == user_id)
+        .values(balance_minor=_users_table.c.balance_minor + amount_minor)
+    )
+    if amount_minor < 0 and not allow_negative:
+        statement = statement.where(_users_table.c.balance_minor + amount_minor >= 0)
+
+    if session.get_bind().dialect.update_returning:
+        balance_after = session.execute(
+            statement.returning(_users_table.c.balance_minor)
+        ).scalar()
+    else:
+        result = session.execute(statement)
+        balance_after = None
+        if result.rowcount == 1:
+            # الصف مقفل لهذه المعاملة بعد UPDATE فالقراءة هنا متسقة
+            balance_after = session.execute(
+                select(_users_table.c.balance_minor).where(_users_table.c.user_id == user_id)
+            ).scalar()
+
+    if balance_after is None:
+        raise InsufficientBalance(user_id)
+
+    session.execute(_ledger_table.insert().values(
+        user_id=user_id,
+        amount_minor=amount_minor,
+        balance_after_minor=balance_after,
+        kind=kind,
+        reference=reference,
+        created_at=datetime.utcnow()
+    ))
+    return balance_after
+
+
+def credit_many(session, entries):
+    """إيداع دفعة حركات (مثل استرداد طلبات مرفوضة) ضمن معاملة المستدعي
+
+    entries: قائمة (user_id, amount_minor, kind, reference) بمبالغ موجبة.
+    عبارة UPDATE واحدة بعدة قيم (executemany) لكل المستخدمين، واستعلام واحد للأرصدة الجديدة،
+    وإدراج واحد لجميع الحركات. ترجع {user_id: الرصيد الجديد بالهللة}.
+    """
+    if any(amount_minor < 0 for _, amount_minor, _, _ in entries):
+        raise ValueError('credit_many accepts credits only')
+
+    totals = {}
+    for user_id, amount_minor, _, _ in entries:
+        totals[user_id] = totals.get(user_id, 0) + amount_minor
+    if not totals:
+        return {}
+
+    session.execute(
+        update(_users_table)
+        .where(_users_table.c.user_id == bindparam('b_user_id'))
+        .values(balance_minor=_users_table.c.balance_minor + bindparam('b_amount')),
+        [{'b_user_id': user_id, 'b_amount': amount} for user_id, amount in totals.items()]
+    )
+    balances = dict(session.execute(
+        select(_users_table.c.user_id, _users_table.c.balance_minor)
+        .where(_users_table.c.user_id.in_(list(totals)))
+    ).all())
+
+    # الرصيد بعد كل حركة: نبدأ من الرصيد قبل الدفعة ونضيف الحركات بالترتيب
+    running = {user_id: balances[user_id] - total for user_id, total in totals.items()}
+    now = datetime.utcnow()
+    rows = []
+    for user_id, amount_minor, kind, reference in entries:
+        running[user_id] += amount_minor
+        rows.append({
+            'user_id': user_id,
+            'amount_minor': amount_minor,
+            'balance_after_minor': running[user_id],
+            'kind': kind,
+            'reference': reference,
+            'created_at': now
+        })
+    session.execute(_ledger_table.insert(), rows)
+    return balances
+
+
+def credit(session, user_id, amount, kind, reference=None):
+    """إيداع مبلغ (بالريال) وإرجاع الرصيد الجديد بالهللة"""
+    return apply(session, user_id, to_minor(amount), kind, reference)
+
+
+def debit(session, user_id, amount, kind, reference=None):
+    """خصم مبلغ (بالريال) إذا كان الرصيد يكفي، وإرجاع الرصيد الجديد بالهللة"""
+    return apply(session, user_id, -to_minor(amount), kind, reference)
+
+
+def _latest_snapshots():
+    latest_ids = (
+        select(func.max(_snapshots_table.c.snapshot_id))
+        .group_by(_snapshots_table.c.user_id)
+    )
+    return (
+        select(
+            _snapshots_table.c.user_id,
+            _snapshots_table.c.balance_minor,
+            _snapshots_table.c.last_entry_id
+        )
+        .where(_snapshots_table.c.snapshot_id.in_(latest_ids))
+        .subquery()
+    )
+
+
+def take_snapshots(session, settle_seconds=60):
+    """أخذ لقطة رصيد للمستخدمين الذين لديهم حركات بعد آخر لقطة
+
+    الحركات الأحدث من settle_seconds تترك للقطة التالية حتى لا تفوت حركة
+    من معاملة لم تكتمل بعد (المعرفات تحجز قبل commit).
+    ترجع عدد اللقطات الجديدة.
+    """
+    upto = session.execute(
+        select(func.max(_ledger_table.c.entry_id))
+        .where(_ledger_table.c.created_at <= datetime.utcnow() - timedelta(seconds=settle_seconds))
+    ).scalar()
+    if upto is None:
+        return 0
+
+    latest = _latest_snapshots()
+    rows = session.execute(
+        select(
+            _ledger_table.c.user_id,
+            func.coalesce(func.max(latest.c.balance_minor), 0) + func.sum(_ledger_table.c.amount_minor),
+            func.max(_ledger_table.c.entry_id)
+        )
+        .select_from(_ledger_table.outerjoin(latest, latest.c.user_id == _ledger_table.c.user_id))
+        .where(
+            _ledger_table.c.entry_id <= upto,
+            _ledger_table.c.entry_id > func.coalesce(latest.c.last_entry_id, 0)
+        )
+        .group_by(_ledger_table.c.user_id)
+    ).all()
+
+    now = datetime.utcnow()
+    if rows:
+        session.execute(_snapshots_table.insert(), [
+            {'user_id': user_id, 'balance_minor': balance, 'last_entry_id': last_entry_id, 'taken_at': now}
+            for user_id, balance, last_entry_id in rows
+        ])
+    return len(rows)
+
+
+def reconcile(session, user_id=None):
+    """مقارنة الرصيد المخزن بآخر لقطة + الحركات بعدها
+
+    ترجع قائمة (user_id, الرصيد المخزن, الرصيد المحسوب) للمستخدمين غير المتطابقين.
+    """
+    latest = _latest_snapshots()
+    since = _latest_snapshots()
+    tail = (
+        select(
+            _ledger_table.c.user_id,
+            func.sum(_ledger_table.c.amount_minor).label('amount_minor')
+        )
+        .select_from(_ledger_table.outerjoin(since, since.c.user_id == _ledger_table.c.user_id))
+        .where(_ledger_table.c.entry_id > func.coalesce(since.c.last_entry_id, 0))
+        .group_by(_ledger_table.c.user_id)
+        .subquery()
+    )
+    expected = (
+        func.coalesce(latest.c.balance_minor, 0) + func.coalesce(tail.c.amount_minor, 0)
+    )
+    statement = (
+        select(_users_table.c.user_id, _users_table.c.balance_minor, expected)
+        .select_from(
+            _users_table
+            .outerjoin(latest, latest.c.user_id == _users_table.c.user_id)
+            .outerjoin(tail, tail.c.user_id == _users_table.c.user_id)
+        )
+        .where(_users_table.c.balance_minor != expected)
+    )
+    if user_id is not None:
+        statement = statement.where(_users_table.c.user_id == user_id)
+    return [tuple(row) for row in session.execute(statement)]
@@ -0,0 +1,234 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, request
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from src.models.catalog import CatalogChange, CatalogVersion
+
+_version_table = CatalogVersion.__table__
+_changes_table = CatalogChange.__table__
+
+
+def bump_version(session, changes=()):
+    """زيادة إصدار الكتالوج ضمن معاملة الكتابة الحالية وتسجيل التغييرات بالإصدار الجديد
+
+    changes: قائمة (entity_type, entity_id, operation) حيث operation هي 'upsert' أو 'delete'
+    """
+    session.execute(
+        update(_version_table)
+        .where(_version_table.c.id == 1)
+        .values(version=_version_table.c.version + 1)
+    )
+    version = session.execute(
+        select(_version_table.c.version).where(_version_table.c.id == 1)
+    ).scalar()
+    if changes:
+        now = datetime.utcnow()
+        session.execute(_changes_table.insert(), [
+            {
+                'version': version,
+                'entity_type': entity_type,
+                'entity_id': entity_id,
+                'operation': operation,
+                'created_at': now
+            }
+            for entity_type, entity_id, operation in changes
+        ])
+    catalog_snapshots.mark_stale()
+    # ينشر إلى باقي العمال بعد commit فقط، حتى لا تبنى لقطة من بيانات لم تعتمد
+    session.info['catalog_version'] = version
+    return version
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_version(session):
+    version = session.info.pop('catalog_version', None)
+    if version is not None:
+        catalog_snapshots.publish(version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_version(session):
+    session.info.pop('catalog_version', None)
+
+
+def changes_since(session, since, until, limit):
+    """التغييرات بين الإصدارين (since, until] مطوية لكل كيان (آخر عملية هي المعتمدة)
+
+    ترجع None إذا تجاوز عدد التغييرات الحد، وعندها يجب على العميل جلب اللقطة الكاملة.
+    """
+    rows = session.execute(
+        select(_changes_table.c.entity_type, _changes_table.c.entity_id, _changes_table.c.operation)
+        .where(_changes_table.c.version > since, _changes_table.c.version <= until)
+        .order_by(_changes_table.c.change_id)
+        .limit(limit + 1)
+    ).all()
+    if len(rows) > limit:
+        return None
+
+    latest = {}
+    for entity_type, entity_id, operation in rows:
+        latest[(entity_type, entity_id)] = operation
+    return latest
+
+
+def ensure_version_row(session):
+    """إنشاء صف الإصدار إذا لم يكن موجوداً"""
+    exists = session.execute(select(_version_table.c.id).where(_version_table.c.id == 1)).first()
+    if not exists:
+        session.execute(_version_table.insert().values(id=1, version=1))
+        session.commit()
+
+
+class Snapshot:
+    """رد JSON جاهز مسبقاً مع نسخته المضغوطة ووسم ETag"""
+
+    __slots__ = ('etag', 'body', 'gzipped')
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+
+class FileVersionStore:
+    """رقم إصدار الكتالوج في ملف مشترك بين عمال gunicorn على نفس الخادم
+
+    قراءة الإصدار = os.stat فقط ما لم يتغير الملف، فلا حاجة لقاعدة البيانات في كل طلب.
+    أي مخزن مشترك آخر (Redis مثلاً) يكفي أن يوفر get() و publish(version).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None
+        self._version = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._stamp:
+            try:
+                with open(self.path) as f:
+                    self._version = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                return None
+            self._stamp = stamp
+        return self._version
+
+    def publish(self, version):
+        """كتابة الإصدار إذا كان أحدث من الموجود (لا يرجع الإصدار للخلف)"""
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self.get()
+                if current is not None and current >= version:
+                    return
+                partial = f'{self.path}.{os.getpid()}'
+                with open(partial, 'w') as f:
+                    f.write(str(version))
+                os.replace(partial, self.path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class CatalogSnapshots:
+    """لقطات الكتالوج المجهزة لكل إصدار"""
+
+    def __init__(self, version_ttl=2.0, max_snapshots=256, store=None):
+        # مدة الاعتماد على رقم الإصدار المحفوظ قبل قراءته من قاعدة البيانات
+        self.version_ttl = version_ttl
+        self.max_snapshots = max_snapshots
+        # المخزن المشترك (ملف محلي) يسرع الإبطال بين عمال نفس الخادم فقط، أما قاعدة البيانات
+        # فتبقى المرجع كل version_ttl حتى تظهر تعديلات الخوادم الأخرى
+        self.store = store
+        self._version = None
+        self._version_checked_at = 0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def use_store(self, store):
+        self.store = store
+
+    def mark_stale(self):
+        self._version_checked_at = 0
+
+    def publish(self, version):
+        """نشر إصدار معتمد إلى المخزن المشترك حتى تبطل لقطات جميع العمال فوراً"""
+        if self.store is not None:
+            try:
+                self.store.publish(version)
+            except OSError as e:
+                print('ERROR ▶︎ failed to publish catalog version:', e)
+
+    def _set_version(self, version, checked_at):
+        with self._lock:
+            if version != self._version:
+                # لقطات الإصدار السابق لم تعد صالحة
+                self._snapshots = {}
+                self._version = version
+            if checked_at is not None:
+                self._version_checked_at = checked_at
+
+    def current_version(self, session):
+        now = time.monotonic()
+
+        if self.store is not None:
+            version = self.store.get()
+            if version is not None and version != self._version:
+                self._set_version(version, None)
+
+        if self._version is None or now - self._version_checked_at >= self.version_ttl:
+            version = session.execute(
+                select(_version_table.c.version).where(_version_table.c.id == 1)
+            ).scalar() or 0
+            self._set_version(version, now)
+            self.publish(version)
+        return self._version
+
+    def get(self, session, key, build):
+        """إرجاع لقطة الإصدار الحالي للمفتاح، وبناؤها مرة واحدة فقط عند الحاجة"""
+        version = self.current_version(session)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = Snapshot(build())
+            with self._lock:
+                if self._version == version and len(self._snapshots) < self.max_snapshots:
+                    self._snapshots[key] = snapshot
+        return snapshot
+
+    def respond(self, session, key, build):
+        """رد HTTP من اللقطة مع دعم If-None-Match والضغط"""
+        snapshot = self.get(session, key, build)
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        # وسم مختلف لكل ترميز حتى يبقى ETag قوياً
+        etag = snapshot.etag + '-gz' if use_gzip else snapshot.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif use_gzip:
+            response = Response(snapshot.gzipped, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(snapshot.body, mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+catalog_snapshots = CatalogSnapshots(
+    version_ttl=float(os.environ.get('CATALOG_VERSION_TTL', '2'))
+)
@@ -0,0 +1,77 @@
+from sqlalchemy import create_engine, func, inspect, select, text
+
+from src.models.db import db
+from src.services import product_search
+from src.services.migrations import MIGRATIONS, applied_versions
+
+
+def copy_database(source_url, target_url, batch_size=1000, truncate=False, log=print):
+    """نسخ جميع جداول النماذج من قاعدة بيانات إلى أخرى على دفعات
+
+    الجداول تنسخ بترتيب المفاتيح الأجنبية، وكل دفعة تدرج بعبارة INSERT واحدة متعددة القيم.
+    المصدر يجب أن يكون بآخر إصدار من الترحيلات: الأعمدة المفقودة في مصدر أقدم (مثل balance_minor
+    في app.db قبل سجل الرصيد) كانت ستأخذ القيمة الافتراضية في الهدف دون أي تحذير.
+    """
+    source = create_engine(source_url)
+    target = create_engine(target_url)
+
+    try:
+        missing = [version for version, _, _ in MIGRATIONS if version not in applied_versions(source)]
+        if missing:
+            raise RuntimeError(
+                f'source database is missing migrations {missing}: run "flask migrate" against it first'
+            )
+
+        db.metadata.create_all(target)
+        source_tables = set(inspect(source).get_table_names())
+
+        with target.begin() as target_conn:
+            if truncate:
+                for table in reversed(db.metadata.sorted_tables):
+                    target_conn.execute(table.delete())
+
+            for table in db.metadata.sorted_tables:
+                if table.name not in source_tables:
+                    log(f'- {table.name}: not in source, skipped')
+                    continue
+
+                existing = target_conn.execute(select(func.count()).select_from(table)).scalar()
+                if existing:
+                    raise RuntimeError(f'{table.name} is not empty in target (use truncate)')
+
+                # نسخ الأعمدة الموجودة في المصدر فقط (قواعد بيانات أقدم من النماذج)
+                source_columns = {column['name'] for column in inspect(source).get_columns(table.name)}
+                columns = [column for column in table.columns if column.name in source_columns]
+
+                copied = 0
+                with source.connect() as source_conn:
+                    result = source_conn.execution_options(yield_per=batch_size).execute(
+                        select(*columns)
+                    )
+                    for rows in result.partitions():
+                        target_conn.execute(table.insert(), [row._asdict() for row in rows])
+                        copied += len(rows)
+
+                log(f'✔ {table.name}: {copied} rows')
+
+            # جدول FTS5 ليس من النماذج فلا ينشئه create_all، وسجل الترحيلات المنسوخ يعده مطبقاً
+            if product_search.create_index(target_conn):
+                log('✔ products_fts: rebuilt')
+
+            if target.dialect.name == 'postgresql':
+                _reset_sequences(target_conn)
+    finally:
+        source.dispose()
+        target.dispose()
+
+
+def _reset_sequences(conn):
+    """ضبط تسلسلات المفاتيح الأساسية في PostgreSQL بعد إدراج معرفات صريحة"""
+    for table in db.metadata.sorted_tables:
+        for column in table.primary_key.columns:
+            if not column.autoincrement or column.type.python_type is not int:
+                continue
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column.name}'), "
+                f"COALESCE((SELECT MAX({column.name}) FROM {table.name}), 0) + 1, false)"
+            ))
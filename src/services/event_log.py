@@ -0,0 +1,69 @@
+import os
+
+
+class EventLog:
+    """سجل أحداث مشترك بين العمليات على نفس الخادم (عمال gunicorn وعامل التنفيذ) في ملف يضاف إليه فقط
+
+    كل سطر "pid user_id"، وكل عامل يقرأ الأسطر الجديدة فقط عبر os.stat دون قاعدة البيانات.
+    عند تجاوز max_bytes يستبدل الملف بملف فارغ، ويعتبر القراء كل شيء متغيراً.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._inode = None
+        self._offset = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # الملف موجود قبل أول قراءة حتى لا تفوت القراء الأحداث التي تنشئه
+        open(path, 'ab').close()
+
+    def append(self, user_id):
+        line = f'{os.getpid()} {user_id}\n'.encode('ascii')
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                partial = f'{self.path}.{os.getpid()}'
+                open(partial, 'wb').close()
+                os.replace(partial, self.path)
+        except FileNotFoundError:
+            pass
+        # الكتابة بوضع الإضافة ذرية للأسطر القصيرة
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def read_new(self):
+        """الأحداث الجديدة من العمال الآخرين: (مجموعة user_id، هل يجب إبطال الكل)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return set(), False
+
+        reset = False
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # ملف جديد (أول قراءة أو بعد الاستبدال): نبدأ من نهايته
+            reset = self._inode is not None
+            self._inode = stat.st_ino
+            self._offset = stat.st_size
+            return set(), reset
+        if stat.st_size == self._offset:
+            return set(), False
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        # سطر غير مكتمل يقرأ في المرة القادمة
+        complete = data[:data.rfind(b'\n') + 1]
+        self._offset += len(complete)
+
+        pid = os.getpid()
+        users = set()
+        for line in complete.decode('ascii').splitlines():
+            try:
+                writer, user_id = (int(part) for part in line.split())
+            except ValueError:
+                continue
+            if writer != pid:
+                users.add(user_id)
+        return users, False
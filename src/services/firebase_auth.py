@@ -0,0 +1,199 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+
+# عنوان شهادات Google التي توقّع رموز Firebase ID
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+# مدة افتراضية للمفاتيح إذا لم يحتوِ الرد على Cache-Control
+DEFAULT_KEYS_TTL = 3600
+
+# نبدأ التحديث في الخلفية قبل انتهاء صلاحية المفاتيح بهذه المدة (بالثواني)
+REFRESH_MARGIN = 300
+
+# أقل مدة بين عمليتي جلب متتاليتين بسبب kid غير معروف
+MIN_REFETCH_INTERVAL = 60
+
+# بعد انتهاء الصلاحية تستخدم المفاتيح الحالية هذه المدة بينما يجلب خيط واحد المفاتيح الجديدة
+STALE_GRACE = 300
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class GooglePublicKeys:
+    """ذاكرة مؤقتة لمفاتيح Google العامة مع تحديث في الخلفية
+
+    خيط واحد فقط يجلب المفاتيح في كل مرة (_fetch_lock)، والخيوط التي تنتظره
+    تستخدم نتيجته بدلاً من تكرار الجلب.
+    """
+
+    def __init__(self, url=GOOGLE_CERTS_URL, session=None):
+        self.url = url
+        self.session = session or requests.Session()
+        self._keys = {}
+        self._expires_at = 0
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._attempts = 0
+        self._refreshing = False
+        self.refresh_count = 0
+
+    def _fetch(self):
+        response = self.session.get(self.url, timeout=10)
+        response.raise_for_status()
+
+        max_age = DEFAULT_KEYS_TTL
+        match = _MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        if match:
+            max_age = int(match.group(1))
+
+        keys = {
+            kid: load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+            for kid, pem in response.json().items()
+        }
+
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + max_age
+            self.refresh_count += 1
+
+    def _refresh(self, seen_attempts):
+        """جلب المفاتيح إلا إذا أتم خيط آخر محاولة أثناء الانتظار على القفل"""
+        with self._fetch_lock:
+            if self._attempts != seen_attempts:
+                return
+            try:
+                self._fetch()
+            finally:
+                self._attempts += 1
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        seen_attempts = self._attempts
+
+        def run():
+            try:
+                self._refresh(seen_attempts)
+            except Exception as e:
+                # نستمر بالمفاتيح الحالية حتى المحاولة التالية
+                print('ERROR ▶︎ failed to refresh Google public keys:', e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, kid):
+        """إرجاع المفتاح العام الخاص بـ kid مع جلب المفاتيح عند الحاجة"""
+        now = time.time()
+        seen_attempts = self._attempts
+        key = self._keys.get(kid)
+
+        # انتهت الصلاحية منذ وقت قصير: المفتاح الحالي ما زال صالحاً لدى Google، والتحديث في الخلفية
+        if key is not None and self._expires_at <= now < self._expires_at + STALE_GRACE:
+            self._refresh_in_background()
+        # انتهت صلاحية المفاتيح أو المفتاح غير معروف (تدوير المفاتيح): جلب متزامن بخيط واحد
+        elif now >= self._expires_at or (key is None and now - self._fetched_at >= MIN_REFETCH_INTERVAL):
+            self._refresh(seen_attempts)
+            key = self._keys.get(kid)
+        # اقتربت الصلاحية من الانتهاء: تحديث في الخلفية دون إيقاف الطلب
+        elif now >= self._expires_at - REFRESH_MARGIN:
+            self._refresh_in_background()
+
+        return key
+
+
+class FirebaseTokenVerifier:
+    """التحقق المحلي من رموز Firebase ID مع ذاكرة LRU للرموز التي تم التحقق منها"""
+
+    def __init__(self, project_id, max_entries=10000, keys=None):
+        self.project_id = project_id
+        self.issuer = f'https://securetoken.google.com/{project_id}'
+        self.keys = keys or GooglePublicKeys()
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _token_key(id_token):
+        return hashlib.sha256(id_token.encode('utf-8')).digest()
+
+    def _decode(self, id_token):
+        header = jwt.get_unverified_header(id_token)
+        if header.get('alg') != 'RS256':
+            raise jwt.InvalidAlgorithmError('خوارزمية التوقيع غير مدعومة')
+
+        public_key = self.keys.get(header.get('kid'))
+        if public_key is None:
+            raise jwt.InvalidTokenError('مفتاح التوقيع غير معروف')
+
+        claims = jwt.decode(
+            id_token,
+            public_key,
+            algorithms=['RS256'],
+            audience=self.project_id,
+            issuer=self.issuer,
+            options={'require': ['exp', 'iat', 'sub']}
+        )
+
+        if not claims.get('sub'):
+            raise jwt.InvalidTokenError('الرمز لا يحتوي على معرف المستخدم')
+        if claims.get('auth_time', 0) > time.time() + 60:
+            raise jwt.InvalidTokenError('وقت المصادقة في المستقبل')
+
+        # نفس الشكل الذي يرجعه firebase_admin.auth.verify_id_token
+        claims['uid'] = claims['sub']
+        return claims
+
+    def verify(self, id_token):
+        """التحقق من الرمز وإرجاع الـ claims، مع استخدام الذاكرة المؤقتة إن أمكن"""
+        if id_token.startswith('Bearer '):
+            id_token = id_token[7:]
+
+        key = self._token_key(id_token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                expires_at, claims = entry
+                if now < expires_at:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return dict(claims)
+                del self._cache[key]
+            self.misses += 1
+
+        claims = self._decode(id_token)
+
+        with self._lock:
+            self._cache[key] = (claims['exp'], claims)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+        return dict(claims)
+
+    def stats(self):
+        """إحصائيات الذاكرة المؤقتة"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._cache),
+                'max_entries': self.max_entries,
+                'keys_refreshes': self.keys.refresh_count
+            }
@@ -0,0 +1,394 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import and_, or_, select, update
+
+from src.models.db import db
+from src.models.fulfillment import FulfillmentJob
+from src.models.order import Order
+from src.models.product import Product
+from src.services.identity_cache import identity_cache
+from src.services.orders import DISPATCHED_STATUS, PENDING_STATUS, transition_orders
+
+_jobs_table = FulfillmentJob.__table__
+_orders_table = Order.__table__
+
+# حالات الطلب بعد رد المزود
+FULFILLED_STATUS = 'منفذة'
+REJECTED_STATUS = 'مرفوضة'
+
+# التأخير بين المحاولات: BACKOFF_BASE * 2^(المحاولة - 1) حتى BACKOFF_MAX (بالثواني)
+BACKOFF_BASE = 5
+BACKOFF_MAX = 600
+
+DEFAULT_PROVIDER_CONCURRENCY = 4
+DEFAULT_PROVIDER_TIMEOUT = 15
+
+
+class ProviderConfig(namedtuple('ProviderConfig', ['provider', 'url', 'method', 'headers', 'timeout', 'max_concurrency', 'params'])):
+    """إعدادات مزود الخدمة كما في Product.api_details بعد التحليل"""
+
+    __slots__ = ()
+
+
+class PermanentError(Exception):
+    """رفض نهائي من المزود (لا فائدة من إعادة المحاولة)"""
+
+
+class RetryableError(Exception):
+    """خطأ مؤقت (شبكة، مهلة، 5xx، 429) يعاد بعده المحاولة"""
+
+
+@lru_cache(maxsize=1024)
+def parse_api_details(api_details):
+    """تحليل نص api_details مرة واحدة لكل قيمة مختلفة
+
+    الصيغة: {"url": ..., "method": "POST", "headers": {...}, "provider": "اسم",
+              "timeout": 15, "max_concurrency": 4, "params": {...}}
+    """
+    data = json.loads(api_details)
+    url = data['url']
+    return ProviderConfig(
+        provider=data.get('provider') or urlsplit(url).netloc,
+        url=url,
+        method=data.get('method', 'POST').upper(),
+        headers=tuple(sorted((data.get('headers') or {}).items())),
+        timeout=float(data.get('timeout', DEFAULT_PROVIDER_TIMEOUT)),
+        max_concurrency=int(data.get('max_concurrency', DEFAULT_PROVIDER_CONCURRENCY)),
+        params=json.dumps(data.get('params') or {})
+    )
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class ProviderPool:
+    """اتصالات HTTP مجمعة وحد للتزامن لكل مزود"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _get(self, config):
+        with self._lock:
+            session = self._sessions.get(config.provider)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.max_concurrency)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[config.provider] = session
+                self._semaphores[config.provider] = threading.BoundedSemaphore(config.max_concurrency)
+            return session, self._semaphores[config.provider]
+
+    @contextmanager
+    def acquire(self, config):
+        """جلسة المزود بعد حجز مكان ضمن حد التزامن الخاص به"""
+        session, semaphore = self._get(config)
+        with semaphore:
+            yield session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._semaphores.clear()
+
+
+def call_provider(pool, config, order):
+    """إرسال الطلب إلى المزود وإرجاع رده (JSON) أو رفع PermanentError/RetryableError"""
+    payload = {
+        'order_id': order.order_id,
+        'product_id': order.product_id,
+        'quantity': order.quantity,
+        'order_details': json.loads(order.order_details) if order.order_details else None,
+        'params': json.loads(config.params)
+    }
+    try:
+        with pool.acquire(config) as session:
+            response = session.request(
+                config.method,
+                config.url,
+                json=payload,
+                headers=dict(config.headers),
+                timeout=config.timeout
+            )
+    except requests.RequestException as e:
+        raise RetryableError(str(e))
+
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableError(f'HTTP {response.status_code}')
+    if response.status_code >= 400:
+        raise PermanentError(f'HTTP {response.status_code}: {response.text[:500]}')
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+class FulfillmentWorker:
+    """مجموعة خيوط تنفذ مهام الطابور (تعمل كعملية مستقلة: flask fulfillment-worker)
+
+    الحجز يتم بعبارة UPDATE مشروطة لكل مهمة، فيمكن تشغيل أكثر من عامل على نفس قاعدة البيانات.
+    """
+
+    def __init__(self, app, workers=8, poll_interval=2.0, lease_seconds=120, max_attempts=5, log=print):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.log = log
+        self.pool = ProviderPool()
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def _due_jobs(self, session, limit):
+        now = datetime.utcnow()
+        return session.execute(
+            select(_jobs_table.c.job_id)
+            .where(or_(
+                and_(_jobs_table.c.status == 'pending', _jobs_table.c.next_attempt_at <= now),
+                and_(_jobs_table.c.status == 'running', _jobs_table.c.locked_until < now)
+            ))
+            .order_by(_jobs_table.c.next_attempt_at)
+            .limit(limit)
+        ).scalars().all()
+
+    def _claim(self, session, job_id):
+        """حجز مهمة مستحقة (كل حجز يحسب محاولة)
+
+        المهمة التي استنفدت max_attempts (مثلاً انتهت مهلتها في آخر محاولة بعد توقف العامل)
+        لا تحجز: تنهى 'failed' ويرفض طلبها مع استرداده في نفس المعاملة، وترجع False.
+        """
+        now = datetime.utcnow()
+        due = and_(
+            _jobs_table.c.job_id == job_id,
+            or_(
+                _jobs_table.c.status == 'pending',
+                and_(_jobs_table.c.status == 'running', _jobs_table.c.locked_until < now)
+            )
+        )
+        result = session.execute(
+            update(_jobs_table)
+            .where(due, _jobs_table.c.attempts < self.max_attempts)
+            .values(
+                status='running',
+                attempts=_jobs_table.c.attempts + 1,
+                locked_until=now + timedelta(seconds=self.lease_seconds),
+                updated_at=now
+            )
+        )
+        if result.rowcount == 1:
+            session.commit()
+            return True
+
+        exhausted = session.execute(
+            update(_jobs_table)
+            .where(due, _jobs_table.c.attempts >= self.max_attempts)
+            .values(status='failed', last_error='max attempts exceeded', locked_until=None, updated_at=now)
+        )
+        if exhausted.rowcount != 1:
+            session.commit()
+            return False
+        order_id = session.execute(
+            select(_jobs_table.c.order_id).where(_jobs_table.c.job_id == job_id)
+        ).scalar()
+        try:
+            self._reject(session, order_id)
+            self.log(f'✘ order {order_id}: giving up after {self.max_attempts} attempts')
+        except Exception as e:
+            # تبقى المهمة كما هي وتعاد المحاولة في الدورة التالية
+            session.rollback()
+            self.log(f'ERROR ▶︎ fulfillment job {job_id}: {e}')
+        return False
+
+    def claim_batch(self, limit):
+        """حجز حتى limit مهمة مستحقة وإرجاع معرفاتها"""
+        with self.app.app_context():
+            session = db.session
+            return [job_id for job_id in self._due_jobs(session, limit) if self._claim(session, job_id)]
+
+    def _finish(self, session, job_id, status, error=None, retry_at=None, commit=True):
+        values = {'status': status, 'last_error': error, 'locked_until': None, 'updated_at': datetime.utcnow()}
+        if retry_at is not None:
+            values['next_attempt_at'] = retry_at
+        session.execute(update(_jobs_table).where(_jobs_table.c.job_id == job_id).values(**values))
+        if commit:
+            session.commit()
+
+    def _complete(self, session, order_id, status):
+        """نقل طلب العامل إلى حالته النهائية مع الاسترداد عند الرفض، ويثبت معه ما سبقه في المعاملة"""
+        _, affected_users = transition_orders(
+            session, [order_id], status, sources=(PENDING_STATUS, DISPATCHED_STATUS)
+        )
+        for user_id in affected_users:
+            identity_cache.invalidate_user(user_id)
+
+    def _reject(self, session, order_id):
+        self._complete(session, order_id, REJECTED_STATUS)
+
+    def _dispatch(self, session, order_id):
+        """حجز الطلب قبل الاتصال بالمزود: قيد العمل → جاري التنفيذ بعبارة مشروطة
+
+        بعدها لا تستطيع الإدارة رفض الطلب (واسترداده) بينما يسلمه المزود.
+        ترجع False إذا غيرت الإدارة حالة الطلب قبل الحجز.
+        """
+        result = session.execute(
+            update(_orders_table)
+            .where(_orders_table.c.order_id == order_id, _orders_table.c.status == PENDING_STATUS)
+            .values(status=DISPATCHED_STATUS, updated_at=datetime.utcnow())
+        )
+        session.commit()
+        return result.rowcount == 1
+
+    def _give_up(self, session, job_id, order_id, error):
+        """إنهاء المهمة 'failed' ورفض الطلب مع استرداده في معاملة واحدة"""
+        self._finish(session, job_id, 'failed', error, commit=False)
+        self._reject(session, order_id)
+
+    def _record_failure(self, session, job_id, error):
+        """خطأ غير متوقع يحسب محاولة: إعادة الجدولة، أو الرفض النهائي بعد max_attempts"""
+        try:
+            job = session.get(FulfillmentJob, job_id)
+            if job.attempts >= self.max_attempts:
+                self._give_up(session, job_id, job.order_id, error)
+            else:
+                retry_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+                self._finish(session, job_id, 'pending', error, retry_at)
+        except Exception as e:
+            # تبقى محجوزة حتى تنتهي مهلتها فيعالجها _claim
+            session.rollback()
+            self.log(f'ERROR ▶︎ fulfillment job {job_id}: {e}')
+
+    def process(self, job_id):
+        """تنفيذ مهمة واحدة محجوزة"""
+        with self.app.app_context():
+            session = db.session
+            try:
+                job = session.get(FulfillmentJob, job_id)
+                order = session.get(Order, job.order_id)
+                order_id = order.order_id
+                # DISPATCHED_STATUS: محاولة سابقة لهذه المهمة أرسلته ولم تكتمل
+                if order.status not in (PENDING_STATUS, DISPATCHED_STATUS):
+                    # عولج الطلب يدوياً من الإدارة قبل وصول دوره
+                    self._finish(session, job_id, 'done', f'skipped: order is {order.status}')
+                    return
+
+                api_details = session.execute(
+                    select(Product.api_details).where(Product.product_id == order.product_id)
+                ).scalar()
+
+                try:
+                    config = parse_api_details(api_details)
+                except (TypeError, ValueError, KeyError) as e:
+                    self._give_up(session, job_id, order_id, f'invalid api_details: {e}')
+                    self.log(f'✘ order {order_id} rejected: invalid api_details: {e}')
+                    return
+
+                if order.status == PENDING_STATUS and not self._dispatch(session, order_id):
+                    self._finish(session, job_id, 'done', 'skipped: order changed before dispatch')
+                    return
+
+                try:
+                    call_provider(self.pool, config, order)
+                    status = FULFILLED_STATUS
+                except PermanentError as e:
+                    status = REJECTED_STATUS
+                    self.log(f'✘ order {order_id} rejected by {config.provider}: {e}')
+                except RetryableError as e:
+                    if job.attempts >= self.max_attempts:
+                        self._give_up(session, job_id, order_id, str(e))
+                        self.log(f'✘ order {order_id}: giving up after {job.attempts} attempts: {e}')
+                    else:
+                        retry_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+                        self._finish(session, job_id, 'pending', str(e), retry_at)
+                    return
+
+                # إنهاء المهمة وتحديث الطلب في معاملة واحدة (نفس مسار الإدارة: الرفض يعيد المبلغ)
+                self._finish(session, job_id, 'done', commit=False)
+                self._complete(session, order_id, status)
+            except Exception as e:
+                session.rollback()
+                self.log(f'ERROR ▶︎ fulfillment job {job_id}: {e}')
+                self._record_failure(session, job_id, str(e))
+
+    def _run_slot(self, job_id):
+        try:
+            self.process(job_id)
+        finally:
+            self._slots.release()
+
+    def run_once(self):
+        """حجز وتنفيذ دفعة واحدة من المهام المستحقة بالتوازي، وإرجاع عددها"""
+        job_ids = self.claim_batch(self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.process, job_ids))
+        return len(job_ids)
+
+    def run_forever(self):
+        """حلقة العامل: حجز مهام بقدر الخيوط المتاحة فقط"""
+        self.log(f'✔ fulfillment worker started ({self.workers} threads)')
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not self._stop.is_set():
+                free = 0
+                while self._slots.acquire(blocking=False):
+                    free += 1
+                job_ids = self.claim_batch(free) if free else []
+                for _ in range(free - len(job_ids)):
+                    self._slots.release()
+                for job_id in job_ids:
+                    executor.submit(self._run_slot, job_id)
+                if not job_ids:
+                    self._stop.wait(self.poll_interval)
+        self.pool.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def worker_from_env(app):
+    return FulfillmentWorker(
+        app,
+        workers=int(os.environ.get('FULFILLMENT_WORKERS', '8')),
+        poll_interval=float(os.environ.get('FULFILLMENT_POLL_INTERVAL', '2')),
+        max_attempts=int(os.environ.get('FULFILLMENT_MAX_ATTEMPTS', '5'))
+    )
+
+
+def stub_provider_app(fail_rate=0.0, reject_rate=0.0, delay=0.0):
+    """مزود تجريبي محلي لاختبار الطابور: flask fulfillment-stub
+
+    يرد 200 أو 503 (إعادة محاولة) أو 400 (رفض) بالنسب المحددة.
+    """
+    from flask import Flask, jsonify, request
+
+    app = Flask('fulfillment_stub')
+
+    @app.route('/orders', methods=['POST'])
+    def fulfill():
+        time.sleep(delay)
+        roll = random.random()
+        if roll < fail_rate:
+            return jsonify({'status': 'unavailable'}), 503
+        if roll < fail_rate + reject_rate:
+            return jsonify({'status': 'rejected'}), 400
+        data = request.get_json() or {}
+        return jsonify({'status': 'ok', 'order_id': data.get('order_id')}), 200
+
+    return app
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSnapshot:
+    """نسخة خفيفة للقراءة فقط من بيانات المستخدم"""
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class IdentityCache:
+    """ذاكرة مؤقتة قصيرة العمر تربط الرمز المميز بنسخة من بيانات المستخدم
+
+    الإبطال يصل إلى العمليات الأخرى (عمال gunicorn وعامل التنفيذ) عبر EventLog مشترك،
+    ويقرؤه خيط في كل عملية كل watch_interval.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000, events=None, watch_interval=0.5):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.events = events
+        self.watch_interval = watch_interval
+        self._entries = OrderedDict()  # token_key -> (expires_at, snapshot)
+        self._by_user = {}  # user_id -> {token_key, ...}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+
+    def use_events(self, events):
+        self.events = events
+
+    def _ensure_watcher(self):
+        # يبدأ عند أول استخدام داخل كل عامل (بعد fork)
+        if self.events is None or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, daemon=True, name='identity-events')
+                self._watcher.start()
+
+    def _watch(self):
+        self.events.read_new()
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                users, reset = self.events.read_new()
+            except OSError as e:
+                print('ERROR ▶︎ failed to read identity events:', e)
+                continue
+            if reset:
+                self.clear()
+            for user_id in users:
+                self._invalidate_local(user_id)
+
+    @staticmethod
+    def _token_key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].user_id
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def version(self):
+        """عداد الإبطال: يقرأ قبل جلب المستخدم من قاعدة البيانات ويمرر إلى put"""
+        return self._invalidations
+
+    def get(self, token):
+        """إرجاع نسخة المستخدم المخزنة للرمز أو None"""
+        self._ensure_watcher()
+        key = self._token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if time.time() < entry[0]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, token, user, token_exp=None, seen_version=None):
+        """تخزين نسخة من المستخدم حتى انتهاء المدة أو انتهاء صلاحية الرمز
+
+        إذا حدث إبطال بعد seen_version فقد تكون القراءة أقدم منه: ترجع النسخة دون تخزينها.
+        """
+        snapshot = UserSnapshot(user.to_dict())
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+
+        key = self._token_key(token)
+        with self._lock:
+            if seen_version is not None and seen_version != self._invalidations:
+                return snapshot
+            self._discard(key)
+            self._entries[key] = (expires_at, snapshot)
+            self._by_user.setdefault(snapshot.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+        return snapshot
+
+    def _invalidate_local(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            for key in list(self._by_user.get(user_id, ())):
+                self._discard(key)
+
+    def invalidate_user(self, user_id):
+        """حذف جميع النسخ المخزنة لمستخدم بعد تعديل بياناته، في هذه العملية وفي البقية"""
+        self._invalidate_local(user_id)
+        if self.events is not None:
+            try:
+                self.events.append(user_id)
+            except OSError as e:
+                print('ERROR ▶︎ failed to publish identity event:', e)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+
+# نسخة مشتركة على مستوى العملية
+identity_cache = IdentityCache(
+    ttl=int(os.environ.get('IDENTITY_CACHE_TTL', '30')),
+    max_entries=int(os.environ.get('IDENTITY_CACHE_SIZE', '10000'))
+)
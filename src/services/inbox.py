@@ -0,0 +1,333 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from src.models.notification import Broadcast, Notification, NotificationReadMarker
+from src.services import keyset
+
+_notifications_table = Notification.__table__
+_broadcasts_table = Broadcast.__table__
+_markers_table = NotificationReadMarker.__table__
+
+# محاولات إنشاء إشعار عام عند تعارض التسلسل مع كاتب آخر
+CREATE_BROADCAST_ATTEMPTS = 5
+
+# INSERT ... ON CONFLICT DO NOTHING حسب قاعدة البيانات
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# ترتيب المصدرين عند تساوي created_at في الصندوق المدمج (الأعلى أولاً)
+_SOURCE_RANK = {'personal': 1, 'broadcast': 0}
+
+
+class ReadMarker:
+    """حالة قراءة الإشعارات العامة للمستخدم: حد أعلى متصل + استثناءات بعده"""
+
+    __slots__ = ('read_upto_seq', 'read_exceptions', 'unread_personal')
+
+    def __init__(self, read_upto_seq=0, read_exceptions=(), unread_personal=0):
+        self.read_upto_seq = read_upto_seq
+        self.read_exceptions = frozenset(read_exceptions)
+        self.unread_personal = unread_personal
+
+    def is_read(self, seq):
+        return seq <= self.read_upto_seq or seq in self.read_exceptions
+
+    def unread_broadcasts(self, latest):
+        # الاستثناءات دائماً أكبر من read_upto_seq فالحساب لا يحتاج أي استعلام
+        return max(latest - self.read_upto_seq - len(self.read_exceptions), 0)
+
+    def with_read(self, seqs):
+        """حالة جديدة بعد قراءة seqs، مع ضم الاستثناءات المتصلة إلى الحد الأعلى"""
+        upto = self.read_upto_seq
+        exceptions = set(self.read_exceptions)
+        exceptions.update(seq for seq in seqs if seq > upto)
+        while upto + 1 in exceptions:
+            upto += 1
+            exceptions.discard(upto)
+        return ReadMarker(upto, exceptions, self.unread_personal)
+
+
+def latest_seq(session):
+    """آخر تسلسل للإشعارات العامة (قراءة واحدة من الفهرس الفريد)"""
+    return session.execute(select(func.max(_broadcasts_table.c.seq))).scalar() or 0
+
+
+def _count_unread_personal(session, user_id):
+    return session.execute(
+        select(func.count())
+        .select_from(_notifications_table)
+        .where(_notifications_table.c.user_id == user_id, _notifications_table.c.is_read == False)
+    ).scalar()
+
+
+def _load_marker(session, user_id):
+    row = session.execute(
+        select(
+            _markers_table.c.read_upto_seq,
+            _markers_table.c.read_exceptions,
+            _markers_table.c.unread_personal
+        )
+        .where(_markers_table.c.user_id == user_id)
+    ).first()
+    if row is None:
+        return None
+    return ReadMarker(row.read_upto_seq, json.loads(row.read_exceptions or '[]'), row.unread_personal)
+
+
+def get_marker(session, user_id):
+    """حالة القراءة للمستخدم دون كتابة (مسارات GET تعمل على اتصال القراءة فقط)"""
+    marker = _load_marker(session, user_id)
+    if marker is None:
+        marker = ReadMarker(unread_personal=_count_unread_personal(session, user_id))
+    return marker
+
+
+def _ensure_marker(session, user_id):
+    """إنشاء صف الحالة عند أول كتابة مع عدد غير المقروء الشخصي الحالي"""
+    marker = _load_marker(session, user_id)
+    if marker is not None:
+        return marker
+    # طلبان متزامنان لنفس المستخدم: الأول ينشئ الصف والثاني يتجاهل التعارض
+    insert = _INSERTS[session.get_bind().dialect.name]
+    session.execute(insert(_markers_table).values(
+        user_id=user_id,
+        read_upto_seq=0,
+        read_exceptions='[]',
+        unread_personal=_count_unread_personal(session, user_id),
+        updated_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=[_markers_table.c.user_id]))
+    return _load_marker(session, user_id)
+
+
+def start_marker(session, user_id):
+    """صف الحالة لمستخدم جديد: الإشعارات العامة السابقة لإنشاء الحساب تعتبر مقروءة
+
+    يستدعى في نفس معاملة إنشاء المستخدم (بعد flush) ولا يلتزم بها.
+    """
+    session.execute(_markers_table.insert().values(
+        user_id=user_id,
+        read_upto_seq=latest_seq(session),
+        read_exceptions='[]',
+        unread_personal=0,
+        updated_at=datetime.utcnow()
+    ))
+
+
+def unread_count(session, user_id):
+    """عدد غير المقروء: قراءة صف الحالة وآخر تسلسل فقط، مهما كان عدد الإشعارات"""
+    marker = get_marker(session, user_id)
+    broadcasts = marker.unread_broadcasts(latest_seq(session))
+    return {
+        'personal': marker.unread_personal,
+        'broadcast': broadcasts,
+        'total': marker.unread_personal + broadcasts
+    }
+
+
+def create_broadcast(session, title, message):
+    """إضافة إشعار عام بالتسلسل التالي (يحسب داخل عبارة INSERT نفسها) وإرجاعه
+
+    كاتبان متزامنان قد يحسبان نفس التسلسل: الفهرس الفريد على seq يرفض الثاني فيعيد المحاولة.
+    الصف المرجع هو ما أدرجته هذه العبارة (RETURNING) وليس آخر صف في الجدول.
+    """
+    for attempt in range(CREATE_BROADCAST_ATTEMPTS):
+        next_seq = select(
+            func.coalesce(func.max(_broadcasts_table.c.seq), 0) + 1,
+            literal(title),
+            literal(message),
+            literal(datetime.utcnow())
+        )
+        try:
+            broadcast_id = session.execute(
+                _broadcasts_table.insert()
+                .from_select(['seq', 'title', 'message', 'created_at'], next_seq)
+                .returning(_broadcasts_table.c.broadcast_id)
+            ).scalar_one()
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            if attempt == CREATE_BROADCAST_ATTEMPTS - 1:
+                raise
+            continue
+        return session.get(Broadcast, broadcast_id)
+
+
+def create_notification(session, user_id, title, message):
+    """إشعار شخصي مع زيادة عداد غير المقروء للمستخدم في نفس المعاملة"""
+    _ensure_marker(session, user_id)
+    notification = Notification(user_id=user_id, title=title, message=message, is_read=False)
+    session.add(notification)
+    session.flush()
+    session.execute(
+        update(_markers_table)
+        .where(_markers_table.c.user_id == user_id)
+        .values(unread_personal=_markers_table.c.unread_personal + 1)
+    )
+    session.commit()
+    return notification
+
+
+def _store_broadcasts_read(session, user_id, seqs, mark_all, latest):
+    # تحديث متفائل: يطبق فقط إذا لم يتغير الصف منذ قراءته، مع إعادة المحاولة
+    for _ in range(5):
+        marker = _load_marker(session, user_id)
+        if mark_all:
+            updated = ReadMarker(latest, (), marker.unread_personal)
+        else:
+            updated = marker.with_read(seq for seq in seqs if 0 < seq <= latest)
+        if (updated.read_upto_seq == marker.read_upto_seq
+                and updated.read_exceptions == marker.read_exceptions):
+            return
+        result = session.execute(
+            update(_markers_table)
+            .where(
+                _markers_table.c.user_id == user_id,
+                _markers_table.c.read_upto_seq == marker.read_upto_seq,
+                _markers_table.c.read_exceptions == json.dumps(sorted(marker.read_exceptions))
+            )
+            .values(
+                read_upto_seq=updated.read_upto_seq,
+                read_exceptions=json.dumps(sorted(updated.read_exceptions)),
+                updated_at=datetime.utcnow()
+            )
+        )
+        if result.rowcount == 1:
+            return
+    raise RuntimeError('read marker update conflict')
+
+
+def mark_read(session, user_id, notification_ids=(), broadcast_seqs=(), mark_all=False):
+    """تعليم إشعارات شخصية و/أو عامة كمقروءة، وإرجاع عدد غير المقروء الجديد"""
+    _ensure_marker(session, user_id)
+
+    condition = and_(_notifications_table.c.user_id == user_id, _notifications_table.c.is_read == False)
+    if not mark_all:
+        condition = and_(condition, _notifications_table.c.notification_id.in_(list(notification_ids)))
+    if mark_all or notification_ids:
+        changed = session.execute(
+            update(_notifications_table).where(condition).values(is_read=True)
+        ).rowcount
+        if changed:
+            session.execute(
+                update(_markers_table)
+                .where(_markers_table.c.user_id == user_id)
+                .values(unread_personal=_markers_table.c.unread_personal - changed)
+            )
+
+    latest = latest_seq(session)
+    if mark_all or broadcast_seqs:
+        _store_broadcasts_read(session, user_id, broadcast_seqs, mark_all, latest)
+
+    session.commit()
+    marker = _load_marker(session, user_id)
+    broadcasts = marker.unread_broadcasts(latest)
+    return {
+        'personal': marker.unread_personal,
+        'broadcast': broadcasts,
+        'total': marker.unread_personal + broadcasts
+    }
+
+
+def encode_cursor(item):
+    return keyset.encode_cursor(item['sort_created_at'], item['type'], item['id'])
+
+
+def decode_cursor(session, cursor):
+    """(created_at بقيمة keyset.sort_key، المصدر، المعرف) أو ValueError"""
+    created_at, source, item_id = keyset.decode_cursor(session, cursor, str, int)
+    if source not in _SOURCE_RANK:
+        raise ValueError('مؤشر الصفحة غير صالح')
+    return created_at, source, item_id
+
+
+def _after(created_at_column, id_column, source, cursor):
+    """شرط العناصر التي تأتي بعد المؤشر في الترتيب (created_at تنازلي، ثم المصدر، ثم المعرف)"""
+    created_at, cursor_source, cursor_id = cursor
+    if _SOURCE_RANK[source] == _SOURCE_RANK[cursor_source]:
+        return or_(
+            created_at_column < created_at,
+            and_(created_at_column == created_at, id_column < cursor_id)
+        )
+    if _SOURCE_RANK[source] < _SOURCE_RANK[cursor_source]:
+        return created_at_column <= created_at
+    return created_at_column < created_at
+
+
+def inbox(session, user_id, cursor=None, limit=20):
+    """صفحة من صندوق الإشعارات: دمج الشخصية والعامة حسب created_at (ترقيم بالمؤشر)
+
+    يجلب limit + 1 من كل مصدر عبر فهرسه ثم يدمجها، فلا يمر على كامل الجداول.
+    الدمج والمؤشر على created_at كما هو مخزن (keyset.sort_key) حتى يطابقا ترتيب SQL.
+    """
+    personal_created_at = keyset.sort_key(session, _notifications_table.c.created_at)
+    broadcast_created_at = keyset.sort_key(session, _broadcasts_table.c.created_at)
+    personal = (
+        select(
+            _notifications_table.c.notification_id,
+            _notifications_table.c.title,
+            _notifications_table.c.message,
+            _notifications_table.c.is_read,
+            _notifications_table.c.created_at,
+            personal_created_at.label('sort_created_at')
+        )
+        .where(_notifications_table.c.user_id == user_id)
+        .order_by(personal_created_at.desc(), _notifications_table.c.notification_id.desc())
+        .limit(limit + 1)
+    )
+    broadcasts = (
+        select(
+            _broadcasts_table.c.broadcast_id,
+            _broadcasts_table.c.seq,
+            _broadcasts_table.c.title,
+            _broadcasts_table.c.message,
+            _broadcasts_table.c.created_at,
+            broadcast_created_at.label('sort_created_at')
+        )
+        .order_by(broadcast_created_at.desc(), _broadcasts_table.c.broadcast_id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        personal = personal.where(_after(
+            personal_created_at, _notifications_table.c.notification_id, 'personal', cursor
+        ))
+        broadcasts = broadcasts.where(_after(
+            broadcast_created_at, _broadcasts_table.c.broadcast_id, 'broadcast', cursor
+        ))
+
+    marker = get_marker(session, user_id)
+    items = [
+        {
+            'type': 'personal',
+            'id': row.notification_id,
+            'title': row.title,
+            'message': row.message,
+            'is_read': bool(row.is_read),
+            'created_at': row.created_at,
+            'sort_created_at': row.sort_created_at
+        }
+        for row in session.execute(personal)
+    ] + [
+        {
+            'type': 'broadcast',
+            'id': row.broadcast_id,
+            'seq': row.seq,
+            'title': row.title,
+            'message': row.message,
+            'is_read': marker.is_read(row.seq),
+            'created_at': row.created_at,
+            'sort_created_at': row.sort_created_at
+        }
+        for row in session.execute(broadcasts)
+    ]
+    items.sort(key=lambda item: (item['sort_created_at'], _SOURCE_RANK[item['type']], item['id']), reverse=True)
+
+    has_next = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]) if has_next else None
+    for item in items:
+        del item['sort_created_at']
+        item['created_at'] = item['created_at'].isoformat()
+    return items, next_cursor
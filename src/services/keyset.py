@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import String, type_coerce
+
+
+def _stored_as_text(session):
+    return session.get_bind().dialect.name == 'sqlite'
+
+
+def sort_key(session, column):
+    """عمود التاريخ للترتيب والمقارنة في الترقيم بالمؤشر
+
+    SQLite يخزن DateTime نصاً كما كتب: الصفوف المكتوبة بدون أجزاء الثانية ('2025-08-23 22:45:24')
+    لا تساوي التاريخ نفسه بعد تحويله إلى معامل ('2025-08-23 22:45:24.000000'). لذلك نقارن ونرتب
+    على النص الخام (type_coerce بدون CAST فيبقى الفهرس مستخدماً)، ويحمل المؤشر نفس النص.
+    """
+    return type_coerce(column, String) if _stored_as_text(session) else column
+
+
+def encode_cursor(created_at, *values):
+    """مؤشر معتم من قيمة sort_key لآخر صف في الصفحة وبقية مفاتيح الترتيب"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, *values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(session, cursor, *types):
+    """فك المؤشر إلى (created_at, ...) بنفس نوع sort_key، مع تحويل بقية القيم إلى types
+
+    ترفع ValueError إذا كان المؤشر غير صالح.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, *values = json.loads(base64.urlsafe_b64decode(padded))
+        parsed = datetime.fromisoformat(created_at)
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        values = [cast(value) for cast, value in zip(types, values)]
+    except Exception:
+        raise ValueError('مؤشر الصفحة غير صالح')
+    return (created_at if _stored_as_text(session) else parsed, *values)
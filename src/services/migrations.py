@@ -0,0 +1,146 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, inspect, select, text
+
+from src.models.balance import BalanceLedger, BalanceSnapshot
+from src.models.db import db
+from src.models.fulfillment import FulfillmentJob
+from src.models.notification import Broadcast, NotificationReadMarker
+from src.services import product_search
+
+# سجل الترحيلات المطبقة على قاعدة البيانات
+schema_migrations = Table(
+    'schema_migrations',
+    db.metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+
+def _create_indexes(*names):
+    """ترحيل ينشئ فهارس معرفة في النماذج إذا لم تكن موجودة"""
+    def migrate(conn):
+        indexes = {
+            index.name: index
+            for table in db.metadata.sorted_tables
+            for index in table.indexes
+        }
+        for name in names:
+            indexes[name].create(bind=conn, checkfirst=True)
+    return migrate
+
+
+def _balance_ledger(conn):
+    """الرصيد بالهللة في users.balance_minor مع سجل الحركات ولقطات الرصيد
+
+    الأرصدة الحالية (عمود balance القديم) تنقل مع حركة افتتاحية لكل مستخدم
+    حتى يتطابق السجل مع الرصيد من البداية.
+    """
+    BalanceLedger.__table__.create(bind=conn, checkfirst=True)
+    BalanceSnapshot.__table__.create(bind=conn, checkfirst=True)
+
+    columns = {column['name'] for column in inspect(conn).get_columns('users')}
+    if 'balance_minor' in columns:
+        return
+
+    conn.execute(text('ALTER TABLE users ADD COLUMN balance_minor BIGINT NOT NULL DEFAULT 0'))
+    if 'balance' in columns:
+        conn.execute(text(
+            'UPDATE users SET balance_minor = CAST(ROUND(COALESCE(balance, 0) * 100) AS BIGINT)'
+        ))
+        conn.execute(text(
+            'INSERT INTO balance_ledger (user_id, amount_minor, balance_after_minor, kind, reference, created_at) '
+            "SELECT user_id, balance_minor, balance_minor, 'adjustment', 'opening', :now "
+            'FROM users WHERE balance_minor != 0'
+        ), {'now': datetime.utcnow()})
+
+
+def _orders_idempotency_key(conn):
+    """مفتاح منع التكرار للطلبات مع فهرس فريد لكل مستخدم"""
+    columns = {column['name'] for column in inspect(conn).get_columns('orders')}
+    if 'idempotency_key' not in columns:
+        conn.execute(text('ALTER TABLE orders ADD COLUMN idempotency_key VARCHAR(64)'))
+    _create_indexes('ux_orders_user_idempotency')(conn)
+
+
+def _fulfillment_jobs(conn):
+    FulfillmentJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def _broadcast_inbox(conn):
+    """جدول الإشعارات العامة وحالة القراءة لكل مستخدم
+
+    الإشعارات العامة القديمة (user_id فارغ في notifications) تنقل إلى broadcasts بالترتيب الزمني،
+    وتعد مقروءة لجميع المستخدمين الحاليين (حالة القراءة القديمة كانت مشتركة لا لكل مستخدم).
+    """
+    Broadcast.__table__.create(bind=conn, checkfirst=True)
+    NotificationReadMarker.__table__.create(bind=conn, checkfirst=True)
+
+    if conn.execute(text('SELECT COUNT(*) FROM broadcasts')).scalar():
+        return
+    conn.execute(text(
+        'INSERT INTO broadcasts (seq, title, message, created_at) '
+        'SELECT ROW_NUMBER() OVER (ORDER BY created_at, notification_id), title, message, created_at '
+        'FROM notifications WHERE user_id IS NULL'
+    ))
+    conn.execute(text('DELETE FROM notifications WHERE user_id IS NULL'))
+
+    latest = conn.execute(text('SELECT MAX(seq) FROM broadcasts')).scalar()
+    if latest:
+        conn.execute(text(
+            'INSERT INTO notification_read_markers '
+            '(user_id, read_upto_seq, read_exceptions, unread_personal, updated_at) '
+            "SELECT users.user_id, :latest, '[]', "
+            '(SELECT COUNT(*) FROM notifications '
+            'WHERE notifications.user_id = users.user_id AND notifications.is_read = :unread), :now '
+            'FROM users WHERE NOT EXISTS '
+            '(SELECT 1 FROM notification_read_markers WHERE notification_read_markers.user_id = users.user_id)'
+        ), {'latest': latest, 'unread': False, 'now': datetime.utcnow()})
+
+
+# (الإصدار، الاسم، الدالة) بالترتيب، ولا يعدل ترحيل بعد تطبيقه
+MIGRATIONS = [
+    (1, 'products category/created index', _create_indexes(
+        'ix_products_category_created',
+    )),
+    (2, 'hot path indexes', _create_indexes(
+        'ix_orders_product',
+        'ix_orders_user_created',
+        'ix_payment_transactions_user_status',
+        'ix_payment_transactions_status_created',
+        'ix_notifications_user_read',
+        'ix_categories_name',
+    )),
+    (3, 'balance ledger', _balance_ledger),
+    (4, 'orders idempotency key', _orders_idempotency_key),
+    (5, 'fulfillment jobs', _fulfillment_jobs),
+    (6, 'pending payments partial index', _create_indexes(
+        'ix_payment_transactions_pending',
+    )),
+    (7, 'broadcast inbox', _broadcast_inbox),
+    (8, 'product search index', product_search.create_index),
+]
+
+
+def applied_versions(engine):
+    if not inspect(engine).has_table(schema_migrations.name):
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine, log=print):
+    """تطبيق الترحيلات غير المطبقة، كل ترحيل في معاملة مستقلة"""
+    schema_migrations.create(bind=engine, checkfirst=True)
+    done = applied_versions(engine)
+
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        log(f'✔ migration {version}: {name}')
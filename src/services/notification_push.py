@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+
+from src.services import inbox
+
+# رقم المستخدم في سجل الأحداث للإشعار العام (يخص الجميع)
+BROADCAST = 0
+
+
+class NotificationHub:
+    """عدادات غير المقروء لكل مستخدم في ذاكرة العملية مع انتظار التغييرات (SSE)
+
+    العداد يحدث مباشرة عند الكتابة في نفس العملية، وتصل كتابات العمال الآخرين عبر EventLog
+    فيبطل عداد المستخدم المعني فقط ويقرأ من قاعدة البيانات مرة واحدة عند الحاجة.
+    """
+
+    def __init__(self, events=None, watch_interval=0.5, max_users=100000):
+        self.events = events
+        self.watch_interval = watch_interval
+        self.max_users = max_users
+        self._counts = {}  # user_id -> {'personal', 'broadcast', 'total'}
+        self._user_versions = {}  # user_id -> رقم يزيد مع كل تغيير
+        self._broadcast_version = 0
+        self._cond = threading.Condition()
+        self._watcher = None
+
+    def use_events(self, events):
+        self.events = events
+
+    def _ensure_watcher(self):
+        # يبدأ عند أول استخدام داخل كل عامل (بعد fork)
+        if self.events is None or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        with self._cond:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, daemon=True, name='notification-events')
+                self._watcher.start()
+
+    def _watch(self):
+        self.events.read_new()
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                users, reset = self.events.read_new()
+            except OSError as e:
+                print('ERROR ▶︎ failed to read notification events:', e)
+                continue
+            if reset or BROADCAST in users:
+                self._changed(None, None)
+            for user_id in users - {BROADCAST}:
+                self._changed(user_id, None)
+
+    def _changed(self, user_id, update):
+        """تطبيق تغيير وإيقاظ المنتظرين: user_id = None يعني جميع المستخدمين"""
+        with self._cond:
+            if user_id is None:
+                self._broadcast_version += 1
+                if update is None:
+                    self._counts.clear()
+                else:
+                    for counts in self._counts.values():
+                        update(counts)
+            else:
+                self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+                counts = self._counts.get(user_id)
+                if update is None or counts is None:
+                    self._counts.pop(user_id, None)
+                else:
+                    update(counts)
+            self._cond.notify_all()
+
+    def version(self, user_id):
+        return (self._broadcast_version, self._user_versions.get(user_id, 0))
+
+    def counts(self, session, user_id):
+        """عدد غير المقروء من الذاكرة، وقراءة من قاعدة البيانات فقط عند أول طلب أو بعد الإبطال"""
+        self._ensure_watcher()
+        counts = self._counts.get(user_id)
+        if counts is None:
+            seen = self.version(user_id)
+            counts = inbox.unread_count(session, user_id)
+            with self._cond:
+                # لا يحفظ إذا تغير العداد أثناء القراءة (قد تكون القراءة أقدم من الكتابة)
+                if self.version(user_id) == seen:
+                    if len(self._counts) >= self.max_users:
+                        self._counts.clear()
+                    self._counts[user_id] = counts
+        return dict(counts)
+
+    def wait(self, user_id, seen_version, timeout):
+        """انتظار تغيير يخص المستخدم حتى timeout، وترجع الإصدار الحالي"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version(user_id) != seen_version, timeout)
+            return self.version(user_id)
+
+    def personal_created(self, user_id):
+        def update(counts):
+            counts['personal'] += 1
+            counts['total'] += 1
+        self._changed(user_id, update)
+        self._publish(user_id)
+
+    def broadcast_created(self):
+        def update(counts):
+            counts['broadcast'] += 1
+            counts['total'] += 1
+        self._changed(None, update)
+        self._publish(BROADCAST)
+
+    def marked_read(self, user_id, counts):
+        """بعد تعليم الإشعارات كمقروءة: العدد الجديد معروف من نفس المعاملة"""
+        self._changed(user_id, None)
+        with self._cond:
+            self._counts[user_id] = dict(counts)
+        self._publish(user_id)
+
+    def _publish(self, user_id):
+        if self.events is not None:
+            try:
+                self.events.append(user_id)
+            except OSError as e:
+                print('ERROR ▶︎ failed to publish notification event:', e)
+
+
+def sse_message(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+notification_hub = NotificationHub()
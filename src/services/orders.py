@@ -0,0 +1,298 @@
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.fulfillment import FulfillmentJob
+from src.models.order import Order
+from src.models.product import Product, ProductInventory
+from src.models.user import User
+from src.services import balance
+from src.services.vip_tiers import vip_tiers
+
+_users_table = User.__table__
+_inventory_table = ProductInventory.__table__
+_jobs_table = FulfillmentJob.__table__
+
+# الحالة الافتراضية للطلب الجديد
+PENDING_STATUS = 'قيد العمل'
+# طلب api_linked أرسله عامل التنفيذ إلى المزود: لا تغيره الإدارة حتى يرد المزود
+DISPATCHED_STATUS = 'جاري التنفيذ'
+
+
+class OrderError(Exception):
+    """خطأ في إنشاء الطلب مع رسالة للمستخدم ورمز HTTP"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _discounted_total_minor(unit_price, quantity, discount_percentage):
+    gross = balance.to_minor(unit_price) * quantity
+    discount = (Decimal(gross) * Decimal(str(discount_percentage)) / 100).quantize(
+        Decimal('1'), rounding=ROUND_HALF_UP
+    )
+    return gross - int(discount)
+
+
+def find_by_idempotency_key(session, user_id, idempotency_key):
+    return session.execute(
+        select(Order).where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+    ).scalar()
+
+
+def _replay(existing, product_id, quantity):
+    if existing.product_id != product_id or existing.quantity != quantity:
+        raise OrderError('مفتاح Idempotency-Key مستخدم لطلب مختلف', 422)
+    return existing, False
+
+
+def place_order(session, user_id, product_id, quantity=1, order_details=None, idempotency_key=None):
+    """إنشاء طلب في معاملة واحدة قصيرة
+
+    بالترتيب: قراءة المنتج ومستوى VIP، ثم إدراج الطلب، ثم خصم المخزون (لمنتجات الكميات)
+    والرصيد بعبارات UPDATE مشروطة، ثم زيادة total_spent وترقية VIP إن استحق.
+    منتجات api_linked تضاف إلى طابور التنفيذ فقط (لا اتصال بالمزود أثناء الطلب).
+    أي فشل يلغي المعاملة كاملة فلا يخصم شيء دون طلب.
+
+    ترجع (الطلب، created) حيث created = False إذا كان الطلب موجوداً بنفس idempotency_key.
+    """
+    if idempotency_key:
+        existing = find_by_idempotency_key(session, user_id, idempotency_key)
+        if existing is not None:
+            return _replay(existing, product_id, quantity)
+
+    product = session.execute(
+        select(Product.sell_price, Product.product_type, Product.is_available, Product.api_linked)
+        .where(Product.product_id == product_id)
+    ).first()
+    if product is None:
+        raise OrderError('المنتج غير موجود', 404)
+    if not product.is_available:
+        raise OrderError('المنتج غير متوفر حالياً')
+
+    vip_level = session.execute(
+        select(_users_table.c.vip_level).where(_users_table.c.user_id == user_id)
+    ).scalar()
+    tier = vip_tiers.get(vip_level)
+    total_minor = _discounted_total_minor(
+        product.sell_price, quantity, tier.discount_percentage if tier else 0
+    )
+
+    order = Order(
+        user_id=user_id,
+        product_id=product_id,
+        quantity=quantity,
+        total_price=balance.from_minor(total_minor),
+        status=PENDING_STATUS,
+        order_details=order_details,
+        idempotency_key=idempotency_key
+    )
+    session.add(order)
+    try:
+        session.flush()  # للحصول على order_id، والفهرس الفريد يكشف الطلب المكرر
+    except IntegrityError:
+        session.rollback()
+        existing = find_by_idempotency_key(session, user_id, idempotency_key) if idempotency_key else None
+        if existing is None:
+            raise
+        return _replay(existing, product_id, quantity)
+
+    if product.product_type == 'كميات':
+        result = session.execute(
+            update(_inventory_table)
+            .where(
+                _inventory_table.c.product_id == product_id,
+                _inventory_table.c.quantity >= quantity
+            )
+            .values(quantity=_inventory_table.c.quantity - quantity)
+        )
+        if result.rowcount == 0:
+            session.rollback()
+            raise OrderError('الكمية المطلوبة غير متوفرة في المخزون', 409)
+
+    try:
+        balance.apply(session, user_id, -total_minor, 'order', f'order:{order.order_id}')
+    except balance.InsufficientBalance:
+        session.rollback()
+        raise OrderError('الرصيد غير كافٍ لإتمام الطلب', 402)
+
+    session.execute(
+        update(_users_table)
+        .where(_users_table.c.user_id == user_id)
+        .values(
+            total_spent=_users_table.c.total_spent + balance.from_minor(total_minor),
+            updated_at=datetime.utcnow()
+        )
+    )
+    total_spent = session.execute(
+        select(_users_table.c.total_spent).where(_users_table.c.user_id == user_id)
+    ).scalar()
+    eligible = vip_tiers.eligible_for(total_spent)
+    if eligible is not None:
+        # الترقية فقط (لا تخفيض) حتى لو تزامن طلبان
+        session.execute(
+            update(_users_table)
+            .where(_users_table.c.user_id == user_id, _users_table.c.vip_level < eligible.level_id)
+            .values(vip_level=eligible.level_id)
+        )
+
+    if product.api_linked:
+        now = datetime.utcnow()
+        session.execute(_jobs_table.insert().values(
+            order_id=order.order_id,
+            status='pending',
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+            updated_at=now
+        ))
+
+    session.commit()
+    return order, True
+
+
+# الحالات المسموح الانتقال منها إلى كل حالة
+TRANSITIONS = {
+    'منفذة': ('قيد العمل', 'شحن'),
+    'مرفوضة': ('قيد العمل',),
+    'شحن': ('قيد العمل',),
+}
+REJECTED_STATUS = 'مرفوضة'
+
+
+def _status_changed(session, order_ids, status, sources):
+    """تحديث حالة الطلبات بعبارة UPDATE واحدة وإرجاع معرفات الطلبات التي تغيرت فعلاً"""
+    orders = Order.__table__
+    statement = (
+        update(orders)
+        .where(orders.c.order_id.in_(order_ids), orders.c.status.in_(sources))
+        .values(status=status, updated_at=datetime.utcnow())
+    )
+    if session.get_bind().dialect.update_returning:
+        return set(session.execute(statement.returning(orders.c.order_id)).scalars())
+    session.execute(statement)
+    return set(session.execute(
+        select(orders.c.order_id).where(orders.c.order_id.in_(order_ids), orders.c.status == status)
+    ).scalars())
+
+
+def _restock(session, rejected):
+    """إعادة الكميات التي خصمها place_order من مخزون منتجات الكميات، بتحديث واحد (executemany)"""
+    quantities = {}
+    for row in rejected:
+        quantities[row.product_id] = quantities.get(row.product_id, 0) + row.quantity
+    stocked = set(session.execute(
+        select(Product.product_id)
+        .where(Product.product_id.in_(list(quantities)), Product.product_type == 'كميات')
+    ).scalars())
+    if stocked:
+        session.execute(
+            update(_inventory_table)
+            .where(_inventory_table.c.product_id == bindparam('b_product_id'))
+            .values(quantity=_inventory_table.c.quantity + bindparam('b_quantity')),
+            [{'b_product_id': product_id, 'b_quantity': quantities[product_id]} for product_id in stocked]
+        )
+
+
+def _refund_rejected(session, rejected):
+    """استرداد الطلبات المرفوضة دفعة واحدة: الرصيد والمخزون، وإعادة حساب VIP مرة لكل مستخدم"""
+    balance.credit_many(session, [
+        (row.user_id, balance.to_minor(row.total_price), 'refund', f'order:{row.order_id}')
+        for row in rejected
+    ])
+    _restock(session, rejected)
+
+    spent = {}
+    for row in rejected:
+        spent[row.user_id] = spent.get(row.user_id, 0) + row.total_price
+    session.execute(
+        update(_users_table)
+        .where(_users_table.c.user_id == bindparam('b_user_id'))
+        .values(total_spent=_users_table.c.total_spent - bindparam('b_amount')),
+        [{'b_user_id': user_id, 'b_amount': amount} for user_id, amount in spent.items()]
+    )
+
+    recompute_vip_levels(session, spent)
+    return set(spent)
+
+
+def recompute_vip_levels(session, user_ids):
+    """إعادة حساب مستوى VIP لمجموعة مستخدمين باستعلام واحد وتحديث واحد (executemany)
+
+    الترقية فقط كما في place_order: انخفاض total_spent بعد الاسترداد لا يخفض المستوى.
+    """
+    users = session.execute(
+        select(_users_table.c.user_id, _users_table.c.total_spent, _users_table.c.vip_level)
+        .where(_users_table.c.user_id.in_(list(user_ids)))
+    ).all()
+    changes = []
+    for user_id, total_spent, vip_level in users:
+        eligible = vip_tiers.eligible_for(max(total_spent or 0, 0))
+        if eligible is not None and eligible.level_id > (vip_level or 0):
+            changes.append({'b_user_id': user_id, 'b_level': eligible.level_id})
+    if changes:
+        session.execute(
+            update(_users_table)
+            .where(_users_table.c.user_id == bindparam('b_user_id'), _users_table.c.vip_level < bindparam('b_level'))
+            .values(vip_level=bindparam('b_level')),
+            changes
+        )
+
+
+def transition_orders(session, order_ids, status, sources=None):
+    """نقل مجموعة طلبات إلى حالة جديدة في معاملة واحدة
+
+    sources: الحالات المسموح الانتقال منها (الافتراضي TRANSITIONS للإدارة، وعامل التنفيذ
+    يمرر DISPATCHED_STATUS لطلباته).
+    ترجع (النتائج لكل طلب بترتيب الإدخال، معرفات المستخدمين الذين تغير رصيدهم).
+    الطلبات المرفوضة تسترد قيمتها إلى الرصيد عبر سجل الحركات، وكمياتها إلى المخزون، في نفس المعاملة.
+    """
+    if status not in TRANSITIONS:
+        raise OrderError('حالة الطلب غير صحيحة')
+    if sources is None:
+        sources = TRANSITIONS[status]
+
+    orders = Order.__table__
+    current = {
+        row.order_id: row
+        for row in session.execute(
+            select(
+                orders.c.order_id, orders.c.user_id, orders.c.status, orders.c.total_price,
+                orders.c.product_id, orders.c.quantity
+            )
+            .where(orders.c.order_id.in_(order_ids))
+        )
+    }
+
+    candidates = [
+        order_id for order_id in dict.fromkeys(order_ids)
+        if order_id in current and current[order_id].status in sources
+    ]
+    changed = _status_changed(session, candidates, status, sources) if candidates else set()
+
+    affected_users = set()
+    if status == REJECTED_STATUS and changed:
+        affected_users = _refund_rejected(session, [
+            current[order_id] for order_id in candidates if order_id in changed
+        ])
+
+    session.commit()
+
+    results = []
+    for order_id in order_ids:
+        if order_id in changed:
+            results.append({'order_id': order_id, 'success': True, 'status': status})
+        elif order_id not in current:
+            results.append({'order_id': order_id, 'success': False, 'message': 'الطلب غير موجود'})
+        else:
+            results.append({
+                'order_id': order_id,
+                'success': False,
+                'status': current[order_id].status,
+                'message': f'لا يمكن نقل الطلب من "{current[order_id].status}" إلى "{status}"'
+            })
+    return results, affected_users
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from src.models.payment import PaymentTransaction
+from src.services import balance
+
+_transactions_table = PaymentTransaction.__table__
+
+PENDING_STATUS = 'معلق'
+APPROVED_STATUS = 'مكتمل'
+REJECTED_STATUS = 'مرفوض'
+
+
+def _reviewed(session, transaction_ids, status):
+    """نقل المعاملات المعلقة إلى الحالة الجديدة بعبارة UPDATE واحدة وإرجاع ما تغير فعلاً"""
+    statement = (
+        update(_transactions_table)
+        .where(
+            _transactions_table.c.transaction_id.in_(transaction_ids),
+            PaymentTransaction.pending_clause()
+        )
+        .values(status=status, updated_at=datetime.utcnow())
+    )
+    if session.get_bind().dialect.update_returning:
+        return set(session.execute(statement.returning(_transactions_table.c.transaction_id)).scalars())
+    session.execute(statement)
+    return set(session.execute(
+        select(_transactions_table.c.transaction_id).where(
+            _transactions_table.c.transaction_id.in_(transaction_ids),
+            _transactions_table.c.status == status
+        )
+    ).scalars())
+
+
+def review_transactions(session, transaction_ids, approve):
+    """قبول أو رفض مجموعة معاملات معلقة في معاملة قاعدة بيانات واحدة
+
+    القبول يضيف المبالغ إلى الأرصدة دفعة واحدة عبر سجل الحركات. الشحن لا يغير total_spent
+    فلا يعاد حساب مستوى VIP هنا.
+    ترجع (النتائج لكل معاملة بترتيب الإدخال، معرفات المستخدمين الذين تغير رصيدهم).
+    """
+    status = APPROVED_STATUS if approve else REJECTED_STATUS
+    current = {
+        row.transaction_id: row
+        for row in session.execute(
+            select(
+                _transactions_table.c.transaction_id,
+                _transactions_table.c.user_id,
+                _transactions_table.c.amount,
+                _transactions_table.c.status
+            )
+            .where(_transactions_table.c.transaction_id.in_(transaction_ids))
+        )
+    }
+
+    candidates = [
+        transaction_id for transaction_id in dict.fromkeys(transaction_ids)
+        if transaction_id in current and current[transaction_id].status == PENDING_STATUS
+    ]
+    changed = _reviewed(session, candidates, status) if candidates else set()
+
+    affected_users = set()
+    if approve and changed:
+        credits = [
+            (current[transaction_id].user_id, balance.to_minor(current[transaction_id].amount),
+             'payment', f'payment:{transaction_id}')
+            for transaction_id in candidates if transaction_id in changed
+        ]
+        balance.credit_many(session, credits)
+        affected_users = {user_id for user_id, _, _, _ in credits}
+
+    session.commit()
+
+    results = []
+    for transaction_id in transaction_ids:
+        if transaction_id in changed:
+            results.append({'transaction_id': transaction_id, 'success': True, 'status': status})
+        elif transaction_id not in current:
+            results.append({'transaction_id': transaction_id, 'success': False, 'message': 'المعاملة غير موجودة'})
+        else:
+            results.append({
+                'transaction_id': transaction_id,
+                'success': False,
+                'status': current[transaction_id].status,
+                'message': 'تمت مراجعة المعاملة مسبقاً'
+            })
+    return results, affected_users
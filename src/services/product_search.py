@@ -0,0 +1,132 @@
+import re
+import time
+import weakref
+
+from sqlalchemy import Float, Integer, text
+from sqlalchemy.exc import OperationalError
+
+# التشكيل وعلامة التطويل
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+# توحيد أشكال الألف والهمزة
+_NORMALIZE_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# نتيجة فحص وجود الجدول لكل محرك: (متاح، وقت الفحص). المتاح لا يعاد فحصه، وغير المتاح
+# يعاد بعد FTS_RECHECK_SECONDS حتى يرى العامل الجدول بعد تطبيق الترحيل دون إعادة تشغيل
+FTS_RECHECK_SECONDS = 30
+_fts_checks = weakref.WeakKeyDictionary()
+
+
+def normalize_arabic(value):
+    """إزالة التشكيل وتوحيد أشكال الألف والهمزة"""
+    if not value:
+        return ''
+    value = _DIACRITICS_RE.sub('', value)
+    return value.translate(_NORMALIZE_MAP).lower()
+
+
+def build_match_query(search):
+    """تحويل نص البحث إلى تعبير MATCH: كل كلمة كبادئة، والكلمات مجتمعة (AND)"""
+    tokens = _TOKEN_RE.findall(normalize_arabic(search))
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _table_exists(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    )).first() is not None
+
+
+def is_enabled(session):
+    """هل جدول FTS5 موجود في قاعدة البيانات التي تنفذ عليها الجلسة"""
+    engine = session.get_bind()
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    enabled, checked_at = _fts_checks.get(engine, (False, None))
+    if enabled:
+        return True
+    now = time.monotonic()
+    if checked_at is None or now - checked_at >= FTS_RECHECK_SECONDS:
+        enabled = _table_exists(session)
+        _fts_checks[engine] = (enabled, now)
+    return enabled
+
+
+def create_index(conn):
+    """إنشاء جدول FTS5 وتعبئته من المنتجات (ترحيل المخطط، وبعد copy-db)
+
+    ترجع False إذا لم تكن قاعدة البيانات SQLite أو كانت نسخة SQLite بدون FTS5 (البحث يعود إلى LIKE).
+    """
+    if conn.dialect.name != 'sqlite':
+        return False
+    if not _table_exists(conn):
+        try:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE products_fts USING fts5("
+                "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+        except OperationalError as e:
+            print('ERROR ▶︎ FTS5 not available:', e)
+            return False
+    rebuild(conn)
+    return True
+
+
+def rebuild(session):
+    """إعادة بناء الفهرس من جدول المنتجات (جلسة أو اتصال)"""
+    session.execute(text("DELETE FROM products_fts"))
+    rows = session.execute(text("SELECT product_id, name, description FROM products")).fetchall()
+    if rows:
+        session.execute(
+            text("INSERT INTO products_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+            [
+                {
+                    'id': row.product_id,
+                    'name': normalize_arabic(row.name),
+                    'description': normalize_arabic(row.description)
+                }
+                for row in rows
+            ]
+        )
+
+
+def index_product(session, product):
+    """إضافة أو تحديث منتج في الفهرس ضمن نفس المعاملة"""
+    if not is_enabled(session):
+        return
+    remove_product(session, product.product_id)
+    session.execute(
+        text("INSERT INTO products_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+        {
+            'id': product.product_id,
+            'name': normalize_arabic(product.name),
+            'description': normalize_arabic(product.description)
+        }
+    )
+
+
+def remove_product(session, product_id):
+    """حذف منتج من الفهرس ضمن نفس المعاملة"""
+    if not is_enabled(session):
+        return
+    session.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {'id': product_id})
+
+
+def match_subquery(search):
+    """استعلام فرعي (rowid, rank) للمنتجات المطابقة، الأصغر rank هو الأكثر صلة"""
+    return text(
+        "SELECT rowid, bm25(products_fts, 10.0, 1.0) AS rank "
+        "FROM products_fts WHERE products_fts MATCH :match"
+    ).bindparams(match=build_match_query(search)).columns(rowid=Integer, rank=Float).subquery()
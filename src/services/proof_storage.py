@@ -0,0 +1,171 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # اختياري: بدون Pillow تعرض الصورة الأصلية بدلاً من المصغرة
+    Image = None
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# أنواع الصور المقبولة حسب أول بايتات في الملف
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'RIFF', 'image/webp'),
+)
+
+THUMBNAIL_SIZE = (320, 320)
+
+
+def is_digest(value):
+    return bool(_DIGEST_RE.match(value or ''))
+
+
+def sniff_mimetype(head):
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            if mimetype == 'image/webp' and head[8:12] != b'WEBP':
+                continue
+            return mimetype
+    return None
+
+
+class FileTooLarge(ValueError):
+    """حجم الملف المرفوع تجاوز max_bytes"""
+
+
+class HashingWriter:
+    """ملف مؤقت يحسب sha256 أثناء الكتابة (يستخدم كـ stream_factory لمحلل multipart)"""
+
+    def __init__(self, directory, max_bytes):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b''
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            # لا نترك ما كتب حتى الآن في المجلد المؤقت
+            self.discard()
+            raise FileTooLarge('الملف أكبر من الحد المسموح')
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def seek(self, *args):
+        # المحلل يعيد المؤشر إلى البداية بعد الانتهاء، ولا نقرأ الملف مرة أخرى
+        return 0
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+
+class LocalProofStorage:
+    """تخزين محلي معنون بالمحتوى: root/ab/cd/<sha256> مع المصغرة بجانبه
+
+    أي تخزين آخر (S3 مثلاً) يكفي أن يوفر نفس الدوال: writer و commit و path و thumbnail_path.
+    """
+
+    def __init__(self, root, max_bytes=10 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._tmp = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def _dir(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4])
+
+    def path(self, digest):
+        return os.path.join(self._dir(digest), digest)
+
+    def thumbnail_path(self, digest):
+        return self.path(digest) + '.thumb.jpg'
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def writer(self):
+        return HashingWriter(self._tmp, self.max_bytes)
+
+    def commit(self, writer):
+        """نقل الملف المؤقت إلى مساره النهائي، وترجع (digest, created)
+
+        إذا كان نفس المحتوى مخزناً من قبل يحذف الملف المؤقت (لا تكرار).
+        """
+        writer.close()
+        digest = writer.digest
+        target = self.path(digest)
+        if os.path.exists(target):
+            writer.discard()
+            return digest, False
+        os.makedirs(self._dir(digest), exist_ok=True)
+        os.replace(writer.path, target)
+        return digest, True
+
+
+class ThumbnailPool:
+    """توليد المصغرات في خيوط خلفية حتى لا ينتظرها طلب الرفع"""
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def _get_executor(self):
+        # ينشأ عند أول استخدام داخل كل عامل gunicorn
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnails')
+        return self._executor
+
+    def submit(self, storage, digest):
+        """جدولة توليد المصغرة إذا لم تكن موجودة أو قيد التوليد"""
+        if not self.enabled or os.path.exists(storage.thumbnail_path(digest)):
+            return
+        with self._lock:
+            if digest in self._pending:
+                return
+            self._pending.add(digest)
+        self._get_executor().submit(self._generate, storage, digest)
+
+    def _generate(self, storage, digest):
+        target = storage.thumbnail_path(digest)
+        try:
+            with Image.open(storage.path(digest)) as image:
+                image.thumbnail(THUMBNAIL_SIZE)
+                partial = target + '.part'
+                image.convert('RGB').save(partial, 'JPEG', quality=80, optimize=True)
+                os.replace(partial, target)
+        except Exception as e:
+            print('ERROR ▶︎ thumbnail failed for', digest, e)
+        finally:
+            with self._lock:
+                self._pending.discard(digest)
+
+
+thumbnails = ThumbnailPool(int(os.environ.get('THUMBNAIL_WORKERS', '2')))
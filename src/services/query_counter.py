@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """عداد لاستعلامات SQL المنفذة على محرك قاعدة البيانات"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """عد الاستعلامات المنفذة داخل الكتلة
+
+    with count_queries(db.engine) as counter:
+        ...
+    print(counter.count)
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """فشل الكتلة إذا تجاوز عدد الاستعلامات الحد المسموح (لاكتشاف مشاكل N+1)"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise AssertionError(f'executed {counter.count} queries, expected at most {limit}:\n{statements}')
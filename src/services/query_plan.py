@@ -0,0 +1,61 @@
+from sqlalchemy import func, select
+
+
+def explain(session, statement):
+    """خطة تنفيذ SQLite للاستعلام (قائمة بأسطر detail)"""
+    if hasattr(statement, 'statement'):
+        statement = statement.statement
+    bind = session.get_bind()
+    compiled = statement.compile(dialect=bind.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with bind.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def _uses_virtual_index(detail):
+    # جداول FTS5: "VIRTUAL TABLE INDEX 0:M1" بحث بالفهرس، و"0:" بلا قيود مسح كامل
+    marker = 'VIRTUAL TABLE INDEX '
+    return marker in detail and not detail.endswith(':')
+
+
+def table_scans(plan):
+    """الأسطر التي تمثل مسحاً كاملاً لجدول دون فهرس"""
+    return [
+        detail for detail in plan
+        if detail.startswith('SCAN ') and 'USING' not in detail and not _uses_virtual_index(detail)
+    ]
+
+
+def assert_no_table_scan(session, statement):
+    """فشل إذا تراجع الاستعلام إلى مسح كامل للجدول"""
+    plan = explain(session, statement)
+    scans = table_scans(plan)
+    if scans:
+        raise AssertionError('table scan in query plan:\n' + '\n'.join(plan))
+    return plan
+
+
+def hot_queries():
+    """الاستعلامات الأكثر تكراراً التي يجب أن تستخدم فهرساً"""
+    from src.models.category import Category
+    from src.models.notification import Broadcast, Notification
+    from src.models.order import Order
+    from src.models.payment import PaymentTransaction
+    from src.models.product import Product
+
+    return {
+        'orders by product': select(func.count()).select_from(Order).where(Order.product_id == 1),
+        'products by category': select(Product).where(Product.category_id == 1)
+            .order_by(Product.created_at.desc(), Product.product_id.desc()),
+        'transactions by user and status': select(PaymentTransaction)
+            .where(PaymentTransaction.user_id == 1, PaymentTransaction.status == 'معلق'),
+        'pending payments queue': select(PaymentTransaction)
+            .where(PaymentTransaction.pending_clause())
+            .order_by(PaymentTransaction.created_at, PaymentTransaction.transaction_id),
+        'unread notifications': select(Notification)
+            .where(Notification.user_id == 1, Notification.is_read == False),
+        'broadcasts inbox page': select(Broadcast)
+            .order_by(Broadcast.created_at.desc(), Broadcast.broadcast_id.desc()).limit(21),
+        'category by name': select(Category).where(Category.name == 'x'),
+    }
@@ -0,0 +1,101 @@
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # اختياري: نعود إلى مزود JSON الافتراضي في Flask
+    orjson = None
+
+# دوال التحويل المولدة لكل نموذج
+_serializers = {}
+_row_serializers = {}
+
+
+def _fields(model):
+    """أعمدة النموذج بالترتيب مع استبعاد الحقول الحساسة (__serialize_exclude__)"""
+    exclude = set(getattr(model, '__serialize_exclude__', ()))
+    fields = []
+    for attr in model.__mapper__.column_attrs:
+        if attr.key in exclude:
+            continue
+        column = attr.columns[0]
+        try:
+            is_temporal = issubclass(column.type.python_type, (date, datetime))
+        except NotImplementedError:
+            is_temporal = False
+        fields.append((attr.key, is_temporal))
+    return fields
+
+
+def _compile(fields, access):
+    """توليد دالة تبني القاموس مباشرة بدلاً من حلقة على الأعمدة في كل صف"""
+    items = []
+    for index, (key, is_temporal) in enumerate(fields):
+        value = access(key, index)
+        if is_temporal:
+            value = f'(None if {value} is None else {value}.isoformat())'
+        items.append(f'{key!r}: {value}')
+    source = 'def serialize(obj):\n    return {' + ', '.join(items) + '}\n'
+    namespace = {}
+    exec(source, namespace)
+    return namespace['serialize']
+
+
+def get_serializer(model):
+    """دالة تحويل كائن من النموذج إلى قاموس، تولد مرة واحدة لكل نموذج"""
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _compile(_fields(model), lambda key, index: f'obj.{key}')
+        _serializers[model] = serializer
+    return serializer
+
+
+def serialize(obj):
+    """تحويل كائن ORM إلى قاموس بنفس شكل to_dict()"""
+    return get_serializer(type(obj))(obj)
+
+
+def row_columns(model):
+    """أعمدة النموذج المطلوبة للمسار السريع (بدون تحميل كائنات ORM)"""
+    return [getattr(model, key) for key, _ in _fields(model)]
+
+
+def get_row_serializer(model):
+    serializer = _row_serializers.get(model)
+    if serializer is None:
+        serializer = _compile(_fields(model), lambda key, index: f'obj[{index}]')
+        _row_serializers[model] = serializer
+    return serializer
+
+
+def serialize_rows(query, model):
+    """المسار السريع: جلب الأعمدة كصفوف وتحويلها مباشرة دون إنشاء كائنات ORM
+
+    query: استعلام على النموذج (مثل Product.query.filter_by(...))
+    """
+    serializer = get_row_serializer(model)
+    return [serializer(row) for row in query.with_entities(*row_columns(model))]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """مزود JSON لـ Flask يعتمد على orjson عند توفره"""
+
+    def dumps(self, obj, **kwargs):
+        # التواريخ تمر إلى default للحفاظ على نفس تنسيق Flask
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def install_json_provider(app):
+    """تفعيل مزود orjson إذا كانت المكتبة مثبتة"""
+    if orjson is not None:
+        app.json = FastJSONProvider(app)
+    return app.json
@@ -0,0 +1,63 @@
+from flask import Response, current_app, stream_with_context
+
+from src.services.serialization import get_row_serializer, row_columns
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def iter_rows(query, model, batch_size=500):
+    """المرور على نتائج الاستعلام دفعة بعد دفعة دون تحميل الجدول كاملاً في الذاكرة"""
+    serializer = get_row_serializer(model)
+    rows = query.with_entities(*row_columns(model)).execution_options(yield_per=batch_size)
+    for row in rows:
+        yield serializer(row)
+
+
+def _batches(query, model, batch_size, encode):
+    batch = []
+    for item in iter_rows(query, model, batch_size):
+        batch.append(encode(item))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def wants_ndjson(request):
+    """هل طلب العميل NDJSON (عبر format=ndjson أو ترويسة Accept)"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_json_array(query, model, envelope=None, batch_size=500):
+    """رد JSON مجزأ: {..envelope, "data": [ ... ]} يُبنى أثناء الإرسال
+
+    envelope: حقول إضافية تسبق مصفوفة data في الرد
+    """
+    dumps = current_app.json.dumps
+    head = dumps(envelope or {})[:-1]
+    head = (head + ',' if len(head) > 1 else head) + '"data":['
+
+    def generate():
+        yield head
+        first = True
+        for batch in _batches(query, model, batch_size, dumps):
+            chunk = ','.join(batch)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def stream_ndjson(query, model, batch_size=500):
+    """رد NDJSON: سطر JSON لكل صف"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        for batch in _batches(query, model, batch_size, dumps):
+            yield '\n'.join(batch) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
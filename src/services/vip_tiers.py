@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from sqlalchemy import event
+
+
+class VIPTier(namedtuple('VIPTier', ['level_id', 'level_name', 'min_spent', 'discount_percentage'])):
+    """نسخة ثابتة من مستوى VIP"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return self._asdict()
+
+
+class _TierTable:
+    """جدول المستويات مرتب بطريقتين للبحث الثنائي"""
+
+    def __init__(self, tiers):
+        self.by_id = sorted(tiers, key=lambda tier: tier.level_id)
+        self.ids = [tier.level_id for tier in self.by_id]
+
+        self.by_spent = sorted(tiers, key=lambda tier: (tier.min_spent, tier.level_id))
+        self.spent = [tier.min_spent for tier in self.by_spent]
+
+        # أعلى مستوى (حسب level_id) بين المستويات حتى هذا الموضع
+        self.best_upto = []
+        best = None
+        for tier in self.by_spent:
+            if best is None or tier.level_id > best.level_id:
+                best = tier
+            self.best_upto.append(best)
+
+
+class VIPTierIndex:
+    """فهرس مستويات VIP في الذاكرة على مستوى العملية
+
+    التعديل عبر ORM في نفس العملية يبطل الفهرس فوراً. أي تعديل آخر (SQL مباشر، أمر CLI،
+    عامل آخر) يظهر بعد ttl ثانية على الأكثر: الجدول صغير فتعاد قراءته كاملاً.
+    """
+
+    def __init__(self, ttl=10.0):
+        self.ttl = ttl
+        self._model = None
+        self._table = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def bind(self, model):
+        """ربط الفهرس بنموذج VIPLevel، ويحمل الجدول عند أول قراءة"""
+        if self._model is model:
+            return
+        self._model = model
+        self._table = None
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, self._on_change)
+
+    def _on_change(self, mapper, connection, target):
+        # إعادة التحميل عند أول قراءة بعد التعديل
+        self._table = None
+
+    def reload(self):
+        rows = self._model.query.all()
+        tiers = [
+            VIPTier(row.level_id, row.level_name, row.min_spent, row.discount_percentage)
+            for row in rows
+        ]
+        self._table = _TierTable(tiers)
+        self._loaded_at = time.monotonic()
+
+    def _expired(self):
+        return self._table is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def _get_table(self):
+        if self._expired():
+            with self._lock:
+                if self._expired():
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        if self._table is None:
+                            raise
+                        # نستمر بالجدول الحالي حتى المحاولة التالية
+                        print('ERROR ▶︎ failed to reload VIP tiers:', e)
+                        self._loaded_at = time.monotonic()
+        return self._table
+
+    def all(self):
+        """جميع المستويات مرتبة حسب level_id"""
+        return list(self._get_table().by_id)
+
+    def get(self, level_id):
+        """المستوى الحالي حسب level_id"""
+        table = self._get_table()
+        i = bisect_left(table.ids, level_id)
+        if i < len(table.ids) and table.ids[i] == level_id:
+            return table.by_id[i]
+        return None
+
+    def next_after(self, level_id):
+        """أول مستوى أعلى من level_id"""
+        table = self._get_table()
+        i = bisect_right(table.ids, level_id)
+        if i < len(table.by_id):
+            return table.by_id[i]
+        return None
+
+    def eligible_for(self, total_spent):
+        """أعلى مستوى يستحقه المستخدم بناءً على إجمالي الإنفاق"""
+        table = self._get_table()
+        i = bisect_right(table.spent, total_spent)
+        if i == 0:
+            return None
+        return table.best_upto[i - 1]
+
+
+vip_tiers = VIPTierIndex(ttl=float(os.environ.get('VIP_TIERS_TTL', '10')))
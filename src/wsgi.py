@@ -0,0 +1,4 @@
+from src.main import create_app
+
+# نقطة الدخول لخادم الإنتاج: gunicorn -c gunicorn.conf.py src.wsgi:app
+app = create_app()
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.services.firebase_auth import FirebaseTokenVerifier
+from src.services.identity_cache import identity_cache
+
+PROJECT_ID = 'test-project'
+KEY_ID = 'test-key'
+
+
+class StaticKeys:
+    """نفس واجهة GooglePublicKeys بمفتاح محلي بدلاً من شهادات Google"""
+
+    refresh_count = 0
+
+    def __init__(self, keys):
+        self._keys = keys
+
+    def get(self, kid):
+        return self._keys.get(kid)
+
+
+@pytest.fixture(scope='session')
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, signing_key):
+    """تطبيق بقاعدة SQLite مؤقتة والتحقق من رموز Firebase بمفتاح الاختبار"""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv('CATALOG_VERSION_FILE', str(tmp_path / 'catalog.version'))
+    monkeypatch.setenv('NOTIFICATION_EVENTS_FILE', str(tmp_path / 'notifications.events'))
+    monkeypatch.setenv('IDENTITY_EVENTS_FILE', str(tmp_path / 'identity.events'))
+    monkeypatch.setenv('PROOF_STORAGE_DIR', str(tmp_path / 'proofs'))
+
+    from src import main
+    from src.models.db import db
+
+    monkeypatch.setattr(main, 'init_firebase', lambda: None)
+    monkeypatch.setattr(main, 'token_verifier', FirebaseTokenVerifier(
+        PROJECT_ID,
+        keys=StaticKeys({KEY_ID: signing_key.public_key()})
+    ))
+
+    app = main.create_app()
+    app.config['TESTING'] = True
+    main.init_database(app)
+    identity_cache.clear()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """إنشاء مستخدم نشط وإرجاع user_id، مع رصيد افتتاحي عبر سجل الحركات"""
+    from src.models.db import db
+    from src.models.user import User
+    from src.services import balance
+
+    def make(username='buyer', opening_balance=0, **fields):
+        with app.app_context():
+            user = User(
+                username=username,
+                email=f'{username}@example.com',
+                vip_level=fields.pop('vip_level', 1),
+                total_spent=fields.pop('total_spent', 0.0),
+                status=fields.pop('status', 'نشط'),
+                **fields
+            )
+            user.set_password('secret123')
+            db.session.add(user)
+            db.session.flush()
+            if opening_balance:
+                balance.credit(db.session, user.user_id, opening_balance, 'adjustment', 'opening')
+            db.session.commit()
+            return user.user_id
+    return make
+
+
+@pytest.fixture
+def firebase_token(signing_key):
+    """رمز Firebase ID موقع بمفتاح الاختبار، مع claims إضافية (admin=True مثلاً)"""
+    def make(uid='user-1', **claims):
+        now = int(time.time())
+        payload = {
+            'iss': f'https://securetoken.google.com/{PROJECT_ID}',
+            'aud': PROJECT_ID,
+            'sub': uid,
+            'iat': now,
+            'exp': now + 3600,
+            **claims
+        }
+        return jwt.encode(payload, signing_key, algorithm='RS256', headers={'kid': KEY_ID})
+    return make
+
+
+@pytest.fixture
+def admin_headers(firebase_token):
+    return {'Authorization': firebase_token('admin-1', admin=True)}
+
+
+@pytest.fixture
+def user_headers(firebase_token):
+    return {'Authorization': firebase_token('user-1')}
+
+
+@pytest.fixture
+def app_headers(app):
+    """ترويسة برمز JWT الخاص بالتطبيق (كما يصدره /api/auth/login) لمسارات token_required"""
+    def make(user_id):
+        token = jwt.encode(
+            {'user_id': user_id, 'exp': int(time.time()) + 3600},
+            app.config['SECRET_KEY'],
+            algorithm='HS256'
+        )
+        return {'Authorization': f'Bearer {token}'}
+    return make
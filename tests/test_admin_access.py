@@ -0,0 +1,57 @@
+import pytest
+
+ADMIN_ENDPOINTS = [
+    ('GET', '/api/users'),
+    ('GET', '/api/users/1'),
+    ('GET', '/api/admin/categories'),
+    ('GET', '/api/admin/products'),
+    ('GET', '/api/admin/payments/pending'),
+    ('GET', '/api/admin/payments/proofs/' + '0' * 64),
+    ('POST', '/api/admin/payments/review'),
+    ('GET', '/api/admin/payment-methods'),
+    ('POST', '/api/admin/orders/status'),
+    ('POST', '/api/admin/notifications'),
+]
+
+
+@pytest.mark.parametrize('method,path', ADMIN_ENDPOINTS)
+def test_non_admin_token_is_forbidden(client, user_headers, method, path):
+    response = client.open(path, method=method, headers=user_headers, json={})
+    assert response.status_code == 403
+    assert response.get_json()['success'] is False
+
+
+@pytest.mark.parametrize('method,path', ADMIN_ENDPOINTS)
+def test_missing_token_is_unauthorized(client, method, path):
+    response = client.open(path, method=method, json={})
+    assert response.status_code == 401
+
+
+def test_non_admin_cannot_approve_payments(app, client, user_headers, make_user):
+    from src.models.db import db
+    from src.models.payment import PaymentTransaction
+    from src.models.user import User
+
+    user_id = make_user()
+    with app.app_context():
+        transaction = PaymentTransaction(user_id=user_id, method_id=1, amount=500)
+        db.session.add(transaction)
+        db.session.commit()
+        transaction_id = transaction.transaction_id
+
+    response = client.post('/api/admin/payments/review', headers=user_headers, json={
+        'transaction_ids': [transaction_id],
+        'action': 'approve'
+    })
+    assert response.status_code == 403
+
+    with app.app_context():
+        assert db.session.get(PaymentTransaction, transaction_id).status == 'معلق'
+        assert db.session.get(User, user_id).balance == 0
+
+
+def test_admin_can_use_admin_endpoints(client, admin_headers):
+    assert client.get('/api/admin/payments/pending', headers=admin_headers).status_code == 200
+    assert client.get('/api/admin/categories', headers=admin_headers).status_code == 200
+    assert client.get('/api/users', headers=admin_headers).status_code == 200
+
@@ -0,0 +1,43 @@
+"""مسارات تطبيق العملاء تعمل برمز JWT الخاص بالتطبيق عبر HTTP (دون رمز Firebase)"""
+
+
+def test_login_issues_a_token_that_reaches_user_routes(client, make_user):
+    make_user(username='buyer', opening_balance=12)
+
+    response = client.post('/api/auth/login', json={'email': 'buyer@example.com', 'password': 'secret123'})
+    assert response.status_code == 200
+    headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+    profile = client.get('/api/user/profile', headers=headers)
+    assert profile.status_code == 200
+    assert profile.get_json()['data']['username'] == 'buyer'
+
+    balance = client.get('/api/user/balance', headers=headers)
+    assert balance.get_json()['data']['balance'] == 12
+
+
+def test_place_order_over_http(client, make_user, app_headers):
+    user_id = make_user(opening_balance=20)
+    headers = {**app_headers(user_id), 'Idempotency-Key': 'order-1'}
+
+    response = client.post('/api/user/orders', headers=headers, json={'product_id': 1})
+    assert response.status_code == 201
+    assert response.get_json()['data']['total_price'] == 8
+
+    replay = client.post('/api/user/orders', headers=headers, json={'product_id': 1})
+    assert replay.status_code == 200
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+
+    balance = client.get('/api/user/balance', headers=app_headers(user_id))
+    assert balance.get_json()['data']['balance'] == 12
+
+
+def test_user_routes_reject_firebase_tokens_and_missing_tokens(client, user_headers):
+    assert client.get('/api/user/profile', headers=user_headers).status_code == 401
+    assert client.get('/api/user/profile').status_code == 401
+
+
+def test_firebase_routes_still_require_a_firebase_token(client, make_user, app_headers):
+    headers = app_headers(make_user())
+    assert client.get('/api/catalog', headers=headers).status_code == 401
+    assert client.get('/api/admin/products', headers=headers).status_code == 401
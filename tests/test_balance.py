@@ -0,0 +1,88 @@
+import random
+import threading
+
+import pytest
+
+from src.models.db import db
+from src.models.balance import BalanceLedger
+from src.models.user import User
+from src.services import balance
+
+THREADS = 8
+OPERATIONS_PER_THREAD = 40
+
+
+def test_concurrent_debits_and_credits_lose_no_updates(app, make_user):
+    """خيوط متزامنة تخصم وتودع لنفس المستخدم: لا تحديث مفقود ولا رصيد سالب"""
+    opening = 50
+    user_id = make_user(opening_balance=opening)
+    applied = [0] * THREADS
+    rejected = [0] * THREADS
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def run(index):
+        rng = random.Random(index)
+        with app.app_context():
+            start.wait()
+            for _ in range(OPERATIONS_PER_THREAD):
+                # الخصومات أكبر من الإيداعات حتى يصطدم كثير منها بشرط عدم السالب
+                amount_minor = rng.choice([-700, -300, -100, 100, 200, 500])
+                try:
+                    balance.apply(db.session, user_id, amount_minor, 'adjustment', f'stress:{index}')
+                    db.session.commit()
+                    applied[index] += amount_minor
+                except balance.InsufficientBalance:
+                    db.session.rollback()
+                    rejected[index] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+            db.session.remove()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    # الاختبار يجب أن يمر بحالات رفض فعلية وإلا لم يختبر شرط عدم السالب
+    assert sum(rejected) > 0
+
+    with app.app_context():
+        stored = db.session.get(User, user_id).balance_minor
+        assert stored == balance.to_minor(opening) + sum(applied)
+        assert stored >= 0
+        assert balance.reconcile(db.session, user_id) == []
+
+        lowest = db.session.query(db.func.min(BalanceLedger.balance_after_minor)).filter(
+            BalanceLedger.user_id == user_id
+        ).scalar()
+        assert lowest >= 0
+
+        entries = db.session.query(BalanceLedger).filter(BalanceLedger.user_id == user_id).count()
+        assert entries == 1 + THREADS * OPERATIONS_PER_THREAD - sum(rejected)
+
+
+def test_debit_beyond_balance_is_rejected(app, make_user):
+    user_id = make_user(opening_balance=10)
+    with app.app_context():
+        with pytest.raises(balance.InsufficientBalance):
+            balance.debit(db.session, user_id, 10.01, 'order')
+        db.session.rollback()
+        assert balance.debit(db.session, user_id, 10, 'order') == 0
+        db.session.commit()
+        assert balance.reconcile(db.session) == []
+
+
+def test_reconcile_after_snapshot(app, make_user):
+    user_id = make_user(opening_balance=25)
+    with app.app_context():
+        balance.credit(db.session, user_id, 5, 'topup')
+        db.session.commit()
+        assert balance.take_snapshots(db.session, settle_seconds=0) == 1
+        balance.debit(db.session, user_id, 7.5, 'order')
+        db.session.commit()
+        assert balance.reconcile(db.session) == []
+        assert db.session.get(User, user_id).balance == 22.5
@@ -0,0 +1,28 @@
+from src.models.db import db
+from src.services.catalog_snapshot import CatalogSnapshots, FileVersionStore
+
+
+def bump_in_database():
+    # خادم آخر: يرفع الإصدار في قاعدة البيانات ولا يرى ملف هذا الخادم
+    db.session.execute(db.text('UPDATE catalog_version SET version = version + 1 WHERE id = 1'))
+    db.session.commit()
+
+
+def test_database_is_rechecked_every_version_ttl_even_with_a_file_store(app, tmp_path):
+    snapshots = CatalogSnapshots(version_ttl=2.0, store=FileVersionStore(str(tmp_path / 'catalog.version')))
+    with app.app_context():
+        version = snapshots.current_version(db.session)
+        bump_in_database()
+
+        assert snapshots.current_version(db.session) == version
+        snapshots._version_checked_at -= snapshots.version_ttl
+        assert snapshots.current_version(db.session) == version + 1
+
+
+def test_file_store_invalidates_same_host_workers_immediately(app, tmp_path):
+    path = str(tmp_path / 'catalog.version')
+    worker = CatalogSnapshots(version_ttl=60.0, store=FileVersionStore(path))
+    with app.app_context():
+        version = worker.current_version(db.session)
+        FileVersionStore(path).publish(version + 1)
+        assert worker.current_version(db.session) == version + 1
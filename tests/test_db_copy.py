@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from src.models.db import db
+from src.services.db_copy import copy_database
+from src.services.orders import place_order
+
+
+def count_rows(url, table):
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+    finally:
+        engine.dispose()
+
+
+@pytest.fixture
+def seeded_source(app, make_user):
+    """قاعدة التطبيق المؤقتة بعد init-db مع مستخدم وطلب (مفاتيح أجنبية بين عدة جداول)"""
+    user_id = make_user(opening_balance=50)
+    with app.app_context():
+        place_order(db.session, user_id, 1)
+    return app.config['SQLALCHEMY_DATABASE_URI']
+
+
+def test_refuses_a_source_behind_the_migrations(tmp_path):
+    # app.db قديم: رصيد عشري في users.balance دون balance_minor ودون سجل ترحيلات
+    source_url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    target_url = f"sqlite:///{tmp_path / 'target.db'}"
+    engine = create_engine(source_url)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, balance FLOAT)'))
+        conn.execute(text("INSERT INTO users VALUES (1, 'buyer', 150.5)"))
+    engine.dispose()
+
+    with pytest.raises(RuntimeError, match='flask migrate'):
+        copy_database(source_url, target_url, log=lambda message: None)
+
+    # لا شيء يكتب في الهدف
+    engine = create_engine(target_url)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar() == 0
+    engine.dispose()
+
+
+def test_sqlite_to_sqlite_copy(seeded_source, tmp_path):
+    target_url = f"sqlite:///{tmp_path / 'copy.db'}"
+    messages = []
+    copy_database(seeded_source, target_url, batch_size=2, log=messages.append)
+
+    for table in db.metadata.sorted_tables:
+        assert count_rows(target_url, table) == count_rows(seeded_source, table), table.name
+
+    # الجداول الأم قبل الجداول التي تشير إليها
+    copied = [message.split()[1].rstrip(':') for message in messages if message.startswith('✔')]
+    for parent, child in [('categories', 'products'), ('users', 'orders'), ('products', 'orders'), ('users', 'balance_ledger')]:
+        assert copied.index(parent) < copied.index(child)
+
+    engine = create_engine(target_url)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA foreign_key_check')).all() == []
+        # البحث النصي يعمل مباشرة على النسخة
+        assert conn.execute(text("SELECT rowid FROM products_fts WHERE products_fts MATCH '\"الماس\"'")).all()
+    engine.dispose()
+
+
+def test_non_empty_target_requires_truncate(seeded_source, tmp_path):
+    target_url = f"sqlite:///{tmp_path / 'copy.db'}"
+    copy_database(seeded_source, target_url, log=lambda message: None)
+
+    with pytest.raises(RuntimeError, match='not empty'):
+        copy_database(seeded_source, target_url, log=lambda message: None)
+
+    copy_database(seeded_source, target_url, truncate=True, log=lambda message: None)
+    assert count_rows(target_url, db.metadata.tables['users']) == count_rows(seeded_source, db.metadata.tables['users'])
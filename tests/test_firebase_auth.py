@@ -0,0 +1,137 @@
+import datetime
+import threading
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from src.services.firebase_auth import STALE_GRACE, GooglePublicKeys
+
+
+def certificate_pem():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode('ascii')
+
+
+class SlowCertsSession:
+    """يحاكي نقطة شهادات Google مع تأخير ويعد الطلبات"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.certs = {'kid-1': certificate_pem()}
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        session = self
+
+        class Response:
+            headers = {'Cache-Control': 'public, max-age=3600'}
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return session.certs
+
+        return Response()
+
+
+def fetch_concurrently(keys, kid, threads=16):
+    results = []
+    start = threading.Barrier(threads)
+
+    def run():
+        start.wait()
+        results.append(keys.get(kid))
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def test_cold_start_fetches_once_for_all_waiting_threads():
+    session = SlowCertsSession()
+    keys = GooglePublicKeys(session=session)
+
+    results = fetch_concurrently(keys, 'kid-1')
+
+    assert session.calls == 1
+    assert all(key is not None for key in results)
+
+
+def test_expired_keys_are_refreshed_once():
+    session = SlowCertsSession()
+    keys = GooglePublicKeys(session=session)
+    keys.get('kid-1')
+    # انتهت الصلاحية منذ أكثر من فترة السماح: جلب متزامن
+    keys._expires_at = time.time() - STALE_GRACE - 1
+
+    results = fetch_concurrently(keys, 'kid-1')
+
+    assert session.calls == 2
+    assert all(key is not None for key in results)
+
+
+def test_recently_expired_keys_are_served_while_one_thread_refreshes():
+    session = SlowCertsSession(delay=0.5)
+    keys = GooglePublicKeys(session=session)
+    keys.get('kid-1')
+    keys._expires_at = time.time() - 1
+
+    started = time.monotonic()
+    results = fetch_concurrently(keys, 'kid-1')
+
+    # لا ينتظر أي طلب الجلب الجديد
+    assert time.monotonic() - started < session.delay
+    assert all(key is not None for key in results)
+    for _ in range(50):
+        if keys._expires_at > time.time():
+            break
+        time.sleep(0.05)
+    assert session.calls == 2
+
+
+def test_repeated_token_is_verified_once(client, admin_headers):
+    for _ in range(20):
+        assert client.get('/api/admin/categories', headers=admin_headers).status_code == 200
+
+    stats = client.get('/api/health').get_json()['token_cache']
+    assert stats['misses'] == 1
+    assert stats['hits'] == 19
+
+
+def test_cached_verification_is_faster_than_a_signature_check(app, firebase_token):
+    from src import main
+    verifier = main.token_verifier
+    token = firebase_token('timing-user')
+    verifier.verify(token)
+
+    def per_call(function, rounds=200):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            function(token)
+        return (time.perf_counter() - started) / rounds
+
+    # مقارنة نسبية لا زمن مطلق: الذاكرة المؤقتة تتجنب فك الترويسة والتحقق من RS256
+    assert per_call(verifier.verify) * 3 < per_call(verifier._decode)
@@ -0,0 +1,142 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.db import db
+from src.models.fulfillment import FulfillmentJob
+from src.models.order import Order
+from src.models.product import Product
+from src.models.user import User
+from src.services import balance, fulfillment
+from src.services.fulfillment import REJECTED_STATUS, FulfillmentWorker
+from src.services.orders import DISPATCHED_STATUS, place_order, transition_orders
+
+API_DETAILS = json.dumps({'url': 'http://provider.invalid/orders', 'provider': 'test'})
+
+
+@pytest.fixture
+def linked_order(app, make_user):
+    """طلب لمنتج مرتبط بمزود، مع مهمة تنفيذ في الطابور"""
+    user_id = make_user(opening_balance=10)
+
+    def create(api_details=API_DETAILS):
+        with app.app_context():
+            product = Product(
+                name='منتج مرتبط', category_id=1, cost_price=1, sell_price=4,
+                api_linked=True, api_details=api_details
+            )
+            db.session.add(product)
+            db.session.commit()
+            order, _ = place_order(db.session, user_id, product.product_id)
+            return user_id, order.order_id
+
+    return create
+
+
+def job_for(order_id):
+    return db.session.query(FulfillmentJob).filter(FulfillmentJob.order_id == order_id).one()
+
+
+def make_due(order_id):
+    db.session.query(FulfillmentJob).filter(FulfillmentJob.order_id == order_id).update(
+        {'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.session.commit()
+
+
+def assert_rejected_and_refunded(user_id, order_id):
+    db.session.expire_all()
+    assert db.session.get(Order, order_id).status == REJECTED_STATUS
+    assert job_for(order_id).status == 'failed'
+    assert db.session.get(User, user_id).balance == 10
+    assert balance.reconcile(db.session) == []
+
+
+def test_invalid_api_details_rejects_and_refunds(app, linked_order):
+    user_id, order_id = linked_order(api_details='not json')
+    assert FulfillmentWorker(app, workers=1, log=lambda message: None).run_once() == 1
+    with app.app_context():
+        assert_rejected_and_refunded(user_id, order_id)
+
+
+def test_unexpected_errors_count_as_attempts(app, linked_order, monkeypatch):
+    def broken(pool, config, order):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(fulfillment, 'call_provider', broken)
+    user_id, order_id = linked_order()
+    worker = FulfillmentWorker(app, workers=1, max_attempts=2, log=lambda message: None)
+
+    assert worker.run_once() == 1
+    with app.app_context():
+        job = job_for(order_id)
+        assert (job.status, job.attempts, job.last_error) == ('pending', 1, 'boom')
+        make_due(order_id)
+
+    assert worker.run_once() == 1
+    with app.app_context():
+        assert_rejected_and_refunded(user_id, order_id)
+
+
+def test_claim_rejects_jobs_that_exhausted_their_attempts(app, linked_order):
+    user_id, order_id = linked_order()
+    with app.app_context():
+        # عامل توقف أثناء آخر محاولة وانتهت مهلة الحجز
+        db.session.query(FulfillmentJob).filter(FulfillmentJob.order_id == order_id).update({
+            'status': 'running',
+            'attempts': 3,
+            'locked_until': datetime.utcnow() - timedelta(seconds=1)
+        })
+        db.session.commit()
+
+    worker = FulfillmentWorker(app, workers=1, max_attempts=3, log=lambda message: None)
+    assert worker.run_once() == 0
+    with app.app_context():
+        assert_rejected_and_refunded(user_id, order_id)
+        assert job_for(order_id).attempts == 3
+
+
+def test_admin_rejection_before_dispatch_skips_the_provider(app, linked_order, monkeypatch):
+    calls = []
+    monkeypatch.setattr(fulfillment, 'call_provider', lambda pool, config, order: calls.append(order.order_id))
+    user_id, order_id = linked_order()
+    worker = FulfillmentWorker(app, workers=1, log=lambda message: None)
+
+    [job_id] = worker.claim_batch(1)
+    with app.app_context():
+        # المشرف يرفض الطلب بعد حجز المهمة وقبل إرسالها إلى المزود
+        results, _ = transition_orders(db.session, [order_id], REJECTED_STATUS)
+        assert results[0]['success'] is True
+
+    worker.process(job_id)
+
+    assert calls == []
+    with app.app_context():
+        db.session.expire_all()
+        assert db.session.get(Order, order_id).status == REJECTED_STATUS
+        assert job_for(order_id).status == 'done'
+        assert db.session.get(User, user_id).balance == 10
+        assert balance.reconcile(db.session) == []
+
+
+def test_admin_cannot_reject_an_order_in_flight(app, linked_order, monkeypatch):
+    user_id, order_id = linked_order()
+    attempts = []
+
+    def provider(pool, config, order):
+        # المشرف يحاول الرفض أثناء انتظار رد المزود
+        with app.app_context():
+            attempts.append(transition_orders(db.session, [order.order_id], REJECTED_STATUS)[0][0])
+        return {}
+
+    monkeypatch.setattr(fulfillment, 'call_provider', provider)
+    assert FulfillmentWorker(app, workers=1, log=lambda message: None).run_once() == 1
+
+    assert attempts[0]['success'] is False
+    assert attempts[0]['status'] == DISPATCHED_STATUS
+    with app.app_context():
+        db.session.expire_all()
+        assert db.session.get(Order, order_id).status == fulfillment.FULFILLED_STATUS
+        assert db.session.get(User, user_id).balance == 6
+        assert balance.reconcile(db.session) == []
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import time
+
+from src.services.event_log import EventLog
+from src.services.identity_cache import IdentityCache
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+
+class FakeUser:
+    def __init__(self, **data):
+        self._data = data
+        self.user_id = data['user_id']
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+def append_from_other_process(path, user_id):
+    subprocess.run(
+        [sys.executable, '-c', f'from src.services.event_log import EventLog; EventLog({path!r}).append({user_id})'],
+        cwd=ROOT,
+        check=True
+    )
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_invalidation_in_another_process_reaches_this_cache(tmp_path):
+    path = str(tmp_path / 'identity.events')
+    cache = IdentityCache(ttl=60, events=EventLog(path), watch_interval=0.02)
+    cache.put('token-7', FakeUser(user_id=7, balance=10.0))
+    cache.put('token-8', FakeUser(user_id=8, balance=20.0))
+    assert cache.get('token-7').balance == 10.0
+
+    append_from_other_process(path, 7)
+
+    assert wait_until(lambda: cache.get('token-7') is None)
+    assert cache.get('token-8').balance == 20.0
+
+
+def test_own_invalidations_are_published(tmp_path):
+    path = str(tmp_path / 'identity.events')
+    writer = IdentityCache(events=EventLog(path))
+    writer.invalidate_user(42)
+    with open(path) as f:
+        assert f.read() == f'{os.getpid()} 42\n'
+
+
+def test_read_older_than_an_invalidation_is_not_cached():
+    cache = IdentityCache(ttl=60)
+    seen = cache.version()
+    # إبطال أثناء قراءة المستخدم من قاعدة البيانات
+    cache.invalidate_user(7)
+    snapshot = cache.put('token-7', FakeUser(user_id=7, status='نشط'), seen_version=seen)
+
+    assert snapshot.status == 'نشط'
+    assert cache.get('token-7') is None
@@ -0,0 +1,102 @@
+import threading
+
+from src.models.db import db
+from src.models.notification import Broadcast, Notification, NotificationReadMarker
+from src.services import inbox
+from src.services.migrations import _broadcast_inbox
+
+THREADS = 6
+BROADCASTS_PER_THREAD = 5
+
+
+def test_concurrent_broadcasts_get_distinct_contiguous_seqs(app):
+    created = []
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def run(index):
+        with app.app_context():
+            start.wait()
+            for number in range(BROADCASTS_PER_THREAD):
+                title = f'{index}-{number}'
+                try:
+                    broadcast = inbox.create_broadcast(db.session, title, 'رسالة')
+                    # كل كاتب يستلم صفه هو وليس آخر صف في الجدول
+                    created.append((title, broadcast.title, broadcast.seq))
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+            db.session.remove()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert all(title == returned for title, returned, _ in created)
+    total = THREADS * BROADCASTS_PER_THREAD
+    assert sorted(seq for _, _, seq in created) == list(range(1, total + 1))
+
+
+def test_ensure_marker_ignores_a_row_created_concurrently(app, make_user, monkeypatch):
+    user_id = make_user()
+    with app.app_context():
+        # طلب آخر أنشأ الصف بعد أن قرأ هذا الطلب أنه غير موجود
+        inbox._ensure_marker(db.session, user_id)
+        db.session.execute(
+            NotificationReadMarker.__table__.update()
+            .where(NotificationReadMarker.user_id == user_id)
+            .values(read_upto_seq=3)
+        )
+        load = inbox._load_marker
+        calls = []
+
+        def stale_first_read(session, marker_user_id):
+            calls.append(marker_user_id)
+            return None if len(calls) == 1 else load(session, marker_user_id)
+
+        monkeypatch.setattr(inbox, '_load_marker', stale_first_read)
+        marker = inbox._ensure_marker(db.session, user_id)
+        db.session.commit()
+
+        assert marker.read_upto_seq == 3
+        assert db.session.query(NotificationReadMarker).filter_by(user_id=user_id).count() == 1
+
+
+def test_migrated_legacy_broadcasts_are_read(app, make_user):
+    user_id = make_user()
+    with app.app_context():
+        db.session.add(Notification(user_id=user_id, title='شخصي', message='م', is_read=False))
+        for index in range(3):
+            db.session.add(Notification(user_id=None, title=f'قديم {index}', message='م', is_read=False))
+        db.session.commit()
+
+        with db.engine.begin() as conn:
+            _broadcast_inbox(conn)
+
+        assert db.session.query(Broadcast).count() == 3
+        assert inbox.unread_count(db.session, user_id) == {'personal': 1, 'broadcast': 0, 'total': 1}
+
+        inbox.create_broadcast(db.session, 'جديد', 'م')
+        assert inbox.unread_count(db.session, user_id)['broadcast'] == 1
+
+
+def test_new_accounts_start_with_earlier_broadcasts_read(app, client, admin_headers):
+    with app.app_context():
+        for index in range(3):
+            inbox.create_broadcast(db.session, f'قبل التسجيل {index}', 'م')
+
+    response = client.post('/api/auth/register', json={
+        'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'secret123'
+    })
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['user_id']
+
+    with app.app_context():
+        inbox.create_broadcast(db.session, 'بعد التسجيل', 'م')
+        assert inbox.unread_count(db.session, user_id) == {'personal': 0, 'broadcast': 1, 'total': 1}
+
+    # صف الحالة لا يمنع حذف الحساب
+    assert client.delete(f'/api/users/{user_id}', headers=admin_headers).status_code == 200
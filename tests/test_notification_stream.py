@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from src.routes import notification
+
+
+@pytest.fixture
+def open_stream(client, make_user, app_headers, monkeypatch):
+    """فتح اتصال SSE عبر HTTP مع حد اتصال واحد للعامل"""
+    monkeypatch.setattr(notification, '_stream_slots', threading.BoundedSemaphore(1))
+    headers = app_headers(make_user())
+
+    def send():
+        return client.get('/api/user/notifications/stream', headers=headers)
+
+    return send
+
+
+def test_streams_beyond_the_worker_cap_get_503(open_stream):
+    first = open_stream()
+    assert first.status_code == 200
+    assert first.mimetype == 'text/event-stream'
+
+    rejected = open_stream()
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(notification.SSE_RETRY_AFTER_SECONDS)
+
+    # إغلاق الاتصال الأول يحرر مكانه
+    first.close()
+    second = open_stream()
+    assert second.status_code == 200
+    second.close()
+
+
+def test_stream_sends_the_unread_count_first(open_stream, monkeypatch):
+    # اتصال ينتهي فوراً بعد الحدث الأول
+    monkeypatch.setattr(notification, 'SSE_MAX_SECONDS', 0)
+    response = open_stream()
+    body = response.get_data(as_text=True)
+    assert body.startswith('retry: 3000\nevent: unread\n')
+    assert '"total": 0' in body or '"total":0' in body
@@ -0,0 +1,140 @@
+import threading
+import time
+
+from src.models.db import db
+from src.models.order import Order
+from src.models.product import Product, ProductInventory
+from src.models.user import User
+from src.services import balance
+from src.services.orders import REJECTED_STATUS, OrderError, place_order, transition_orders
+from src.services.query_counter import assert_max_queries
+
+
+def make_product(product_type, stock=None):
+    product = Product(name=f'منتج {product_type}', category_id=1, cost_price=1, sell_price=2, product_type=product_type)
+    if stock is not None:
+        product.inventory.append(ProductInventory(quantity=stock))
+    db.session.add(product)
+    db.session.commit()
+    return product.product_id
+
+
+def stock_of(product_id):
+    return db.session.query(ProductInventory.quantity).filter(ProductInventory.product_id == product_id).scalar()
+
+
+def test_rejecting_orders_restores_balance_and_inventory(app, make_user):
+    user_id = make_user(opening_balance=100)
+    other_id = make_user(username='other', opening_balance=100)
+    with app.app_context():
+        stocked = make_product('كميات', stock=10)
+        unstocked = make_product('خدمة')
+
+        first, _ = place_order(db.session, user_id, stocked, quantity=3)
+        second, _ = place_order(db.session, other_id, stocked, quantity=2)
+        third, _ = place_order(db.session, user_id, unstocked, quantity=1)
+        kept, _ = place_order(db.session, other_id, stocked, quantity=1)
+        assert stock_of(stocked) == 4
+
+        results, affected = transition_orders(
+            db.session, [first.order_id, second.order_id, third.order_id], REJECTED_STATUS
+        )
+        assert all(result['success'] for result in results)
+        assert affected == {user_id, other_id}
+
+        db.session.expire_all()
+        assert stock_of(stocked) == 9
+        assert db.session.get(User, user_id).balance == 100
+        assert db.session.get(User, other_id).balance == 98
+        assert db.session.get(Order, kept.order_id).status != REJECTED_STATUS
+        assert balance.reconcile(db.session) == []
+
+        # رفض طلب مرفوض مسبقاً لا يعيد المخزون مرتين
+        results, _ = transition_orders(db.session, [first.order_id], REJECTED_STATUS)
+        assert results[0]['success'] is False
+        db.session.expire_all()
+        assert stock_of(stocked) == 9
+
+
+def test_refund_never_lowers_the_vip_level(app, make_user):
+    # الطلب يرفع الإنفاق إلى 1003 (فضي) والاسترداد يعيده إلى 998 تحت حد الفضي 1000
+    user_id = make_user(opening_balance=100, total_spent=998.0, vip_level=2)
+    with app.app_context():
+        product = make_product('خدمة')
+        db.session.get(Product, product).sell_price = 5
+        db.session.commit()
+        order, _ = place_order(db.session, user_id, product)
+
+        transition_orders(db.session, [order.order_id], REJECTED_STATUS)
+
+        db.session.expire_all()
+        user = db.session.get(User, user_id)
+        assert user.total_spent < 1000
+        assert user.vip_level == 2
+
+
+def test_bulk_status_rejects_non_numeric_ids(app, client, admin_headers, make_user):
+    user_id = make_user(opening_balance=10)
+    with app.app_context():
+        order, _ = place_order(db.session, user_id, make_product('خدمة'))
+        order_id = order.order_id
+
+    for order_ids in (['abc'], [order_id, None], [order_id, {'id': 1}]):
+        response = client.post('/api/admin/orders/status', headers=admin_headers,
+                               json={'order_ids': order_ids, 'status': REJECTED_STATUS})
+        assert response.status_code == 400, order_ids
+
+    with app.app_context():
+        assert db.session.get(Order, order_id).status != REJECTED_STATUS
+
+
+
+def test_place_order_has_fixed_query_count(app, make_user):
+    user_id = make_user(opening_balance=100)
+    with app.app_context():
+        product_id = make_product('كميات', stock=10)
+        # الطلب الأول يحمل جدول مستويات VIP في الذاكرة
+        place_order(db.session, user_id, product_id)
+        # منتج، VIP، إدراج الطلب، المخزون، الرصيد والسجل، total_spent وقراءته، ترقية VIP
+        with assert_max_queries(db.engine, 9):
+            place_order(db.session, user_id, product_id)
+
+
+def test_hot_product_orders_under_contention(app, make_user):
+    threads, orders_per_thread, stock = 8, 10, 50
+    users = [make_user(username=f'buyer{index}', opening_balance=100) for index in range(threads)]
+    with app.app_context():
+        product_id = make_product('كميات', stock=stock)
+
+    outcomes = []
+    start = threading.Barrier(threads)
+
+    def buy(user_id):
+        with app.app_context():
+            start.wait()
+            for _ in range(orders_per_thread):
+                try:
+                    place_order(db.session, user_id, product_id)
+                    outcomes.append('placed')
+                except OrderError as e:
+                    outcomes.append(e.status)
+                except Exception as e:
+                    db.session.rollback()
+                    outcomes.append(repr(e))
+
+    workers = [threading.Thread(target=buy, args=(user_id,)) for user_id in users]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    print(f'{len(outcomes) / elapsed:.0f} orders/s ({threads} threads, one product)')
+
+    # لا بيع زائد ولا أخطاء قفل: ما نفد من المخزون يرفض بـ 409 فقط
+    assert outcomes.count('placed') == stock
+    assert outcomes.count(409) == threads * orders_per_thread - stock
+    with app.app_context():
+        assert stock_of(product_id) == 0
+        assert db.session.query(Order).filter(Order.product_id == product_id).count() == stock
+        assert balance.reconcile(db.session) == []
@@ -0,0 +1,137 @@
+from sqlalchemy import text
+
+from src.models.db import db
+from src.models.payment import PaymentTransaction
+from src.services import inbox
+
+# نفس تنسيق الصفوف القديمة في app.db: بدون أجزاء الثانية
+SECOND_PRECISION = '2025-08-23 22:45:24'
+
+
+def insert_products(app, count, created_at=SECOND_PRECISION):
+    with app.app_context():
+        for index in range(count):
+            db.session.execute(text(
+                'INSERT INTO products (name, category_id, currency, cost_price, sell_price, product_type, '
+                'is_available, api_linked, created_at, updated_at) '
+                "VALUES (:name, 1, 'ريال', 1, 2, 'بدون', 1, 0, :created_at, :created_at)"
+            ), {'name': f'قديم {index}', 'created_at': created_at})
+        db.session.commit()
+        return [row[0] for row in db.session.execute(text('SELECT product_id FROM products'))]
+
+
+def product_pages(client, admin_headers, per_page, **params):
+    ids = []
+    cursor = None
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    for _ in range(100):
+        url = f'/api/admin/products?pagination=cursor&per_page={per_page}&{query}'
+        if cursor:
+            url += f'&after={cursor}'
+        page = client.get(url, headers=admin_headers).get_json()
+        assert page['success'], page
+        ids.extend(item['product_id'] for item in page['data'])
+        cursor = page['pagination']['next_cursor']
+        if cursor is None:
+            return ids
+    raise AssertionError('pagination did not terminate')
+
+
+def test_product_cursor_walks_rows_with_second_precision_timestamps(app, client, admin_headers):
+    all_ids = insert_products(app, 7)
+    for per_page in (1, 2, 3, 10):
+        ids = product_pages(client, admin_headers, per_page)
+        assert len(ids) == len(set(ids)), ids
+        assert sorted(ids) == sorted(all_ids)
+
+
+def test_product_cursor_with_details(app, client, admin_headers):
+    all_ids = insert_products(app, 5)
+    ids = product_pages(client, admin_headers, 2, include='details')
+    assert sorted(ids) == sorted(all_ids)
+    assert len(ids) == len(set(ids))
+
+
+def test_pending_payments_cursor_walks_rows_with_second_precision_timestamps(app, client, admin_headers, make_user):
+    user_id = make_user()
+    with app.app_context():
+        for amount in range(1, 8):
+            db.session.execute(text(
+                'INSERT INTO payment_transactions (user_id, amount, method_id, status, created_at, updated_at) '
+                "VALUES (:user_id, :amount, 1, 'معلق', :created_at, :created_at)"
+            ), {'user_id': user_id, 'amount': amount, 'created_at': SECOND_PRECISION})
+        db.session.commit()
+
+    ids = []
+    cursor = None
+    for _ in range(20):
+        url = '/api/admin/payments/pending?per_page=2' + (f'&after={cursor}' if cursor else '')
+        page = client.get(url, headers=admin_headers).get_json()
+        ids.extend(item['transaction_id'] for item in page['data'])
+        cursor = page['pagination']['next_cursor']
+        if cursor is None:
+            break
+    assert cursor is None
+    assert ids == sorted(ids)
+    assert len(ids) == 7 and len(set(ids)) == 7
+
+
+def test_invalid_cursor_is_rejected(client, admin_headers):
+    response = client.get('/api/admin/products?after=bm90LWEtY3Vyc29y', headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_inbox_cursor_walks_rows_with_second_precision_timestamps(app, make_user):
+    user_id = make_user()
+    with app.app_context():
+        for index in range(4):
+            db.session.execute(text(
+                'INSERT INTO notifications (user_id, title, message, is_read, created_at) '
+                'VALUES (:user_id, :title, :title, 0, :created_at)'
+            ), {'user_id': user_id, 'title': f'شخصي {index}', 'created_at': SECOND_PRECISION})
+            db.session.execute(text(
+                'INSERT INTO broadcasts (seq, title, message, created_at) '
+                'VALUES (:seq, :title, :title, :created_at)'
+            ), {'seq': index + 1, 'title': f'عام {index}', 'created_at': SECOND_PRECISION})
+        db.session.commit()
+        inbox.create_notification(db.session, user_id, 'جديد', 'بتوقيت كامل')
+
+        seen = []
+        cursor = None
+        for _ in range(20):
+            items, next_cursor = inbox.inbox(db.session, user_id, cursor, limit=2)
+            seen.extend((item['type'], item['id']) for item in items)
+            if next_cursor is None:
+                break
+            cursor = inbox.decode_cursor(db.session, next_cursor)
+        assert next_cursor is None
+        assert len(seen) == 9 and len(set(seen)) == 9
+        # الأحدث أولاً
+        assert seen[0][0] == 'personal'
+
+
+def test_product_cursor_clamps_per_page(app, client, admin_headers):
+    insert_products(app, 3)
+    for per_page, expected in ((0, 1), (-5, 1), (1000, 100)):
+        response = client.get(f'/api/admin/products?pagination=cursor&per_page={per_page}', headers=admin_headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert page['pagination']['per_page'] == expected
+        assert len(page['data']) == min(expected, 6)
+    # صفحة من عنصر واحد تنتهي بمؤشر صالح
+    ids = product_pages(client, admin_headers, 0)
+    assert len(ids) == len(set(ids)) == 6
+
+
+def test_pending_payments_clamp_per_page(app, client, admin_headers, make_user):
+    user_id = make_user()
+    with app.app_context():
+        for amount in (10, 20):
+            db.session.add(PaymentTransaction(user_id=user_id, method_id=1, amount=amount))
+        db.session.commit()
+    for per_page in (0, -3):
+        response = client.get(f'/api/admin/payments/pending?per_page={per_page}', headers=admin_headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['data']) == 1
+        assert page['pagination']['next_cursor']
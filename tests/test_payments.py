@@ -0,0 +1,80 @@
+from src.models.db import db
+from src.models.payment import PaymentTransaction
+from src.models.user import User
+from src.services import balance
+
+
+def add_transaction(app, user_id, amount):
+    with app.app_context():
+        transaction = PaymentTransaction(user_id=user_id, method_id=1, amount=amount)
+        db.session.add(transaction)
+        db.session.commit()
+        return transaction.transaction_id
+
+
+def test_approve_credits_balance_once(app, client, admin_headers, make_user):
+    user_id = make_user()
+    first = add_transaction(app, user_id, 100)
+    second = add_transaction(app, user_id, 50.5)
+
+    response = client.post('/api/admin/payments/review', headers=admin_headers, json={
+        'transaction_ids': [first, second],
+        'action': 'approve'
+    })
+    assert response.status_code == 200
+    assert response.get_json()['data']['updated'] == 2
+
+    # المراجعة الثانية لا تضيف شيئاً
+    again = client.post('/api/admin/payments/review', headers=admin_headers, json={
+        'transaction_ids': [first],
+        'action': 'approve'
+    })
+    assert again.get_json()['data']['updated'] == 0
+
+    with app.app_context():
+        assert db.session.get(User, user_id).balance == 150.5
+        assert balance.reconcile(db.session) == []
+
+
+def test_approving_a_topup_keeps_the_vip_level(app, client, admin_headers, make_user):
+    # مستوى VIP لا ينخفض أبداً، والشحن لا يغير total_spent
+    user_id = make_user(vip_level=3, total_spent=0)
+    transaction_id = add_transaction(app, user_id, 20)
+
+    response = client.post('/api/admin/payments/review', headers=admin_headers, json={
+        'transaction_ids': [transaction_id],
+        'action': 'approve'
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert db.session.get(User, user_id).vip_level == 3
+
+
+def test_reject_leaves_balance_unchanged(app, client, admin_headers, make_user):
+    user_id = make_user(opening_balance=5)
+    transaction_id = add_transaction(app, user_id, 20)
+
+    response = client.post('/api/admin/payments/review', headers=admin_headers, json={
+        'transaction_ids': [transaction_id],
+        'action': 'reject'
+    })
+    assert response.get_json()['data']['results'][0]['status'] == 'مرفوض'
+
+    with app.app_context():
+        assert db.session.get(User, user_id).balance == 5
+
+
+def test_review_rejects_non_numeric_ids(app, client, admin_headers, make_user):
+    user_id = make_user()
+    transaction_id = add_transaction(app, user_id, 20)
+
+    for transaction_ids in (['abc'], [transaction_id, None], [transaction_id, [1]]):
+        response = client.post('/api/admin/payments/review', headers=admin_headers, json={
+            'transaction_ids': transaction_ids,
+            'action': 'approve'
+        })
+        assert response.status_code == 400, transaction_ids
+
+    with app.app_context():
+        assert db.session.get(User, user_id).balance == 0
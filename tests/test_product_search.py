@@ -0,0 +1,46 @@
+from sqlalchemy import select, text
+
+from src.models.db import db
+from src.models.product import Product
+from src.services import product_search
+from src.services.query_plan import assert_no_table_scan, explain, table_scans
+
+
+def test_seeded_products_are_searchable(app, client, admin_headers):
+    with app.app_context():
+        assert product_search.is_enabled(db.session)
+    response = client.get('/api/admin/products', headers=admin_headers, query_string={'search': 'الْمَاس'})
+    assert response.status_code == 200
+    assert [item['name'] for item in response.get_json()['data']] == ['شحن Free Fire - الماس']
+
+
+def test_index_created_after_startup_is_picked_up(app, monkeypatch):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP TABLE products_fts'))
+        product_search._fts_checks.clear()
+        # عامل بدأ قبل تطبيق الترحيل
+        assert not product_search.is_enabled(db.session)
+
+        with db.engine.begin() as conn:
+            assert product_search.create_index(conn)
+        assert not product_search.is_enabled(db.session)
+
+        monkeypatch.setattr(product_search, 'FTS_RECHECK_SECONDS', 0)
+        assert product_search.is_enabled(db.session)
+        assert db.session.execute(text('SELECT count(*) FROM products_fts')).scalar() == 3
+
+
+def test_search_uses_the_index_instead_of_scanning_products(app):
+    with app.app_context():
+        matches = product_search.match_subquery('الماس')
+        indexed = select(Product).join(matches, Product.product_id == matches.c.rowid)
+        plan = assert_no_table_scan(db.session, indexed)
+        assert any('VIRTUAL TABLE INDEX' in detail for detail in plan), plan
+
+        # بدون الفهرس: LIKE '%...%' يمسح جدول المنتجات كاملاً
+        fallback = select(Product).where(Product.name.contains('الماس') | Product.description.contains('الماس'))
+        assert table_scans(explain(db.session, fallback))
+
+        # قراءة الفهرس كاملاً دون MATCH تبقى مسحاً
+        assert table_scans(explain(db.session, text('SELECT rowid FROM products_fts')))
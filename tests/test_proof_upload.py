@@ -0,0 +1,71 @@
+import io
+import os
+
+import pytest
+
+from src.models.db import db
+from src.models.payment import PaymentTransaction
+from src.services.proof_storage import LocalProofStorage
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 256
+
+
+@pytest.fixture
+def upload(app, client, make_user, app_headers, tmp_path):
+    """رفع إثبات دفع لمعاملة جديدة للمستخدم عبر HTTP"""
+    app.config['PROOF_STORAGE'] = LocalProofStorage(str(tmp_path / 'proofs'), max_bytes=1024)
+
+    def send(content, username='buyer', environ=None, user_id=None):
+        user_id = user_id or make_user(username=username)
+        with app.app_context():
+            transaction = PaymentTransaction(user_id=user_id, method_id=1, amount=100)
+            db.session.add(transaction)
+            db.session.commit()
+            transaction_id = transaction.transaction_id
+        response = client.post(
+            f'/api/user/payments/{transaction_id}/proof',
+            headers=app_headers(user_id),
+            data={'proof': (io.BytesIO(content), 'proof.png')},
+            content_type='multipart/form-data',
+            environ_overrides=environ
+        )
+        return response.status_code, dict(response.get_json(), user_id=user_id)
+
+    return send
+
+
+def leftovers(app):
+    return os.listdir(os.path.join(app.config['PROOF_STORAGE'].root, 'tmp'))
+
+
+def test_upload_within_limit_is_stored(app, upload):
+    status, body = upload(PNG)
+    assert status == 201
+    assert body['data']['proof_image_url'].startswith('/api/admin/payments/proofs/')
+    assert leftovers(app) == []
+
+
+def test_oversized_file_is_rejected_with_413(app, upload):
+    status, body = upload(PNG + b'\0' * 2048)
+    assert status == 413
+    assert body['success'] is False
+    assert leftovers(app) == []
+
+
+def test_oversized_request_is_rejected_with_413(app, upload):
+    status, _ = upload(PNG, environ={'CONTENT_LENGTH': str(10 * 1024 * 1024)})
+    assert status == 413
+    assert leftovers(app) == []
+
+
+def test_duplicate_flag_only_covers_the_users_own_proofs(app, upload):
+    status, body = upload(PNG, username='first')
+    assert status == 201 and body['data']['duplicate'] is False
+
+    # نفس الصورة من مستخدم آخر لا تكشف أنها مرفوعة مسبقاً
+    status, body = upload(PNG, username='second')
+    assert status == 201 and body['data']['duplicate'] is False
+
+    # لكنها تكرار عند نفس المستخدم على معاملة أخرى
+    status, body = upload(PNG, user_id=body['user_id'])
+    assert status == 200 and body['data']['duplicate'] is True
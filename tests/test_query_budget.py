@@ -0,0 +1,98 @@
+"""ميزانية الاستعلامات لمسارات المنتجات: عدد ثابت مهما كان عدد المنتجات (لا N+1)"""
+import pytest
+
+from src.models.db import READONLY_BIND, db
+from src.models.product import Product, ProductCustomOption, ProductInventory
+from src.services.query_counter import assert_max_queries
+
+
+@pytest.fixture
+def products(app):
+    """منتجات كثيرة لكل منها خيارات ومخزون، حتى يظهر أي استعلام لكل منتج (N+1)"""
+    with app.app_context():
+        ids = []
+        for index in range(30):
+            product = Product(
+                name=f'منتج {index}',
+                category_id=1,
+                cost_price=1,
+                sell_price=2,
+                product_type='كميات'
+            )
+            product.custom_options.append(ProductCustomOption(option_name='السيرفر', option_values='["EU","ME"]'))
+            product.custom_options.append(ProductCustomOption(option_name='المنصة', option_values='["iOS"]'))
+            product.inventory.append(ProductInventory(quantity=index))
+            db.session.add(product)
+            db.session.flush()
+            ids.append(product.product_id)
+        db.session.commit()
+        return ids
+
+
+def readonly_engine():
+    # طلبات GET تنفذ على مجمع القراءة فقط
+    return db.engines[READONLY_BIND]
+
+
+def test_product_list_with_details_has_fixed_query_count(app, client, admin_headers, products):
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), 4):
+            response = client.get('/api/admin/products?include=details&per_page=30', headers=admin_headers)
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert len(data) == 30
+    assert all(len(item['custom_options']) == 2 and item['inventory'] for item in data if item['product_id'] in products)
+
+
+def test_product_list_cursor_mode_has_fixed_query_count(app, client, admin_headers, products):
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), 2):
+            response = client.get('/api/admin/products?pagination=cursor&per_page=20', headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == 20
+
+
+def test_product_detail_loads_relations_in_one_query(app, client, admin_headers, products):
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), 1):
+            response = client.get(f'/api/admin/products/{products[0]}', headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']['custom_options']) == 2
+
+
+def test_products_details_batch_has_fixed_query_count(app, client, admin_headers, products):
+    ids = ','.join(str(product_id) for product_id in products)
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), 3):
+            response = client.get(f'/api/admin/products/details?ids={ids}', headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == len(products)
+
+
+
+@pytest.mark.parametrize('include,limit', [('', 1), ('details', 3)])
+def test_category_products_have_fixed_query_count(app, client, admin_headers, products, include, limit):
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), limit):
+            response = client.get(f'/api/admin/categories/1/products?include={include}', headers=admin_headers)
+    assert response.status_code == 200
+    items = response.get_json()['data']['products']
+    assert len(items) >= len(products)
+    if include:
+        assert all('custom_options' in item for item in items)
+
+
+def test_assert_max_queries_reports_the_statements(app, products):
+    with app.app_context():
+        with pytest.raises(AssertionError, match='expected at most 1'):
+            with assert_max_queries(db.engine, 1):
+                for product_id in products[:2]:
+                    db.session.get(Product, product_id)
+
+def test_public_catalog_is_served_from_snapshot(app, client, user_headers, products):
+    assert client.get('/api/catalog', headers=user_headers).status_code == 200
+    with app.app_context():
+        with assert_max_queries(readonly_engine(), 0):
+            response = client.get('/api/catalog', headers=user_headers)
+    assert response.status_code == 200
+
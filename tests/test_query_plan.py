@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy import select
+
+from src.models.db import db
+from src.models.product import Product
+from src.services.query_plan import assert_no_table_scan, hot_queries
+
+
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_hot_queries_use_indexes(app, name):
+    with app.app_context():
+        assert_no_table_scan(db.session, hot_queries()[name])
+
+
+def test_table_scan_is_reported(app):
+    # لا فهرس على السعر: يجب أن يفشل الفحص
+    with app.app_context():
+        with pytest.raises(AssertionError, match='table scan'):
+            assert_no_table_scan(db.session, select(Product).where(Product.sell_price > 5))
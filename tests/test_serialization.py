@@ -0,0 +1,66 @@
+"""المسار السريع للتحويل: نفس شكل to_dict() وأسرع من تحميل كائنات ORM"""
+import json
+import time
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from src.models.db import db
+from src.models.product import Product
+from src.models.user import User
+from src.services import serialization
+from src.services.serialization import serialize_rows
+
+
+@pytest.fixture
+def many_products(app):
+    with app.app_context():
+        for index in range(300):
+            db.session.add(Product(
+                name=f'منتج {index}',
+                description='وصف',
+                category_id=1,
+                cost_price=1,
+                sell_price=2,
+                product_type='بدون'
+            ))
+        db.session.commit()
+
+
+def test_row_fast_path_matches_to_dict(app, make_user, many_products):
+    make_user()
+    with app.app_context():
+        for model in (Product, User):
+            query = model.query.order_by(*model.__mapper__.primary_key)
+            assert serialize_rows(query, model) == [item.to_dict() for item in query]
+
+        user = User.query.first().to_dict()
+        assert 'password_hash' not in user and 'balance_minor' not in user
+
+
+def test_row_fast_path_is_faster_than_orm_objects(app, many_products):
+    with app.app_context():
+        def per_call(function, rounds=5):
+            best = None
+            for _ in range(rounds):
+                # كائنات جديدة في كل جولة: خريطة الهوية لا تخفي كلفة التحميل
+                db.session.expunge_all()
+                started = time.perf_counter()
+                function()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+
+        orm = per_call(lambda: [product.to_dict() for product in Product.query])
+        rows = per_call(lambda: serialize_rows(Product.query, Product))
+        assert rows < orm
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason='orjson غير مثبت')
+def test_orjson_provider_matches_flask_output(app):
+    assert isinstance(app.json, serialization.FastJSONProvider)
+    with app.app_context():
+        payload = {'success': True, 'data': [product.to_dict() for product in Product.query], 'ids': {1: 'أ'}}
+        fast = app.json.dumps(payload)
+        default = DefaultJSONProvider(app).dumps(payload)
+        assert json.loads(fast) == json.loads(default)
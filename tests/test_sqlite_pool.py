@@ -0,0 +1,84 @@
+"""إعدادات SQLite ومجمع القراءة: القراءات لا تنتظر الكتابات الجارية"""
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.models.db import READONLY_BIND, db
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+def test_pragmas_are_applied_on_every_connection(app):
+    with app.app_context():
+        for engine in (db.engine, db.engines[READONLY_BIND]):
+            assert pragma(engine, 'journal_mode') == 'wal'
+            assert pragma(engine, 'busy_timeout') == 5000
+            assert pragma(engine, 'synchronous') == 1  # NORMAL
+            assert pragma(engine, 'temp_store') == 2  # MEMORY
+        assert pragma(db.engine, 'query_only') == 0
+        assert pragma(db.engines[READONLY_BIND], 'query_only') == 1
+
+        with db.engines[READONLY_BIND].connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("UPDATE products SET sell_price = 0"))
+
+
+def test_reads_continue_while_a_write_transaction_is_open(app, client, make_user, app_headers):
+    headers = app_headers(make_user())
+    with app.app_context():
+        writer = db.engine.connect()
+        writer.exec_driver_sql('BEGIN EXCLUSIVE')
+        writer.execute(text("UPDATE products SET sell_price = sell_price + 1"))
+        try:
+            started = time.perf_counter()
+            response = client.get('/api/user/orders', headers=headers)
+            elapsed = time.perf_counter() - started
+        finally:
+            writer.rollback()
+            writer.close()
+    assert response.status_code == 200
+    # قفل الكتابة الحصري يمنع القراءة في وضع journal العادي حتى نهاية busy_timeout (5 ثوانٍ)،
+    # أما في WAL فالقراءة تعمل على آخر نسخة ملتزمة دون انتظار
+    assert elapsed < 1
+
+
+def test_read_throughput_under_concurrent_writes(app, client, make_user, app_headers):
+    headers = app_headers(make_user())
+    stop = threading.Event()
+    errors = []
+    writes = []
+
+    def write_loop():
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(text("UPDATE products SET sell_price = sell_price"))
+                    writes.append(1)
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+    writer = threading.Thread(target=write_loop)
+    writer.start()
+    reads = 0
+    try:
+        deadline = time.perf_counter() + 0.5
+        while time.perf_counter() < deadline:
+            # استعلام فعلي على مجمع القراءة في كل طلب
+            response = client.get('/api/user/orders', headers=headers)
+            assert response.status_code == 200
+            reads += 1
+    finally:
+        stop.set()
+        writer.join()
+
+    print(f'reads/s during writes: {reads / 0.5:.0f}, writes: {len(writes)}')
+    assert errors == []
+    assert writes and reads
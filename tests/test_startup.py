@@ -0,0 +1,64 @@
+"""إنشاء التطبيق لا يلمس قاعدة البيانات ولا Firebase (العمل الثقيل في أوامر CLI)"""
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_create_app_runs_no_queries_and_skips_firebase(tmp_path, monkeypatch):
+    database = tmp_path / 'app.db'
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{database}')
+    monkeypatch.setenv('CATALOG_VERSION_FILE', str(tmp_path / 'catalog.version'))
+    monkeypatch.setenv('NOTIFICATION_EVENTS_FILE', str(tmp_path / 'notifications.events'))
+    monkeypatch.setenv('IDENTITY_EVENTS_FILE', str(tmp_path / 'identity.events'))
+    monkeypatch.setenv('PROOF_STORAGE_DIR', str(tmp_path / 'proofs'))
+
+    from src import main
+
+    def fail():
+        raise AssertionError('create_app() must not initialize Firebase')
+
+    monkeypatch.setattr(main, 'init_firebase', fail)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        app = main.create_app()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+
+    assert statements == []
+    assert not database.exists()
+    assert 'init-db' in app.cli.commands
+
+
+def test_cold_start_time(tmp_path):
+    # زمن استيراد الحزمة وإنشاء التطبيق في عملية جديدة (يطبع للمقارنة بين الإصدارات)
+    script = (
+        'import time; started = time.perf_counter()\n'
+        'from src.main import create_app; create_app()\n'
+        'print(time.perf_counter() - started)\n'
+    )
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}",
+        CATALOG_VERSION_FILE='',
+        NOTIFICATION_EVENTS_FILE='',
+        IDENTITY_EVENTS_FILE='',
+        PROOF_STORAGE_DIR=str(tmp_path / 'proofs'),
+    )
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    elapsed = float(result.stdout.strip().splitlines()[-1])
+    print(f'cold start: {elapsed:.3f}s (process {time.perf_counter() - started:.3f}s)')
+    # حد سخي: التهيئة الثقيلة (Firebase، البذر، create_all) كانت تضيف ثوانٍ عند الاستيراد
+    assert elapsed < 5
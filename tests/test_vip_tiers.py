@@ -0,0 +1,29 @@
+import sqlite3
+
+from src.models.db import db
+from src.services.vip_tiers import vip_tiers
+
+
+def test_out_of_process_edit_is_seen_after_ttl(app, monkeypatch):
+    with app.app_context():
+        assert vip_tiers.get(2).discount_percentage == 5
+
+        # تعديل مباشر بـ SQL من اتصال آخر (لا أحداث ORM في هذه العملية)
+        path = db.engine.url.database
+        with sqlite3.connect(path) as conn:
+            conn.execute('UPDATE vip_levels SET discount_percentage = 7 WHERE level_id = 2')
+
+        assert vip_tiers.get(2).discount_percentage == 5
+        monkeypatch.setattr(vip_tiers, '_loaded_at', vip_tiers._loaded_at - vip_tiers.ttl)
+        assert vip_tiers.get(2).discount_percentage == 7
+        assert vip_tiers.eligible_for(1500).discount_percentage == 7
+
+
+def test_orm_edit_invalidates_immediately(app):
+    from src.models.user import VIPLevel
+
+    with app.app_context():
+        assert vip_tiers.get(3).discount_percentage == 10
+        db.session.get(VIPLevel, 3).discount_percentage = 12
+        db.session.commit()
+        assert vip_tiers.get(3).discount_percentage == 12